@@ -1,18 +1,79 @@
 
+# Public names are loaded lazily (PEP 562): importing mokit.lib only runs this
+# file, and the py2xxx modules (which need PySCF) or Fortran extension modules
+# are imported at the first access of one of their attributes. So a script
+# which only uses e.g. mokit.lib.fch2py does not pay the PySCF import cost.
+
 # orbital transfer api
-from mokit.lib.py2fch_direct import fchk, py2gau, fchk_uno
-from mokit.lib.py2bdf import py2bdf
-from mokit.lib.py2cfour import py2cfour
-from mokit.lib.py2dalton import py2dalton
-from mokit.lib.py2gms import py2gms
-from mokit.lib.py2molcas import py2molcas
-from mokit.lib.py2molpro import py2molpro
-from mokit.lib.py2mrcc import py2mrcc
-from mokit.lib.py2openqp import py2openqp
-from mokit.lib.py2orca import py2orca
-from mokit.lib.py2psi import py2psi
-from mokit.lib.py2qchem import py2qchem
-from mokit.lib.qchem import *
-
-# misc
+_lazy_attrs = {
+    'fchk'      : 'py2fch_direct',
+    'py2gau'    : 'py2fch_direct',
+    'fchk_uno'  : 'py2fch_direct',
+    'py2bdf'    : 'py2bdf',
+    'py2cfour'  : 'py2cfour',
+    'py2dalton' : 'py2dalton',
+    'py2gms'    : 'py2gms',
+    'py2molcas' : 'py2molcas',
+    'py2molpro' : 'py2molpro',
+    'py2mrcc'   : 'py2mrcc',
+    'py2openqp' : 'py2openqp',
+    'py2orca'   : 'py2orca',
+    'py2psi'    : 'py2psi',
+    'py2qchem'  : 'py2qchem',
+    # misc, bound eagerly below
+    'mirror_wfn': 'mirror_wfn'
+}
+
+# all public names of the Fortran extension module qchem (previously imported
+# by `from mokit.lib.qchem import *`) are resolved from there as a fallback
+_star_module = 'qchem'
+
+
+def _public_names():
+    # names exported by `from mokit.lib import *`, the same as those before lazy
+    # loading: all names in _lazy_attrs and all public names of qchem
+    import importlib
+    mod = importlib.import_module('mokit.lib.'+_star_module)
+    names = getattr(mod, '__all__', None)
+    if names is None:
+        names = [k for k in dir(mod) if not k.startswith('_')]
+    return list(_lazy_attrs) + [k for k in names if k not in _lazy_attrs]
+
+
+def __getattr__(name):
+    import importlib
+    if name == '__all__':
+        # computed only when needed, e.g. `from mokit.lib import *`
+        val = _public_names()
+        globals()[name] = val
+        return val
+    elif name in _lazy_attrs:
+        mod = importlib.import_module('mokit.lib.'+_lazy_attrs[name])
+    elif not name.startswith('_'):
+        # `from mokit.lib import fch2py` checks the attribute first. Let the
+        # import system load a submodule, without importing qchem in vain.
+        import importlib.util
+        if importlib.util.find_spec('mokit.lib.'+name) is not None:
+            raise AttributeError("module 'mokit.lib' has no attribute '%s'" % name)
+        mod = importlib.import_module('mokit.lib.'+_star_module)
+        if not hasattr(mod, name):
+            raise AttributeError("module 'mokit.lib' has no attribute '%s'" % name)
+    else:
+        raise AttributeError("module 'mokit.lib' has no attribute '%s'" % name)
+
+    val = getattr(mod, name)
+    # cache it, so that __getattr__ will not be called again for this name
+    globals()[name] = val
+    return val
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attrs))
+
+
+# mirror_wfn is both a submodule (a Fortran extension module, cheap to import)
+# and a function in it. Once the submodule is imported, e.g. by `from
+# mokit.lib.mirror_wfn import ...`, the import system sets mokit.lib.mirror_wfn
+# to the submodule, and __getattr__ is never called for it. So the function is
+# bound here, after the submodule is imported.
 from mokit.lib.mirror_wfn import mirror_wfn
@@ -3,7 +3,9 @@
 automr utilities
 '''
 
-from mokit.lib.gaussian import loc, load_mol_from_fch
+from mokit.lib.gaussian import (
+    loc, load_mol_from_fch, AOIntegrals, loc_para, loc_verbose, get_loc_info
+)
 from mokit.lib.rwwfn import (
     read_nbf_and_nif_from_fch,
     read_na_and_nb_from_fch,
@@ -34,35 +36,78 @@ def proj_vir2virlmo(hf_fch, minbas_fch, minbas_loc_fch, mo, mol, localm='pm'):
     mo_occ = get_occ_from_na_nb(nif, na, nb)
     return mo, mo_occ, npair
 
-def loc_ini_guess(mol, occ_mo, nval):
+def loc_ini_guess(mol, occ_mo, nval, ints=None):
+    '''
+    ints: an AOIntegrals object of mol, which provides the (cached) AO overlap
+    '''
     natom = mol.natm
     nbf = occ_mo.shape[0]
-    S = mol.intor_symmetric('int1e_ovlp')
+    if ints is None:
+        ints = AOIntegrals(mol)
+    S = ints.ovlp()
     chosen = np.ones(natom, dtype=bool)
     bfirst = np.ones(natom+1, dtype=np.int32)
     bfirst[1:] = mol.aoslice_by_atom()[:,3] + 1
     nmo1, lmo_ini = gen_loc_ini_guess(natom,nbf,nval,chosen,bfirst,S,occ_mo)
     return nmo1, lmo_ini
 
-def loc_driver(mol, lmo_ini, nval, method='pm', ao_dip=None, dis_tol=17.0, conv_tol=1e-5):
+def loc_driver(mol, lmo_ini, nval, method='pm', ao_dip=None, dis_tol=17.0, conv_tol=1e-5,
+               ints=None, max_memory=4000, solver='jacobi', return_info=False,
+               DIIS=False, para_nmo=500, nthreads=None, verbose=True):
     '''
     TODO: can lmo_ini and nval be optional?
+    ints: an AOIntegrals object of mol, which provides the (cached) AO overlap
+    max_memory: memory budget (MB) of the PM gross population tensor. If the
+     dense tensor is larger, a sparse algorithm is used in the Fortran pm().
+    solver: 'jacobi' for successive 2*2 rotations (Fortran pm()/boys()), or 'qn'
+     for quasi-Newton steps rotating all orbitals at once (see lo_qn.py)
+    DIIS: accelerate the Jacobi solver of Boys by DIIS extrapolation of the
+     accumulated rotations (the same algorithm as Berry localization in
+     pbc_loc). Not used for PM, which would re-calculate the whole gross
+     population tensor at each extrapolation
+    para_nmo, nthreads: serial/parallel cutoff of Jacobi rotations and the
+     number of OpenMP threads, see gaussian.loc_para()
+    return_info: if True, also return a dict with keys niter, converged,
+     tot_change and history (per-iteration records, see gaussian.get_loc_info())
+    verbose: False to turn off the printing of localization routines
     '''
-    natom = mol.natm
-    nbf = mol.nao
-    bfirst = np.ones(natom+1, dtype=np.int32)
-    bfirst[1:] = mol.aoslice_by_atom()[:,3] + 1
-    dis = BOHR2ANG*gto.inter_distance(mol)
+    if solver not in ('jacobi', 'qn'):
+        raise ValueError(f'Localization solver {solver} cannot be recognized.')
     if method == 'pm':
-        S = mol.intor_symmetric('int1e_ovlp')
-        occ_lmo = pm(natom,nbf,nval,bfirst,dis,lmo_ini,S,'mulliken',dis_tol,conv_tol)
+        if ints is None:
+            ints = AOIntegrals(mol)
+        S = ints.ovlp()
     elif method == 'boys':
         if ao_dip is None:
             # TODO: probably we can calculate ao_dip here
             raise ValueError('ao_dip should be provided for boys localization')
-        occ_lmo = boys(natom,nbf,nval,bfirst,dis,lmo_ini,ao_dip,dis_tol,conv_tol)
     else:
         raise ValueError(f'Localization method {method} cannot be recognized.')
+
+    natom = mol.natm
+    nbf = mol.nao
+    bfirst = np.ones(natom+1, dtype=np.int32)
+    bfirst[1:] = mol.aoslice_by_atom()[:,3] + 1
+    if solver == 'qn':
+        from mokit.lib.lo_qn import pm_qn, boys_qn
+        if method == 'pm':
+            occ_lmo, info = pm_qn(bfirst, lmo_ini[:,:nval], S, 'mulliken', conv_tol,
+                                  verbose=verbose)
+        else:
+            occ_lmo, info = boys_qn(lmo_ini[:,:nval], ao_dip, conv_tol,
+                                    verbose=verbose)
+    else:
+        dis = BOHR2ANG*gto.inter_distance(mol)
+        with loc_para(para_nmo, nthreads, nval), loc_verbose(verbose):
+            if method == 'pm':
+                occ_lmo = pm(natom,nbf,nval,bfirst,dis,lmo_ini,S,'mulliken',dis_tol,
+                             conv_tol,max_memory)
+            else:
+                occ_lmo = boys(natom,nbf,nval,bfirst,dis,lmo_ini,ao_dip,dis_tol,
+                               conv_tol,DIIS)
+        info = get_loc_info()
+    if return_info:
+        return occ_lmo, info
     return occ_lmo
 
 def find_root_by_ss(mc, nroots, target_root, target_ss, iroot_init=-1):
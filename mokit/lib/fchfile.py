@@ -0,0 +1,747 @@
+#!/usr/bin/env python
+# This file is created at 20261016: parse a Gaussian .fch(k) file once into
+#  NumPy arrays, such that one workflow step reads the file from disk only once
+
+import os, re, json, mmap, hashlib
+import numpy as np
+from collections import OrderedDict
+
+# Fortran drops the letter 'E' when the exponent has three digits, e.g.
+#  0.12345678-100. Such numbers cannot be parsed by np.fromstring directly.
+_NO_E_EXPONENT = re.compile(r'(\d)([+-]\d{3})')
+
+# a section header line is a key (A40), 3 blanks, the data type, and either a
+#  scalar value or 'N=' followed by the number of elements. Data lines of
+#  character sections (e.g. the Route line '#p UHF/...') may start with a
+#  non-blank character, so sections are walked by their N= counts
+_HEADER = re.compile(r'^[^ ].{39}   [IRCLH]  ')
+
+# the number of elements per data line of each data type
+_PER_LINE = {'I': 6, 'R': 5, 'C': 5, 'H': 9, 'L': 72}
+
+# the first 11 characters of density sections, in the same order as itype=1~12
+#  used in subroutine read_dm_from_fch in rwwfn.f90
+DM_KEYS = ['Total SCF D', 'Spin SCF De', 'Total CI De', 'Spin CI Den',
+           'Total MP2 D', 'Spin MP2 De', 'Total CC De', 'Spin CC Den',
+           'Total CI Rh', 'Spin CI Rho', 'Total 2nd O', 'Spin 2nd Or']
+
+
+# sections of the Beta spin deleted by fch_u2r
+_BETA_KEYS = ['Beta Orbital Energies', 'Beta MO coefficients', 'Spin SCF Density']
+
+# bump this when the format of the index file changes
+INDEX_VERSION = 2
+
+# arrays which can be stored in the binary companion of a .fch(k) file
+BINARY_KEYS = ['alpha_mo', 'beta_mo', 'alpha_e', 'beta_e', 'dm']
+
+
+def _str2array(s, dtype):
+    s = s.decode() if isinstance(s, bytes) else s
+    try:
+        a = np.fromstring(s, dtype=float, sep=' ')
+    except ValueError:
+        a = np.fromstring(_NO_E_EXPONENT.sub(r'\1E\2', s), dtype=float, sep=' ')
+    if dtype == 'I':
+        a = a.astype(np.int64)
+    return a
+
+
+def scan_fch(buf):
+    '''
+    Scan the content of a .fch(k) file and find all sections. Return a dict
+    key -> [dtype, n, begin, end] for arrays and key -> [dtype, None, value] for
+    scalars, where dtype is one of 'I'/'R'/'C'/'L', n is the number of elements
+    and buf[begin:end] holds the data of an array. Only header lines are touched,
+    the data of arrays are not tokenized here.
+    '''
+    index = {}
+    size = len(buf)
+    # the first two lines are title and job type
+    pos = _next_line(buf, _next_line(buf, 0))
+    while pos < size:
+        nxt = _next_line(buf, pos)
+        line = bytes(buf[pos:nxt]).decode().rstrip('\r\n')
+        if not _HEADER.match(line):
+            pos = nxt
+            continue
+        key = line[:40].strip()
+        dtype = line[43]
+        rest = line[44:].split()
+        if len(rest) > 1 and rest[0] == 'N=':
+            n = int(rest[1])
+            data_end = _skip_data_lines(buf, nxt, dtype, n)
+            index[key] = [dtype, n, nxt, data_end]
+            pos = data_end
+        else:
+            index[key] = [dtype, None, _parse_section(line[44:].encode(), dtype, None)]
+            pos = nxt
+    return index
+
+
+def _next_line(buf, pos):
+    # return the offset of the line after the one starting at pos
+    end = buf.find(b'\n', pos)
+    return len(buf) if end < 0 else end+1
+
+
+def _skip_data_lines(buf, pos, dtype, n):
+    '''
+    Skip the data lines of an array section with n elements starting at pos,
+    return the offset of the line after them. Any further line which is not a
+    section header (e.g. a Route written with a wrong count) is skipped as well.
+    '''
+    per_line = _PER_LINE.get(dtype, 5)
+    for i in range((n+per_line-1)//per_line):
+        pos = _next_line(buf, pos)
+    size = len(buf)
+    while pos < size:
+        nxt = _next_line(buf, pos)
+        if _HEADER.match(bytes(buf[pos:nxt]).decode()):
+            break
+        pos = nxt
+    return pos
+
+
+def _split_sections(lines):
+    '''
+    Split lines (after the title and job type) of a .fch(k) file into sections.
+    Yield (key, header line, list of data lines) for each section, where key is
+    None for a stray line which is not a section header.
+    '''
+    k, nline = 0, len(lines)
+    while k < nline:
+        header = lines[k]
+        k += 1
+        line = header.decode()
+        if not _HEADER.match(line):
+            yield None, header, []
+            continue
+        data = []
+        rest = line[44:].split()
+        if len(rest) > 1 and rest[0] == 'N=':
+            per_line = _PER_LINE.get(line[43], 5)
+            end = k + (int(rest[1])+per_line-1)//per_line
+            data = lines[k:end]
+            k = end
+            while k < nline and not _HEADER.match(lines[k].decode()):
+                data.append(lines[k])
+                k += 1
+        yield line[:40].strip(), header, data
+
+def _parse_section(s, dtype, n):
+    if dtype in 'IR':
+        if n is None:
+            return int(s) if dtype=='I' else float(s)
+        return _str2array(s, dtype)
+    elif dtype == 'L':
+        v = [t == b'T' for t in s.split()]
+        return v[0] if n is None else np.array(v, dtype=bool)
+    else: # 'C'
+        return b''.join(s.split(b'\n')).decode()
+
+
+def index_name(fchname):
+    '''
+    Return the filename of the section index (sidecar) of a .fch(k) file
+    '''
+    return fchname+'.idx'
+
+
+def _file_stamp(fchname):
+    st = os.stat(fchname)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def build_fch_index(fchname):
+    '''
+    Build the section index of a .fch(k) file by scanning header lines once.
+    '''
+    stamp = _file_stamp(fchname)
+    with open(fchname, 'rb') as f:
+        if stamp[1] == 0:
+            raise ValueError(f'File {fchname} is empty.')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            lines = buf[:min(len(buf),1024)].split(b'\n', 2)
+            index = {'stamp': stamp, 'title': lines[0].decode().rstrip(),
+                     'job_info': lines[1].decode().rstrip(),
+                     'sections': scan_fch(buf)}
+    return index
+
+
+def load_fch_index(fchname, save_index=True):
+    '''
+    Load the section index of a .fch(k) file. A cached index file (see
+    index_name()) is used if its mtime/size stamp matches the .fch(k) file,
+    otherwise the index is rebuilt (and saved if save_index=True).
+    '''
+    idxname = index_name(fchname)
+    stamp = _file_stamp(fchname)
+    if os.path.isfile(idxname):
+        try:
+            with open(idxname, 'r') as f:
+                index = json.load(f)
+            if index.get('version') == INDEX_VERSION and index['stamp'] == stamp:
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+
+    index = build_fch_index(fchname)
+    index['version'] = INDEX_VERSION
+    if save_index:
+        # the index is only a cache, failing to write it is not an error (e.g.
+        # read-only directory)
+        try:
+            tmpname = idxname+'.'+str(os.getpid())
+            with open(tmpname, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmpname, idxname)
+        except OSError:
+            pass
+    return index
+
+
+def read_fch_section(fchname, key, index=None):
+    '''
+    Read one section from a .fch(k) file by seeking to its byte offset directly.
+    Return a scalar or a 1D NumPy array.
+
+    Simple usage::
+    >>> from mokit.lib.fchfile import read_fch_section
+    >>> mo_b = read_fch_section('uhf.fch', 'Beta MO coefficients')
+    '''
+    if index is None:
+        index = load_fch_index(fchname)
+    if key not in index['sections']:
+        raise KeyError(f"No '{key}' found in file {fchname}")
+    sec = index['sections'][key]
+    if sec[1] is None:
+        return sec[2]
+    dtype, n, begin, end = sec
+    with open(fchname, 'rb') as f:
+        f.seek(begin)
+        s = f.read(end-begin)
+    return _parse_section(s, dtype, n)
+
+
+def binary_name(fchname):
+    '''
+    Return the directory name of the binary companion of a .fch(k) file
+    '''
+    return fchname+'.bin'
+
+
+def save_fch_arrays(fchname, **arrays):
+    '''
+    Save arrays into the binary companion of a .fch(k) file, one raw .npy file
+    per array. MOs and densities are supposed to be in PySCF AO order. Supported
+    keys are alpha_mo, beta_mo, alpha_e, beta_e and dm. The companion records
+    the mtime/size stamp of the .fch(k) file, so call this function after the
+    .fch(k) file is written.
+
+    Simple usage::
+    >>> from mokit.lib.fchfile import save_fch_arrays
+    >>> save_fch_arrays('h2o.fch', alpha_mo=mf.mo_coeff, alpha_e=mf.mo_energy)
+    '''
+    binname = binary_name(fchname)
+    os.makedirs(binname, exist_ok=True)
+    keys = []
+    for key, a in arrays.items():
+        if key not in BINARY_KEYS:
+            raise KeyError(f'Unsupported key {key} in save_fch_arrays.')
+        if a is None:
+            continue
+        np.save(os.path.join(binname, key+'.npy'), np.asarray(a))
+        keys.append(key)
+    meta = {'version': INDEX_VERSION, 'stamp': _file_stamp(fchname), 'keys': keys}
+    tmpname = os.path.join(binname, 'meta.json.'+str(os.getpid()))
+    with open(tmpname, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmpname, os.path.join(binname, 'meta.json'))
+
+
+def load_fch_arrays(fchname):
+    '''
+    Load arrays from the binary companion of a .fch(k) file. Arrays are memory-
+    mapped in copy-on-write mode, i.e. no data is copied until an array is
+    modified, and modifications are never written back to disk. Return None if
+    the companion does not exist or is older than the .fch(k) file.
+    Sections may be overwritten with the same size within the mtime granularity,
+    so each writer of .fch(k) files (py2fch, write_fch_sections, fch_u2r)
+    invalidates the companion, see invalidate_fch_arrays().
+    '''
+    binname = binary_name(fchname)
+    metaname = os.path.join(binname, 'meta.json')
+    if not os.path.isfile(metaname):
+        return None
+    try:
+        with open(metaname, 'r') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != INDEX_VERSION or meta['stamp'] != _file_stamp(fchname):
+        return None
+    return {key: np.load(os.path.join(binname, key+'.npy'), mmap_mode='c')
+            for key in meta['keys']}
+
+
+def invalidate_fch_arrays(fchname):
+    '''
+    Invalidate the binary companion (if any) of a .fch(k) file, which must be
+    called before the .fch(k) file is modified.
+    '''
+    try:
+        os.remove(os.path.join(binary_name(fchname), 'meta.json'))
+    except FileNotFoundError:
+        pass
+
+
+# Fortran drops the letter 'E' of a three-digit exponent in ES15.8 format
+_THREE_DIGIT_EXPONENT = re.compile(r' *(-?\d\.\d{8})E([+-]\d{3})')
+
+
+def format_fch_reals(a):
+    '''
+    Format a real array in the same way as Fortran write(fid,'(5(1X,ES15.8))'),
+    i.e. the data lines of a real array section in a .fch(k) file.
+    '''
+    a = np.asarray(a, dtype=float).ravel()
+    if a.size == 0:
+        return ''
+    s = ('%16.8E'*a.size) % tuple(a)
+    s = _THREE_DIGIT_EXPONENT.sub(lambda m: ' '+(m.group(1)+m.group(2)).rjust(15), s)
+    return '\n'.join(s[i:i+80] for i in range(0, len(s), 80))+'\n'
+
+
+def write_fch_sections(fchname, sections):
+    '''
+    Replace the data of real array sections in a .fch(k) file in one pass, i.e.
+    the file is read once and written once, no matter how many sections are
+    updated. sections is a dict key -> array, e.g. {'Alpha MO coefficients':
+    mo.T.ravel()}, where MOs are in Gaussian order (see BasisPermutation.mo2gau).
+    The number of elements of each section must be unchanged. A temporary file
+    is written and renamed, so a crash never leaves a truncated .fch(k) file.
+
+    Simple usage::
+    >>> from mokit.lib.fchfile import FchFile, write_fch_sections
+    >>> fch = FchFile('h2o_uhf.fch')
+    >>> perm = fch.permutation()
+    >>> write_fch_sections('h2o_uhf.fch', {'Alpha MO coefficients':
+    ...                    perm.mo2gau(mo_a).T, 'Beta MO coefficients':
+    ...                    perm.mo2gau(mo_b).T})
+    '''
+    fchname = fch_path(fchname)
+    index = load_fch_index(fchname, save_index=False)['sections']
+    blocks = []
+    for key, a in sections.items():
+        if key not in index or index[key][1] is None or index[key][0] != 'R':
+            raise KeyError(f"No real array section '{key}' found in file {fchname}")
+        a = np.asarray(a)
+        dtype, n, begin, end = index[key]
+        if a.size != n:
+            raise ValueError(f"Section '{key}' in file {fchname} has {n} elements, "
+                             f"but {a.size} are given.")
+        blocks.append((begin, end, format_fch_reals(a).encode()))
+    blocks.sort(key=lambda x: x[0])
+
+    with open(fchname, 'rb') as f:
+        buf = f.read()
+    k = 0
+    new = []
+    for begin, end, data in blocks:
+        new.append(buf[k:begin])
+        new.append(data)
+        k = end
+    new.append(buf[k:])
+    invalidate_fch_arrays(fchname)
+    tmpname = fchname+'.'+str(os.getpid())
+    try:
+        with open(tmpname, 'wb') as f:
+            f.write(b''.join(new))
+        os.replace(tmpname, fchname)
+    except BaseException:
+        if os.path.exists(tmpname):
+            os.remove(tmpname)
+        raise
+
+
+class BasisPermutation(object):
+    '''
+    Permutation and normalization factors between the PySCF and Gaussian AO
+    orders of one basis set, i.e. C_gau = C_py[idx]*norm[:,None], where idx
+    starts from 0. Use get_basis_permutation() to obtain a cached object, then
+    any number of MO sets or AO matrices of this basis can be converted by fancy
+    indexing, without parsing shells again.
+    mo2gau/mo2py: MO coefficients (...,nbf,nif), e.g. alpha, beta, NOs, LMOs.
+    dm2gau/dm2py: contravariant AO matrices (...,nbf,nbf), e.g. density matrices.
+    int2gau/int2py: covariant AO matrices (...,nbf,nbf), e.g. overlap, dipole
+     integrals.
+    Leading dimensions are allowed, e.g. UHF MOs (2,nbf,nif) or AO dipole
+    integrals (3,nbf,nbf) are converted in one call.
+
+    Simple usage::
+    >>> from mokit.lib.fchfile import FchFile
+    >>> fch = FchFile('h2o.fch')
+    >>> perm = fch.permutation()
+    >>> mo_a = perm.mo2py(fch.raw_mo('a'))
+    >>> S_gau = perm.int2gau(mol.intor_symmetric('int1e_ovlp'))
+    '''
+    def __init__(self, idx, norm):
+        self.idx = np.asarray(idx)
+        self.norm = np.asarray(norm)
+        self.nbf = self.idx.size
+        self.inv = np.argsort(self.idx)
+        self.inv_norm = 1.0/self.norm[self.inv]
+        self._norm2 = np.outer(self.norm, self.norm)
+        self._inv_norm2 = np.outer(self.inv_norm, self.inv_norm)
+
+    def mo2gau(self, mo):
+        return np.asarray(mo)[...,self.idx,:]*self.norm[:,None]
+
+    def mo2py(self, mo):
+        return np.asarray(mo)[...,self.inv,:]*self.inv_norm[:,None]
+
+    def dm2gau(self, dm):
+        return np.asarray(dm)[...,self.idx[:,None],self.idx]*self._norm2
+
+    def dm2py(self, dm):
+        return np.asarray(dm)[...,self.inv[:,None],self.inv]*self._inv_norm2
+
+    def int2gau(self, s):
+        return np.asarray(s)[...,self.idx[:,None],self.idx]/self._norm2
+
+    def int2py(self, s):
+        return np.asarray(s)[...,self.inv[:,None],self.inv]/self._inv_norm2
+
+
+# basis set data -> BasisPermutation, least recently used dropped first
+_permute_cache = OrderedDict()
+_permute_cache_size = 32
+
+
+def get_basis_permutation(shell_type, shell2atom_map, nbf):
+    '''
+    Return the BasisPermutation object of a basis set given by the Gaussian shell
+    types and shell to atom map (starts from 1). It is computed by subroutine
+    get_permute_idx_from_shell in py2fch.f90 only once per basis set.
+    '''
+    shell_type = np.asarray(shell_type, dtype=np.int64)
+    shell2atom_map = np.asarray(shell2atom_map, dtype=np.int64)
+    key = (shell_type.tobytes(), shell2atom_map.tobytes(), nbf)
+    if key in _permute_cache:
+        _permute_cache.move_to_end(key)
+        return _permute_cache[key]
+
+    from mokit.lib.py2fch import get_permute_idx_from_shell
+    idx, norm = get_permute_idx_from_shell(shell_type, shell2atom_map, nbf)
+    perm = BasisPermutation(idx-1, norm)
+    _permute_cache[key] = perm
+    if len(_permute_cache) > _permute_cache_size:
+        _permute_cache.popitem(last=False)
+    return perm
+
+
+class FchFile(object):
+    '''
+    In-memory representation of a Gaussian .fch(k) file. Scalars are loaded from
+    the section index, and each array section is read (by seeking to its byte
+    offset) and converted into a NumPy array only once, when it is accessed for
+    the first time. MOs in the file are in Gaussian order, use mo() to get MOs
+    in PySCF order.
+    An FchFile object can be passed into most functions in gaussian.py wherever
+    a .fch(k) filename is accepted. If the file is modified on disk, the index
+    and all cached sections are discarded and reloaded automatically.
+    If an up-to-date binary companion exists (see save_fch_arrays()), MOs and
+    orbital energies are memory-mapped from it instead of parsing the text.
+
+    Simple usage::
+    >>> from mokit.lib.fchfile import FchFile
+    >>> fch = FchFile('h2o.fch')
+    >>> mf.mo_coeff = fch.mo('a')
+    >>> print(fch.nbf, fch.nif, fch.na, fch.nb)
+    '''
+    def __init__(self, fchname, save_index=True):
+        self.fchname = fchname
+        self.save_index = save_index
+        self._load_index()
+
+    def _load_index(self):
+        index = load_fch_index(self.fchname, self.save_index)
+        self.title = index['title']
+        self.job_info = index['job_info']
+        self.stamp = index['stamp']
+        self.index = index
+        self.data = {}
+        self._permute = None
+        self.arrays = load_fch_arrays(self.fchname)
+
+    def _check_stamp(self):
+        if _file_stamp(self.fchname) != self.stamp:
+            self._load_index()
+
+    def __getitem__(self, key):
+        self._check_stamp()
+        if key not in self.data:
+            self.data[key] = read_fch_section(self.fchname, key, self.index)
+        return self.data[key]
+
+    def __contains__(self, key):
+        return key in self.index['sections']
+
+    def keys(self):
+        return self.index['sections'].keys()
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def digest(self, keys):
+        '''
+        Return the SHA-1 hex digest of the raw text of given sections. Sections are
+        hashed without being parsed, and missing sections are skipped. This can be
+        used as a key to recognize .fch(k) files sharing the same data.
+        '''
+        self._check_stamp()
+        sections = self.index['sections']
+        h = hashlib.sha1()
+        with open(self.fchname, 'rb') as f:
+            for key in keys:
+                if key not in sections:
+                    continue
+                sec = sections[key]
+                h.update(key.encode())
+                if sec[1] is None:
+                    h.update(repr(sec[2]).encode())
+                else:
+                    f.seek(sec[2])
+                    h.update(f.read(sec[3]-sec[2]))
+        return h.hexdigest()
+
+    @property
+    def natom(self):
+        return self['Number of atoms']
+
+    @property
+    def charge(self):
+        return self['Charge']
+
+    @property
+    def mult(self):
+        return self['Multiplicity']
+
+    @property
+    def na(self):
+        return self['Number of alpha electrons']
+
+    @property
+    def nb(self):
+        return self['Number of beta electrons']
+
+    @property
+    def nbf(self):
+        return self['Number of basis functions']
+
+    @property
+    def nif(self):
+        return self['Number of independent functions']
+
+    @property
+    def ielem(self):
+        return self['Atomic numbers']
+
+    @property
+    def coor(self):
+        # Cartesian coordinates (3,natom) in Bohr
+        return self['Current cartesian coordinates'].reshape(-1,3).T
+
+    @property
+    def shell_type(self):
+        return self['Shell types']
+
+    @property
+    def prim_per_shell(self):
+        return self['Number of primitives per shell']
+
+    @property
+    def shell2atom_map(self):
+        return self['Shell to atom map']
+
+    @property
+    def prim_exp(self):
+        return self['Primitive exponents']
+
+    @property
+    def contr_coeff(self):
+        return self['Contraction coefficients']
+
+    @property
+    def contr_coeff_sp(self):
+        return self.get('P(S=P) Contraction coefficients')
+
+    @property
+    def hf_type(self):
+        '''
+        1/2/7/101 for real RHF, real UHF, complex GHF, real ROHF, respectively. The
+        same as subroutine read_hf_type_from_fch in qchem.f90
+        '''
+        norb = self['Alpha Orbital Energies'].size
+        if norb == 2*self.nif:
+            return 7
+        elif 'Beta MO coefficients' in self:
+            return 2
+        elif self.na != self.nb:
+            return 101
+        return 1
+
+    def permutation(self):
+        '''
+        Return the BasisPermutation object between the PySCF and Gaussian AO orders
+        of the basis set in this file, see get_basis_permutation().
+        '''
+        if self._permute is None:
+            self._permute = get_basis_permutation(self.shell_type, self.shell2atom_map,
+                                                  self.nbf)
+        return self._permute
+
+    def permute_idx(self):
+        '''
+        Return the permutation index list (starts from 1) and normalization factors
+        between the PySCF and Gaussian AO orders. See subroutine
+        get_permute_idx_from_shell in py2fch.f90.
+        '''
+        perm = self.permutation()
+        return perm.idx+1, perm.norm
+
+    def raw_mo(self, ab='a'):
+        '''
+        Return MO coefficients (nbf,nif) in Gaussian order.
+        '''
+        if ab == 'a':
+            key = 'Alpha MO coefficients'
+        elif ab == 'b':
+            key = 'Beta MO coefficients'
+        else:
+            raise ValueError("ab can only be 'a' or 'b'")
+        if key not in self:
+            raise ValueError(f"No '{key}' found in file {self.fchname}")
+        return self[key].reshape(self.nif, self.nbf).T
+
+    def _binary(self, key):
+        self._check_stamp()
+        if self.arrays is not None and key in self.arrays:
+            return self.arrays[key]
+        return None
+
+    def mo(self, ab='a'):
+        '''
+        Return MO coefficients (nbf,nif) in PySCF order, the same as fch2py
+        '''
+        mo = self._binary({'a':'alpha_mo', 'b':'beta_mo'}.get(ab))
+        if mo is not None:
+            return mo
+        return self.permutation().mo2py(self.raw_mo(ab))
+
+    def eigenvalues(self, ab='a'):
+        ev = self._binary({'a':'alpha_e', 'b':'beta_e'}.get(ab))
+        if ev is not None:
+            return np.array(ev)
+        if ab == 'a':
+            return self['Alpha Orbital Energies'].copy()
+        elif ab == 'b':
+            return self['Beta Orbital Energies'].copy()
+        raise ValueError("ab can only be 'a' or 'b'")
+
+    def dm(self, itype=1):
+        '''
+        Return the density matrix (nbf,nbf) in Gaussian order. itype=1~12 has the
+        same meaning as that in subroutine read_dm_from_fch in rwwfn.f90.
+        '''
+        if itype<1 or itype>12:
+            raise ValueError(f'Invalid itype={itype}. Allowed values are 1~12.')
+        key = [k for k in self.keys() if k[:11] == DM_KEYS[itype-1]]
+        if len(key) == 0:
+            raise ValueError(f"No '{DM_KEYS[itype-1]}' found in file {self.fchname}")
+        nbf = self.nbf
+        dm = np.zeros((nbf,nbf))
+        dm[np.tril_indices(nbf)] = self[key[0]]
+        dm = dm + dm.T - np.diag(dm.diagonal())
+        return dm
+
+
+def load_fch(fchname):
+    '''
+    Return an FchFile object. fchname can be either a filename or an FchFile
+    object (which will be returned directly).
+    '''
+    if isinstance(fchname, FchFile):
+        return fchname
+    return FchFile(fchname)
+
+
+def fch_path(fchname):
+    '''
+    Return the filename of a .fch(k) file, fchname can be either a filename or
+    an FchFile object.
+    '''
+    if isinstance(fchname, FchFile):
+        return fchname.fchname
+    return fchname
+
+
+def fch_u2r(fchname, newfch=None):
+    '''
+    Convert a UHF-type .fch(k) file into an RHF/ROHF-type one, in process. The
+    same as the executable fch_u2r (see fch_u2r.f90): the job type (and Route,
+    if na/=nb) is changed to RHF/ROHF, ILSW(1), IOpCl and IROHF are set to 0, and
+    Beta orbital energies, Beta MOs and the spin density are deleted. Alpha MOs
+    are kept. Return the new filename, which is fchname with suffix _r.fch by
+    default. fchname can be either a filename or an FchFile object.
+
+    Simple usage::
+    >>> from mokit.lib.fchfile import fch_u2r
+    >>> fch_u2r('benzene_uhf.fch') # benzene_uhf_r.fch generated
+    '''
+    fch = load_fch(fchname)
+    fchname = fch.fchname
+    if newfch is None:
+        newfch = fchname[0:fchname.rindex('.fch')]+'_r.fch'
+    na, nb = fch.na, fch.nb
+    with open(fchname, 'rb') as f:
+        lines = f.read().rstrip(b'\n').split(b'\n')
+
+    lines[1] = bytearray(lines[1])
+    if lines[1][10:13] == b'UHF':
+        if na == nb:
+            lines[1][10:13] = b'RHF'
+        else:
+            lines[1][10:14] = b'ROHF'
+
+    iopcl = [b'IOpCl'+b' '*38+b'I'+b' '*16+b'0', b'IROHF'+b' '*38+b'I'+b' '*16+b'0']
+    new = lines[:2]
+    has_iopcl = False
+    for key, header, data in _split_sections(lines[2:]):
+        if key in _BETA_KEYS:
+            continue
+        elif key == 'IOpCl':
+            has_iopcl = True
+            header = iopcl[0]
+        elif key == 'IROHF':
+            header = iopcl[1]
+        elif key == 'Alpha Orbital Energies' and not has_iopcl:
+            new.extend(iopcl)
+        elif key == 'Route' and na != nb:
+            for k, line in enumerate(data):
+                for uhf in (b'UHF', b'uhf', b'Uhf'):
+                    if uhf in line:
+                        data[k] = line.replace(uhf, b'ROHF', 1)
+                        break
+        elif key == 'ILSW' and data and len(data[0]) > 11:
+            data[0] = data[0][:11]+b'0'+data[0][12:]
+        new.append(header)
+        new.extend(data)
+
+    invalidate_fch_arrays(newfch)
+    with open(newfch, 'wb') as f:
+        f.write(b'\n'.join(new)+b'\n')
+    return newfch
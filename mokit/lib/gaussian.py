@@ -1,20 +1,231 @@
 #!/usr/bin/env python
 # written by jxzou at 20210129: subroutines involving Gaussian files
 
-import random, os, shutil
+import os, shutil
+from collections import OrderedDict
+from contextlib import contextmanager
 import numpy as np
 from mokit.lib.fch2py import fch2py
 from mokit.lib.py2fch import py2fch
-from mokit.lib.rwwfn import read_nbf_and_nif_from_fch, read_na_and_nb_from_fch
+from mokit.lib.fchfile import load_fch, fch_path
 
 BOHR2ANG = 0.52917721092e0
 
+# sections which determine the PySCF mol/cell object built from a .fch(k) file
+MOL_KEYS = ['Charge', 'Multiplicity', 'Atomic numbers', 'Int Atom Types',
+            'Current cartesian coordinates', 'Shell types',
+            'Number of primitives per shell', 'Shell to atom map',
+            'Primitive exponents', 'Contraction coefficients',
+            'P(S=P) Contraction coefficients', 'ECP-LenNCZ', 'ECP-KFirst',
+            'ECP-KLast', 'ECP-LMax', 'ECP-LPSkip', 'ECP-RNFroz', 'ECP-NLP',
+            'ECP-CLP1', 'ECP-CLP2', 'ECP-ZLP']
 
-def get_ao_dip(mol, fix_center=False):
+# LRU cache of built mol/cell objects, keyed by the digest of MOL_KEYS sections
+_mol_cache = OrderedDict()
+_mol_cache_size = 8
+
+# LRU cache of AO-basis 1e integrals shared by all AOIntegrals objects, keyed by
+#  (geometry and basis digest, integral name). The total size is bounded by
+#  _ao_int_max_memory (MB).
+_ao_int_cache = OrderedDict()
+_ao_int_nbytes = 0
+_ao_int_max_memory = 4000
+
+
+def set_ao_int_cache_memory(max_memory):
+  '''
+  Set the maximum memory (MB) of AO integrals kept by AOIntegrals (default
+  4000 MB). The least recently used integrals are evicted first. max_memory=0
+  disables the cache.
+  '''
+  global _ao_int_max_memory
+  _ao_int_max_memory = max(0, max_memory)
+  _evict_ao_ints(0)
+
+
+def clear_ao_int_cache():
+  '''
+  Remove all AO integrals kept by AOIntegrals.
+  '''
+  global _ao_int_nbytes
+  _ao_int_cache.clear()
+  _ao_int_nbytes = 0
+
+
+def _evict_ao_ints(nbytes):
+  # evict the least recently used integrals until nbytes more bytes can be kept
+  global _ao_int_nbytes
+  while len(_ao_int_cache)>0 and _ao_int_nbytes+nbytes>_ao_int_max_memory*1e6:
+    key, val = _ao_int_cache.popitem(last=False)
+    _ao_int_nbytes -= _nbytes(val)
+
+
+def _nbytes(val):
+  if isinstance(val, tuple):
+    return sum(v.nbytes for v in val)
+  return val.nbytes
+
+
+class AOIntegrals(object):
+  '''
+  Lazily computed AO-basis 1e integrals of a PySCF mol (or cell) object:
+   1) overlap integrals;
+   2) dipole integrals (molecule only);
+   3) Berry phase integrals from ft_aopair at the reciprocal vectors (cell only).
+  Integrals are kept in a cache shared by all AOIntegrals objects and keyed by
+  the geometry and basis set of mol, so the same integrals are computed only
+  once in a workflow, even if different AOIntegrals objects (or none) are passed
+  to functions like loc_ini_guess, loc_driver and find_antibonding_orb. The
+  total size of the cache is bounded, see set_ao_int_cache_memory().
+  Returned arrays are shared by all callers and must not be modified in place.
+
+  Simple usage::
+  >>> from mokit.lib.gaussian import AOIntegrals
+  >>> ints = AOIntegrals(mol)
+  >>> S = ints.ovlp()
+  >>> center, ao_dip = ints.dip()
+  '''
+  def __init__(self, mol):
+    import hashlib
+    from pyscf.gto.mole import PTR_ENV_START
+
+    self.mol = mol
+    self.pbc = hasattr(mol, 'pbc_intor')
+    h = hashlib.sha1()
+    h.update(mol._atm.tobytes())
+    h.update(mol._bas.tobytes())
+    h.update(mol._env[PTR_ENV_START:].tobytes())
+    h.update(bytes([mol.cart, self.pbc]))
+    if self.pbc:
+      h.update(mol.lattice_vectors().tobytes())
+    self.key = h.hexdigest()
+
+  def _get(self, name, compute):
+    global _ao_int_nbytes
+    key = (self.key, name)
+    if key in _ao_int_cache:
+      _ao_int_cache.move_to_end(key)
+      return _ao_int_cache[key]
+    val = compute()
+    nbytes = _nbytes(val)
+    if nbytes <= _ao_int_max_memory*1e6:
+      _evict_ao_ints(nbytes)
+      _ao_int_cache[key] = val
+      _ao_int_nbytes += nbytes
+    return val
+
+  def ovlp(self):
+    '''
+    AO overlap integrals. For a cell object, lattice summation is included.
+    '''
+    if self.pbc:
+      # do not use cell.intor_symmetric('int1e_ovlp') here, since it returns
+      # the AO overlap of an isolated molecule
+      return self._get('ovlp', lambda: self.mol.pbc_intor('int1e_ovlp', hermi=1))
+    return self._get('ovlp', lambda: self.mol.intor_symmetric('int1e_ovlp'))
+
+  def dip(self, fix_center=False):
+    '''
+    Return (charge_center, ao_dip) in Bohr, see get_ao_dip.
+    '''
+    return self._get(('dip', fix_center), lambda: _calc_ao_dip(self.mol, fix_center))
+
+  def ft_aopair(self):
+    '''
+    Complex Berry phase integrals (3,nbf,nbf) at the reciprocal vectors of a
+    cell, used in PBC orbital localization.
+    '''
+    from pyscf.pbc.df.ft_ao import ft_aopair
+    cell = self.mol
+    return self._get('ft_aopair', lambda: ft_aopair(cell, Gv=cell.reciprocal_vectors()))
+
+  def ft_aopair_mo(self, mo, max_memory=None, diag=False):
+    '''
+    Berry phase integrals in MO basis, i.e. C^T Z C (3,nmo,nmo) in Fortran
+    order, or only the diagonal (3,nmo) if diag=True. If the AO tensor Z
+    (3,nbf,nbf) is cached or not larger than max_memory (MB), ft_aopair() is
+    used. Otherwise Z is computed block by block of shells (rows), each block
+    not larger than max_memory, and transformed into MO basis on the fly, so
+    the AO tensor is never stored.
+    '''
+    from pyscf.pbc.df.ft_ao import ft_aopair
+    cell = self.mol
+    nbf, nmo = mo.shape
+    if diag:
+      res = np.zeros((3,nmo), dtype=complex)
+    else:
+      res = np.zeros((3,nmo,nmo), dtype=complex, order='F')
+
+    ao_loc = cell.ao_loc_nr()
+    row_size = 48*nbf # bytes of a row of Z
+    full = (self.key,'ft_aopair') in _ao_int_cache or max_memory is None or \
+           row_size*nbf <= max_memory*1e6
+    if full:
+      shl_slices = [(0, cell.nbas)]
+    else: # at least one shell per block
+      shl_slices = []
+      sh0 = 0
+      for sh1 in range(1, cell.nbas):
+        if (ao_loc[sh1+1]-ao_loc[sh0])*row_size > max_memory*1e6:
+          shl_slices.append((sh0, sh1))
+          sh0 = sh1
+      shl_slices.append((sh0, cell.nbas))
+
+    Gv = cell.reciprocal_vectors()
+    ft_kern = None if full else _gamma_ft_kernel(cell)
+    for sh0, sh1 in shl_slices:
+      if full:
+        z = self.ft_aopair()
+      elif ft_kern is None:
+        z = ft_aopair(cell, Gv=Gv, shls_slice=(sh0,sh1,0,cell.nbas))
+      else:
+        z = ft_kern(Gv, kptjs=np.zeros((1,3)), shls_slice=(sh0,sh1,0,cell.nbas))[0]
+      c = mo[ao_loc[sh0]:ao_loc[sh1]]
+      for x in range(3):
+        # real and imaginary parts by real matrix multiplications
+        zx = np.ascontiguousarray(z[x])
+        zr = zx.real @ mo
+        zi = zx.imag @ mo
+        if diag:
+          res[x] += np.einsum('ui,ui->i', c, zr) + 1j*np.einsum('ui,ui->i', c, zi)
+        else:
+          res[x] += c.T @ zr + 1j*(c.T @ zi)
+      z = zx = None
+    return res
+
+
+def _gamma_ft_kernel(cell):
+  # The Fourier transform kernel of AO pairs at the gamma point, which is built
+  # in every call of ft_aopair. Building it (i.e. the lattice images and their
+  # overlap masks) once saves time when ft_aopair is computed block by block.
+  # Return None if the PySCF version does not provide it.
+  try:
+    from pyscf.lib import logger
+    from pyscf.pbc.df import ft_ao
+    log = logger.new_logger(cell)
+    rs_cell = ft_ao._RangeSeparatedCell.from_cell(cell, ft_ao.KECUT_THRESHOLD,
+                                                  ft_ao.RCUT_THRESHOLD, log)
+    rcut = ft_ao.estimate_rcut(rs_cell)
+    supmol = ft_ao.ExtendedMole.from_cell(rs_cell, [1,1,1], rcut.max(), log)
+    supmol = supmol.strip_basis(rcut)
+    return supmol.gen_ft_kernel('s1', return_complex=True, verbose=log)
+  except (ImportError, AttributeError):
+    return None
+
+
+def get_ao_dip(mol, fix_center=False, ints=None):
   # mol can only be a PySCF molecule object. Although it can also be cell object
   # in principle, the calculated dipole integrals in this case seem useless. For
   # PBC orbital localization, what we need is complex ao_dip from ft_aopair
   # (see pbc_loc() below) and this function will not be called.
+  # ints: an AOIntegrals object of mol. The returned arrays are cached and
+  #  shared, do not modify them in place.
+  if ints is None:
+    ints = AOIntegrals(mol)
+  return ints.dip(fix_center)
+
+
+def _calc_ao_dip(mol, fix_center=False):
   if (fix_center):
     ao_dip = mol.intor_symmetric('int1e_r', comp=3)
     charge_center = np.zeros(3)
@@ -51,9 +262,145 @@ def wrap_atoms_into_cell(cell):
   return coor, cell
 
 
-def load_mol_from_fch(fchname):
+def _atom_basis_ecp_from_fch(fch):
+  '''
+  Generate the atom string, basis set dict, ECP dict and whether Cartesian
+  functions are used, for building a PySCF mol/cell object from an FchFile
+  object. The results are the same as those in the .py file generated by
+  `bas_fch2py fchname -obj`, except that full precision is kept.
+  '''
+  from pyscf.data.elements import ELEMENTS
+
+  natom = fch.natom
+  elem = [ELEMENTS[i] for i in fch.ielem]
+  iatom_type = fch.get('Int Atom Types')
+  ghost = np.zeros(natom, dtype=bool) if iatom_type is None else iatom_type==1000
+  # label of each atom, e.g. O1, H1, H2. The same as subroutine calc_ntimes.
+  ntimes = {}
+  label = []
+  for e in elem:
+    ntimes[e] = ntimes.get(e, 0) + 1
+    label.append(e+str(ntimes[e]))
+
+  coor = fch.coor.T*BOHR2ANG
+  name = [('X-' if ghost[i] else '')+label[i] for i in range(natom)]
+  atom = '\n'.join('%-8s %20.12f %20.12f %20.12f' %(name[i], *coor[i])
+                   for i in range(natom))
+
+  # basis set data. Like gto.basis.parse, shells of each atom are (stably)
+  # sorted by angular momentum, L(SP) shells are split into S and P shells, and
+  # primitives with zero coefficients are removed.
+  shell_type = fch.shell_type
+  prim_per_shell = fch.prim_per_shell.tolist()
+  shell2atom_map = fch.shell2atom_map.tolist()
+  prim_exp = fch.prim_exp.tolist()
+  contr_coeff = fch.contr_coeff.tolist()
+  if fch.contr_coeff_sp is not None:
+    contr_coeff_sp = fch.contr_coeff_sp.tolist()
+  shells = [[] for i in range(natom)]
+  k = 0
+  for itype, nprim, iatom in zip(shell_type.tolist(), prim_per_shell, shell2atom_map):
+    e = prim_exp[k:k+nprim]
+    c = contr_coeff[k:k+nprim]
+    if nprim==1 and c[0]<1e-6:
+      c[0] = 1.0
+    if itype == -1: # L(SP)
+      shells[iatom-1].append([0] + [[x, y] for x, y in zip(e, c) if y!=0])
+      c = contr_coeff_sp[k:k+nprim]
+      shells[iatom-1].append([1] + [[x, y] for x, y in zip(e, c) if y!=0])
+    else:
+      shells[iatom-1].append([abs(itype)] + [[x, y] for x, y in zip(e, c) if y!=0])
+    k += nprim
+  basis = {}
+  for i in range(natom):
+    basis[label[i]] = sorted([b for b in shells[i] if len(b)>1], key=lambda b: b[0])
+
+  # ECP/PP data. Note that different ECPs on atoms of the same element are
+  # supported, since each atom has its own label.
+  ecp = {}
+  if fch.get('ECP-LenNCZ', 0) > 0:
+    KFirst = fch['ECP-KFirst'].reshape(10,natom).T.tolist()
+    KLast = fch['ECP-KLast'].reshape(10,natom).T.tolist()
+    Lmax = fch['ECP-LMax'].tolist()
+    LPSkip = fch['ECP-LPSkip'].tolist()
+    RNFroz = fch['ECP-RNFroz'].tolist()
+    NLP = fch['ECP-NLP'].tolist()
+    CLP = fch['ECP-CLP1'].tolist()
+    ZLP = fch['ECP-ZLP'].tolist()
+    CLP2 = fch.get('ECP-CLP2')
+    so_ecp = fch.hf_type==7 and CLP2 is not None and np.any(np.abs(CLP2)>1e-4)
+    if so_ecp:
+      CLP2 = CLP2.tolist()
+    for i in range(natom):
+      if LPSkip[i] != 0:
+        continue
+      ecp_shells = []
+      for j in range(Lmax[i]+1):
+        n1 = KFirst[i][j]
+        n2 = KLast[i][j]
+        if n1 == 0:
+          break
+        by_ang = [[] for r in range(7)] # up to r^6
+        for n in range(n1-1, n2):
+          if CLP[n] != 0:
+            if so_ecp and j>1:
+              by_ang[NLP[n]].append([ZLP[n], CLP[n], CLP2[n]])
+            else:
+              by_ang[NLP[n]].append([ZLP[n], CLP[n]])
+        ecp_shells.append([j-1, by_ang]) # -1 for ul
+      ecp[label[i]] = [int(round(RNFroz[i])), sorted(ecp_shells, key=lambda b: b[0])]
+
+  cart = bool(np.any(shell_type > 1))
+  return atom, basis, ecp, cart
+
+
+def set_mol_cache_size(size):
+  '''
+  Set the maximum number of mol/cell objects kept by load_mol_from_fch and
+  load_cell_from_fch (default 8). size=0 disables the cache.
+  '''
+  global _mol_cache_size
+  _mol_cache_size = max(0, int(size))
+  while len(_mol_cache) > _mol_cache_size:
+    _mol_cache.popitem(last=False)
+
+
+def clear_mol_cache():
   '''
-  Load the PySCF mol object from a specified Gaussian .fch(k) file
+  Remove all mol/cell objects kept by load_mol_from_fch and load_cell_from_fch.
+  '''
+  _mol_cache.clear()
+
+
+def _cached_mol(fch, pbc, build):
+  '''
+  Return a copy of the cached mol (or cell if pbc=True) object built from the
+  geometry and basis set data in fch. The object is built by build(fch) when
+  it is not found in the cache. A copy is returned such that modifications
+  (e.g. cell.a, mol.verbose) do not affect the cached object.
+  '''
+  if _mol_cache_size == 0:
+    return build(fch)
+  key = (pbc, fch.digest(MOL_KEYS))
+  if key in _mol_cache:
+    _mol_cache.move_to_end(key)
+  else:
+    _mol_cache[key] = build(fch)
+    while len(_mol_cache) > _mol_cache_size:
+      _mol_cache.popitem(last=False)
+  return _mol_cache[key].copy()
+
+
+def load_mol_from_fch(fchname, cache=True):
+  '''
+  Load the PySCF mol object from a specified Gaussian .fch(k) file. fchname
+  can be either a filename or an FchFile object. Basis set and ECP data are
+  parsed in process, no temporary file would be generated.
+  Built mol objects are kept in an LRU cache keyed by the geometry and basis
+  set data, so loading .fch files sharing the same molecule (e.g. HF, LMO and
+  UNO files) builds the mol object only once. Use cache=False to force
+  rebuilding, set_mol_cache_size() to change the size of the cache, and
+  clear_mol_cache() to empty it.
 
   Simple usage::
   >>> from pyscf import scf
@@ -62,51 +409,35 @@ def load_mol_from_fch(fchname):
   >>> mf = scf.RHF(mol)
   >>> mf.kernel()
   '''
-  import sys, importlib
-  from mokit.lib.rwwfn import find_and_del_pyc
+  fch = load_fch(fchname)
+  if cache:
+    return _cached_mol(fch, False, _build_mol_from_fch)
+  return _build_mol_from_fch(fch)
 
-  proname = 'gau'+str(random.randint(1,10000))
-  tmp_fch = proname+'.fch'
-  tmp_py  = proname+'.py'
-  shutil.copyfile(fchname, tmp_fch)
-  with os.popen('bas_fch2py '+tmp_fch+' -obj') as run:
-    null = run.read()
-  os.remove(tmp_fch)
-
-  # Some machine/environment might not recognize that tmp_py is now in the
-  # current directory since it is generated just now. Update `sys.path` such
-  # that tmp_py can be found in the current directory.
-  importlib.invalidate_caches()
-
-  # There is a special case that the target Python script is not in the current
-  # directory and it is called via an absolute path, e.g.
-  #   `python ~/software/ris/main.py -f mol.fch`
-  # `sys.path` does not include the path of mol.fch in such case, so the error
-  # "ModuleNotFoundError: No module named 'gauxxx'" will probably occur. To
-  # solve this problem, we can add the directory of tmp_py into `sys.path`.
-  cur_dir = os.path.dirname(os.path.abspath(tmp_py))
-  if sys.path[0]=='' or not os.path.samefile(sys.path[0], cur_dir):
-    sys.path.insert(0, cur_dir)
-  # When the user simply starts Python from the current terminal like
-  #  >>> python
-  #  >>> from mokit.lib.gaussian import uno
-  # sys.path[0] is empty '' in such case, and it cannot be used in os.path.samefile,
-  # so two conditions are needed above.
-
-  # now we can import
-  molpy = importlib.import_module(proname)
-  os.remove(tmp_py)
-  find_and_del_pyc(proname, sys.version)
-  # It is not appropriate to delete the whole `__pycache__` directory since
-  # other process(es) might be using this directory. Only the .pyc file (e.g.
-  # gau5141.cpython-39.pyc) would be deleted.
-  return molpy.mol
-
-
-def load_mol_from_molden(molden, program):
+
+def _build_mol_from_fch(fch):
+  from pyscf import gto
+
+  mol = gto.Mole()
+  mol.atom, mol.basis, ecp, cart = _atom_basis_ecp_from_fch(fch)
+  if len(ecp) > 0:
+    mol.ecp = ecp
+  mol.charge = fch.charge
+  mol.spin = fch.mult - 1
+  mol.verbose = 4
+  mol.cart = cart
+  mol.build(parse_arg=False)
+  return mol
+
+
+def load_mol_from_molden(molden, program, cache=True):
   '''
   Load the PySCF mol object from a specified .molden file. Be careful that
   .molden file does not have any ECP/PP data.
+  For program='cp2k'/'orca'/'molpro', the .molden file is parsed in process
+  (see MoldenFile in moldenfile.py), no temporary file would be generated. For
+  other programs, the utility molden2fch is called and the .fch file is kept.
+  Like load_mol_from_fch, mol objects are cached unless cache=False.
 
   Simple usage::
   >>> from pyscf import scf
@@ -114,19 +445,41 @@ def load_mol_from_molden(molden, program):
   >>> mol = load_mol_from_molden(molden='benzene.molden',program='orca')
   >>> mf = scf.RHF(mol).run()
   '''
+  from mokit.lib.moldenfile import MoldenFile, PROGRAMS
+
+  if program.lower() in PROGRAMS:
+    return load_mol_from_fch(MoldenFile(molden, program), cache)
   with os.popen('molden2fch '+molden+' -'+program.lower()) as run:
     null = run.read()
   fchname = molden[0:molden.rindex('.molden')]+'.fch'
-  mol = load_mol_from_fch(fchname)
+  mol = load_mol_from_fch(fchname, cache)
   return mol
 
 
-def load_cell_from_fch(fchname):
+def load_cell_from_molden(molden, program='cp2k', cache=True):
+  '''
+  Load the PySCF cell object from a specified .molden file, which is parsed in
+  process (see MoldenFile in moldenfile.py). program can be 'cp2k', 'orca' or
+  'molpro'. Like load_cell_from_fch, the lattice vectors are set to 100.0 A
+  temporarily, and one should set cell.a appropriately and call cell.build.
+
+  Simple usage::
+  >>> from mokit.lib.gaussian import load_cell_from_molden
+  >>> cell = load_cell_from_molden('water64-MOS-1_0.molden')
+  >>> cell.a = np.eye(3)*12.42
+  >>> cell.build(parse_arg=False)
+  '''
+  from mokit.lib.moldenfile import MoldenFile
+
+  return load_cell_from_fch(MoldenFile(molden, program), cache)
+
+
+def load_cell_from_fch(fchname, cache=True):
   '''
   Load the PySCF cell object from a specified Gaussian .fch(k) file. This file
   is supposed to include the wave function of an isolated molecule. The true PBC
   Gaussian .fch file is not supported currently. Since the lattice vectors are
-  unknown, they will be set to 50.0 A temporarily. One should set cell.a
+  unknown, they will be set to 100.0 A temporarily. One should set cell.a
   appropriately and call cell.build after using this function. See pbc_loc()
   below for an example.
 
@@ -138,79 +491,374 @@ def load_cell_from_fch(fchname):
   >>> cell.build(parse_arg=False)
   >>> mf = scf.RHF(cell)
   >>> mf.kernel()
+
+  Like load_mol_from_fch, cell objects are cached unless cache=False.
   '''
-  import sys, importlib
-  from mokit.lib.rwwfn import find_and_del_pyc
+  fch = load_fch(fchname)
+  if cache:
+    return _cached_mol(fch, True, _build_cell_from_fch)
+  return _build_cell_from_fch(fch)
 
-  proname = 'gau'+str(random.randint(1,10000))
-  tmp_fch = proname+'.fch'
-  tmp_py  = proname+'.py'
-  shutil.copyfile(fchname, tmp_fch)
-  with os.popen('bas_fch2py '+tmp_fch+' -pbc -obj') as run:
-    null = run.read()
-  os.remove(tmp_fch)
 
-  importlib.invalidate_caches() # important
-  cellpy = importlib.import_module(proname)
-  os.remove(tmp_py)
-  find_and_del_pyc(proname, sys.version)
-  return cellpy.cell
+def _build_cell_from_fch(fch):
+  from pyscf.pbc import gto as pgto
+
+  cell = pgto.Cell()
+  cell.atom, cell.basis, ecp, cart = _atom_basis_ecp_from_fch(fch)
+  if len(ecp) > 0:
+    cell.ecp = ecp
+  cell.charge = 0
+  cell.spin = fch.mult - 1
+  cell.pseudo = 'gth-pbe'
+  cell.verbose = 3
+  cell.a = np.eye(3)*100.0
+  cell.cart = cart
+  return cell
 
 
 def mo_fch2py(fchname):
   '''
-  Read MOs from a given Gaussian .fch(k) file, and convert MOs for usage in PySCF
+  Read MOs from a given Gaussian .fch(k) file, and convert MOs for usage in PySCF.
+  fchname can be either a filename or an FchFile object.
 
   Simple usage::
   >>> from mokit.lib.gaussian import mo_fch2py
   >>> mf.mo_coeff = mo_fch2py('h2o.fch')
   '''
-  from mokit.lib.qchem import read_hf_type_from_fch
-  from mokit.lib.fch2py import fch2py, fch2py_cghf
+  from mokit.lib.fch2py import fch2py_cghf
 
-  nbf, nif = read_nbf_and_nif_from_fch(fchname)
-  ihf = read_hf_type_from_fch(fchname)
+  fch = load_fch(fchname)
+  nbf, nif = fch.nbf, fch.nif
+  ihf = fch.hf_type
   # 1/2/7/101 for real RHF, real UHF, complex GHF, real ROHF, respectively
 
   if ihf==1 or ihf==101: # real RHF, ROHF
-    mo = fch2py(fchname, nbf, nif, 'a')
+    mo = fch.mo('a')
   elif ihf == 2:         # real UHF
-    mo_a = fch2py(fchname, nbf, nif, 'a')
-    mo_b = fch2py(fchname, nbf, nif, 'b')
-    mo = (mo_a, mo_b)
+    mo = (fch.mo('a'), fch.mo('b'))
   elif ihf == 7:         # complex GHF
-    mo = fch2py_cghf(fchname, 2*nbf, 2*nif)
+    mo = fch2py_cghf(fch.fchname, 2*nbf, 2*nif)
   else:
     raise ValueError('Confused HF_type.')
   return mo
 
 
-def loc(fchname, idx, method='pm', alpha=True, center_xyz=None, ions_centers=False,
-        dis_tol=17.0, conv_tol=1e-5):
+_para_nmo_cache = {}
+
+def get_para_nmo(nthreads=None, nmo=None):
   '''
-  Perform orbital localization for a specified set of orbitals in a given
-  Gaussian .fch(k) file.
+  Return the number of orbitals from which the OpenMP parallel (ring ordered)
+  Jacobi 2*2 rotations are faster than serial ones in Boys/PM localization. It
+  is found by timing one sweep on random integrals of 50, 100, ..., 400
+  orbitals (a few seconds), and cached for each number of threads. This is
+  only used when para_nmo='auto' is given explicitly (see loc_para()).
+  500 (the default cutoff) is returned without timing if there is only 1
+  thread, or if nmo (the number of orbitals to be localized) is given and out
+  of the timed range, for which the result hardly matters.
+  nthreads: the number of OpenMP threads, default the current one
+  '''
+  from mokit.lib.lo import get_loc_para, set_loc_para, time_jacobi_sweep
+
+  para_nmo0, nthreads0 = get_loc_para()
+  if nthreads is None:
+    nthreads = nthreads0
+  if nthreads < 2:
+    return 500
+  if nmo is not None and (nmo < 50 or nmo > 400):
+    return 500
+  if nthreads in _para_nmo_cache:
+    return _para_nmo_cache[nthreads]
+
+  para_nmo = 500
+  set_loc_para(para_nmo0, nthreads)
+  try:
+    for nmo in (50, 100, 200, 300, 400):
+      t_serial = min(time_jacobi_sweep(nmo, False) for i in range(3))
+      t_para = min(time_jacobi_sweep(nmo, True) for i in range(3))
+      if t_para < 0.9*t_serial:
+        para_nmo = nmo
+        break
+  finally:
+    set_loc_para(para_nmo0, nthreads0)
+  _para_nmo_cache[nthreads] = para_nmo
+  return para_nmo
+
+
+@contextmanager
+def loc_para(para_nmo=500, nthreads=None, nmo=None):
+  '''
+  Temporarily set the serial/parallel cutoff of Jacobi 2*2 rotations (Boys/PM
+  localization uses parallel rotations if nmo>=para_nmo) and the number of
+  OpenMP threads of localization routines. para_nmo='auto' means the value
+  from get_para_nmo(nthreads, nmo), which may time Jacobi sweeps once.
+  nthreads=None keeps the current number of threads.
+  '''
+  from mokit.lib.lo import get_loc_para, set_loc_para
+
+  para_nmo0, nthreads0 = get_loc_para()
+  if para_nmo == 'auto':
+    para_nmo = get_para_nmo(nthreads, nmo)
+  set_loc_para(para_nmo, 0 if nthreads is None else nthreads)
+  try:
+    yield
+  finally:
+    set_loc_para(para_nmo0, nthreads0)
+
+
+@contextmanager
+def loc_verbose(verbose=True):
+  '''
+  Temporarily turn on/off the printing (e.g. niter=, sum_change=) of orbital
+  localization routines in lo.f90. Errors and warnings are always printed.
+  '''
+  from mokit.lib.lo import set_loc_verbose
+
+  verbose0 = set_loc_verbose(int(verbose))
+  try:
+    yield
+  finally:
+    set_loc_verbose(verbose0)
+
+
+# per-iteration records of orbital localization, see get_loc_info()
+LOC_HIST_DTYPE = np.dtype([('change', 'f8'), ('npair', 'i8'), ('time', 'f8'),
+                           ('nthreads', 'i4')])
+
+def get_loc_info():
+  '''
+  Return a dict of convergence information of the last Jacobi 2*2 rotations
+  (Boys/PM/Berry) in lo.f90, with keys 'niter', 'converged', 'tot_change' (the
+  total change of the target function) and 'history'. history is a NumPy
+  structured array (niter,) of dtype LOC_HIST_DTYPE, i.e. for each iteration:
+   change: change of the target function
+   npair: the number of 2*2 rotations tried, i.e. MO pairs after distance
+    screening (the ring ordering of parallel rotations visits each pair twice),
+    0 for a DIIS extrapolation step
+   time: wall time (s)
+   nthreads: the number of OpenMP threads (0 for the quasi-Newton solver)
+
+  Simple usage::
+  >>> from mokit.lib.gaussian import get_loc_info
+  >>> info = get_loc_info()
+  >>> print(info['niter'], info['history']['time'].sum())
+  '''
+  from mokit.lib.lo import get_loc_conv_info, get_loc_hist
+
+  niter, tot_change, converged = get_loc_conv_info()
+  niter = int(niter)
+  hist = get_loc_hist(niter)
+  history = np.zeros(niter, dtype=LOC_HIST_DTYPE)
+  for k, name in enumerate(LOC_HIST_DTYPE.names):
+    history[name] = hist[k]
+  return {'niter': niter, 'converged': bool(converged),
+          'tot_change': float(tot_change), 'history': history}
+
+
+def resemble_lmo(mol, mo, mol_ref, lmo_ref):
+  '''
+  Rotate MOs (nbf,nmo) of mol within their own span to resemble LMOs (nbf_ref,
+  nmo) of a reference mol_ref, e.g. LMOs of the previous frame of a trajectory
+  or a scan. The geometries (and basis sets) can be slightly different. The
+  result is a good initial guess of localization, which usually converges in a
+  few sweeps. mol/mol_ref can be both molecules or both cells (gamma-point).
+
+  Simple usage::
+  >>> from mokit.lib.gaussian import resemble_lmo
+  >>> lmo_ini = resemble_lmo(mol, mo[:,idx], mol0, lmo0[:,idx])
+  '''
+  from mokit.lib.rwwfn import orb_resemble_ref1
+
+  nbf, nmo = mo.shape
+  nbf_ref, nmo_ref = lmo_ref.shape
+  if nmo != nmo_ref:
+    raise ValueError(f'The number of reference LMOs {nmo_ref} is not equal to the number of MOs {nmo}.')
+
+  if hasattr(mol, 'pbc_intor'):
+    from pyscf.pbc.gto.cell import intor_cross
+  else:
+    from pyscf.gto import intor_cross
+  cross_s = intor_cross('int1e_ovlp', mol, mol_ref)
+  return orb_resemble_ref1(nbf, nmo, mo, nbf_ref, nmo, lmo_ref, cross_s)
+
+
+def partition_orbitals(mo, S, bfirst, dis, cluster_nmo):
+  '''
+  Partition orbitals (nbf,nmo), which are (roughly) localized, e.g. initial
+  guess LMOs, into spatially compact clusters of about cluster_nmo orbitals.
+  Each orbital is assigned to the atom with the largest Mulliken population on
+  it, then atoms are clustered using the inter-atomic distance matrix dis
+  (natom,natom), i.e. farthest point seeds followed by k-medoids iterations
+  weighted by the number of orbitals on each atom. So the PBC distance matrix
+  can be used as well.
+  S: AO-basis overlap integrals (nbf,nbf)
+  bfirst: (natom+1) the first basis function (starts from 1) of each atom, and
+   nbf+1 at the end
+  Return a list of index arrays (start from 0) of orbitals in each cluster.
+
+  Simple usage::
+  >>> from mokit.lib.gaussian import partition_orbitals
+  >>> clusters = partition_orbitals(lmo_ini, S, bfirst, dis, 200)
+  '''
+  nbf, nmo = mo.shape
+  natom = dis.shape[0]
+  nclus = int(np.ceil(nmo/cluster_nmo))
+  if nclus < 2:
+    return [np.arange(nmo)]
+
+  # Mulliken populations of orbitals on atoms (natom,nmo)
+  pop = np.zeros((nbf+1,nmo))
+  np.cumsum(mo*np.dot(S, mo), axis=0, out=pop[1:])
+  atm_pop = pop[bfirst[1:]-1] - pop[bfirst[:-1]-1]
+  owner = np.argmax(atm_pop, axis=0)
+
+  weight = np.bincount(owner, minlength=natom).astype(float)
+  host = np.flatnonzero(weight)
+  nclus = min(nclus, host.size)
+  d = dis[np.ix_(host,host)]
+  w = weight[host]
+  seeds = [int(np.argmax(w))]
+  min_d = d[seeds[0]].copy()
+  for k in range(1, nclus):
+    seeds.append(int(np.argmax(min_d)))
+    min_d = np.minimum(min_d, d[seeds[-1]])
+  for it in range(20):
+    label = np.argmin(d[:,seeds], axis=1)
+    new_seeds = []
+    for k in range(nclus):
+      m = np.flatnonzero(label == k)
+      if m.size == 0:
+        new_seeds.append(seeds[k])
+      else:
+        new_seeds.append(int(m[np.argmin(np.dot(d[np.ix_(m,m)], w[m]))]))
+    if new_seeds == seeds:
+      break
+    seeds = new_seeds
+
+  atm_label = np.zeros(natom, dtype=int)
+  atm_label[host] = np.argmin(d[:,seeds], axis=1)
+  orb_label = atm_label[owner]
+  clusters = [np.flatnonzero(orb_label == k) for k in range(nclus)]
+  return [c for c in clusters if c.size > 0]
+
+
+# (solve, args) of the worker processes of _localize_by_clusters
+_cluster_solve = None
+
+def _init_cluster_worker(solve):
+  from mokit.lib.lo import get_loc_para, set_loc_para
+
+  global _cluster_solve
+  _cluster_solve = solve
+  # one OpenMP thread per process, unless nthreads is given
+  para_nmo, nthreads = get_loc_para()
+  set_loc_para(para_nmo, 1)
+
+
+def _localize_cluster(lmo):
+  func, args = _cluster_solve
+  return func(lmo, *args)[0]
+
+
+def _localize_by_clusters(lmo, clusters, solve, nproc=1):
+  '''
+  Localize orbitals of each cluster independently, by func(lmo[:,c], *args)
+  where (func, args) = solve, which returns (LMOs, info). Clusters are distributed over nproc processes if
+  nproc>1. Return the updated copy of lmo.
+  '''
+  lmo = lmo.copy()
+  if nproc>1 and len(clusters)>1:
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(min(nproc,len(clusters)), initializer=_init_cluster_worker,
+                             initargs=(solve,)) as pool:
+      # larger clusters first, for better load balance
+      order = sorted(range(len(clusters)), key=lambda k: -clusters[k].size)
+      res = pool.map(_localize_cluster, [lmo[:,clusters[k]] for k in order])
+      for k, x in zip(order, res):
+        lmo[:,clusters[k]] = x
+  else:
+    func, args = solve
+    for c in clusters:
+      lmo[:,c] = func(lmo[:,c], *args)[0]
+  return lmo
+
+
+def _mol_loc_solve(lmo_ini, mol, method, ao_dip, dis_tol, conv_tol, max_memory,
+                   solver, DIIS, para_nmo, nthreads, verbose):
+  # Boys/PM localization of orbitals lmo_ini (nbf,nmo) of a molecule, return
+  # (LMOs, info)
+  from mokit.lib.auto import loc_driver
+
+  return loc_driver(mol, lmo_ini, lmo_ini.shape[1], method=method, ao_dip=ao_dip,
+                    dis_tol=dis_tol, conv_tol=conv_tol, max_memory=max_memory,
+                    solver=solver, return_info=True, DIIS=DIIS,
+                    para_nmo=para_nmo, nthreads=nthreads, verbose=verbose)
+
+
+def localize(mol, mo, idx=None, method='pm', dis_tol=17.0, conv_tol=1e-5,
+             return_centers=False, return_info=False, ints=None, max_memory=4000,
+             solver='jacobi', DIIS=False, para_nmo=500, nthreads=None,
+             lmo_ref=None, mol_ref=None, cluster_nmo=None, nproc=1,
+             verbose=True):
+  '''
+  Perform orbital localization for a specified set of orbitals, in memory. The
+  MOs (nbf,nif) are in PySCF AO order, and no file is read or written.
   (The following 1e AO-basis integrals are computed using PySCF:
    1) overlap integrals for Pipek-Mezey localization;
    2) dipole integrals for Boys localization.)
   The method can be either 'pm' or 'boys'. This function/module is designed for
   isolated molecules. For PBC systems, please use pbc_loc() instead.
-  dis_tol=17.0 A for Boys, water64 cluster
-  dis_tol=26.5 A for Boys, water128 cluster
-  dis_tol=24.5 A for PM, water128 cluster
+  idx: indices (start from 0) of orbitals to be localized, default all
+  return_centers: also return LMO centers (3,nmo) in Angstrom
+  return_info: also return a dict of convergence information, i.e. 'niter',
+   'converged', 'tot_change' (the total change of the target function) and
+   'history' (per-iteration records, see get_loc_info()), and 'nclusters' if
+   cluster_nmo is used
+  ints: an AOIntegrals object of mol, which provides the (cached) integrals
+  max_memory: memory budget (MB) of the PM gross population tensor. When the
+   dense tensor (natom,nmo,nmo) exceeds it, a sparse algorithm is used.
+  solver: 'jacobi' (successive 2*2 rotations) or 'qn' (quasi-Newton steps with
+   a trust radius, rotating all orbitals at once)
+  DIIS: accelerate the 'jacobi' solver of Boys by DIIS extrapolation of
+   accumulated rotations, which mainly reduces the number of cycles in the slow
+   tail of convergence. Only used when there are >=10 orbitals. Not used for
+   PM, which would re-calculate the whole gross population tensor at each
+   extrapolation.
+  para_nmo: use OpenMP parallel Jacobi rotations if the number of orbitals
+   >= para_nmo. 'auto' means the cutoff chosen by a micro-benchmark (see
+   get_para_nmo()), which costs a few seconds once per number of threads
+  nthreads: the number of OpenMP threads, default unchanged
+  lmo_ref: reference LMOs (nbf_ref,nmo), e.g. LMOs of the previous frame of a
+   trajectory or a scan. If given, the initial guess is obtained by rotating
+   mo[:,idx] to resemble lmo_ref (see resemble_lmo()) instead of projecting
+   onto atomic orbitals, and only a few sweeps are usually needed.
+  mol_ref: the molecule of lmo_ref, default mol
+  cluster_nmo: divide-and-conquer localization for large systems. If there are
+   more than cluster_nmo orbitals, initial guess orbitals are partitioned into
+   spatial clusters of about cluster_nmo orbitals (see partition_orbitals()),
+   which are localized independently, followed by global sweeps to clean up
+   the boundaries of clusters. Default None, i.e. all orbitals at once.
+  nproc: the number of processes to localize clusters (1 OpenMP thread each,
+   unless nthreads is given)
+  verbose: False to turn off the printing of localization routines
+  Return a copy of mo, in which columns idx are replaced by LMOs, followed by
+  centers and/or info if required.
 
   Simple usage::
   >>> # perform Pipek-Mezey localization for occupied PI orbitals of benzene
-  >>> # a file named benzene_rhf_LMO.fch will be created
-  >>> from mokit.lib.gaussian import loc
-  >>> loc(fchname='benzene_rhf.fch',idx=range(6,21))
+  >>> from mokit.lib.gaussian import localize
+  >>> mf.mo_coeff = localize(mol, mf.mo_coeff, idx=range(6,21))
+  >>> lmo, centers, info = localize(mol, mf.mo_coeff, range(6,21), 'boys',
+  ...                               return_centers=True, return_info=True)
+  >>> # silently, then check the time of each iteration
+  >>> lmo, info = localize(mol, mf.mo_coeff, range(6,21), return_info=True,
+  ...                      verbose=False)
+  >>> print(info['history']['time'])
+  >>> # localize 2000 orbitals in clusters of about 300, using 4 processes
+  >>> mf.mo_coeff = localize(mol, mf.mo_coeff, range(2000), 'boys',
+  ...                        cluster_nmo=300, nproc=4)
   '''
-  import time
   from mokit.lib.auto import loc_ini_guess, loc_driver
-  from mokit.lib.rwgeom import periodic_table as pt
-  from mokit.lib.rwgeom import read_elem_and_coor_from_fch
 
-  t0 = time.perf_counter()
   if dis_tol < 0.1:
     raise ValueError('dis_tol must be a reasonable and positive float number')
 
@@ -219,39 +867,145 @@ def loc(fchname, idx, method='pm', alpha=True, center_xyz=None, ions_centers=Fal
   elif conv_tol < 1e-8:
     raise ValueError('conv_tol must be >= 1e-8')
 
-  if alpha:
-    spin = 'a'
-  else:
-    spin = 'b'
+  if method != 'pm' and method != 'boys':
+    raise ValueError(f'Localization method {method} cannot be recognized.')
 
-  fchname1 = fchname[0:fchname.rindex('.fch')]+'_LMO.fch'
-  mol = load_mol_from_fch(fchname)
-  nbf, nif = read_nbf_and_nif_from_fch(fchname)
-  mo = fch2py(fchname, nbf, nif, spin)
+  mo = np.array(mo)
+  if idx is None:
+    idx = range(mo.shape[1])
+  idx = np.asarray(idx)
   nmo = len(idx)
-  print('\nOrbital range:', idx)
 
-  natom = mol.natm
+  if ints is None:
+    ints = AOIntegrals(mol)
   # generate initial guess orbitals (which are unitary transformation of
   # original orbitals)
-  nmo1, lmo_ini = loc_ini_guess(mol, mo[:,idx], nmo)
-
-  if method == 'boys' or center_xyz is not None:
-    center, ao_dip = get_ao_dip(mol)
-    center *= BOHR2ANG
-    ao_dip *= BOHR2ANG
+  if lmo_ref is None:
+    with loc_verbose(verbose):
+      nmo1, lmo_ini = loc_ini_guess(mol, mo[:,idx], nmo, ints=ints)
+  else:
+    if mol_ref is None:
+      mol_ref = mol
+    lmo_ini = resemble_lmo(mol, mo[:,idx], mol_ref, np.asarray(lmo_ref))
+
+  if method == 'boys' or return_centers:
+    center, ao_dip = get_ao_dip(mol, ints=ints)
+    center = center*BOHR2ANG
+    ao_dip = ao_dip*BOHR2ANG
   else:
     ao_dip = None
 
-  lmo = loc_driver(mol, lmo_ini, nmo, method=method, ao_dip=ao_dip, dis_tol=dis_tol,
-                   conv_tol=conv_tol)
-
-  if center_xyz is not None:   # print LMO centers into xyz
+  if cluster_nmo is not None and nmo > cluster_nmo:
+    from pyscf import gto
+    bfirst = np.ones(mol.natm+1, dtype=np.int32)
+    bfirst[1:] = mol.aoslice_by_atom()[:,3] + 1
+    dis = BOHR2ANG*gto.inter_distance(mol)
+    clusters = partition_orbitals(lmo_ini[:,:nmo], ints.ovlp(), bfirst, dis,
+                                  cluster_nmo)
+    args = (mol, method, ao_dip, dis_tol, conv_tol, max_memory, solver, DIIS,
+            para_nmo, nthreads, verbose)
+    lmo_ini = _localize_by_clusters(lmo_ini[:,:nmo], clusters,
+                                    (_mol_loc_solve, args), nproc)
+  else:
+    clusters = None
+
+  lmo, info = loc_driver(mol, lmo_ini, nmo, method=method, ao_dip=ao_dip,
+                         dis_tol=dis_tol, conv_tol=conv_tol, ints=ints,
+                         max_memory=max_memory, solver=solver, return_info=True,
+                         DIIS=DIIS, para_nmo=para_nmo, nthreads=nthreads,
+                         verbose=verbose)
+  if clusters is not None:
+    info['nclusters'] = len(clusters)
+  mo[:,idx] = lmo
+
+  res = [mo]
+  if return_centers:
     mo_center = np.einsum('ui,xuv,vi->xi', lmo, ao_dip, lmo, optimize=True)
     # np.einsum with optimize=True seems slightly faster than calc_ctdc_diag
-    for i in range(nmo):
-      mo_center[:,i] = mo_center[:,i] + center
+    res.append(mo_center + center[:,None])
+  if return_info:
+    res.append(info)
+  if len(res) == 1:
+    return mo
+  return tuple(res)
+
+
+def loc(fchname, idx, method='pm', alpha=True, center_xyz=None, ions_centers=False,
+        dis_tol=17.0, conv_tol=1e-5, max_memory=4000, solver='jacobi',
+        DIIS=False, para_nmo=500, nthreads=None, ref_fch=None,
+        cluster_nmo=None, nproc=1, verbose=True, return_info=False):
+  '''
+  Perform orbital localization for a specified set of orbitals in a given
+  Gaussian .fch(k) file. This is a file wrapper of localize(): MOs are read from
+  fchname, and LMOs are written into a new file *_LMO.fch.
+  The method can be either 'pm' or 'boys'. This function/module is designed for
+  isolated molecules. For PBC systems, please use pbc_loc() instead.
+  fchname can be either a filename or an FchFile object.
+  max_memory (MB), solver, DIIS, para_nmo, nthreads, cluster_nmo, nproc,
+   verbose: see localize().
+  return_info: return a dict of convergence information (see localize()), with
+   an additional key 'time', i.e. the total wall time (s)
+  ref_fch: a .fch file holding reference LMOs in columns idx, e.g. *_LMO.fch of
+   the previous frame of a trajectory or a scan. If given, the initial guess is
+   obtained by rotating MOs to resemble them (see resemble_lmo()).
+  dis_tol=17.0 A for Boys, water64 cluster
+  dis_tol=26.5 A for Boys, water128 cluster
+  dis_tol=24.5 A for PM, water128 cluster
+
+  Simple usage::
+  >>> # perform Pipek-Mezey localization for occupied PI orbitals of benzene
+  >>> # a file named benzene_rhf_LMO.fch will be created
+  >>> from mokit.lib.gaussian import loc
+  >>> loc(fchname='benzene_rhf.fch',idx=range(6,21))
+  >>> # warm start from LMOs of the previous point of a scan
+  >>> loc(fchname='benzene_rhf2.fch',idx=range(6,21),ref_fch='benzene_rhf_LMO.fch')
+  >>> # no printing, return per-iteration records instead
+  >>> info = loc('benzene_rhf.fch', range(6,21), verbose=False, return_info=True)
+  '''
+  import time
+  from mokit.lib.rwgeom import periodic_table as pt
+  from mokit.lib.rwgeom import read_elem_and_coor_from_fch
+
+  t0 = time.perf_counter()
+  if alpha:
+    spin = 'a'
+  else:
+    spin = 'b'
+
+  fch = load_fch(fchname)
+  fchname = fch.fchname
+  fchname1 = fchname[0:fchname.rindex('.fch')]+'_LMO.fch'
+  mol = load_mol_from_fch(fch)
+  nbf, nif = fch.nbf, fch.nif
+  nmo = len(idx)
+  if verbose:
+    print('\nOrbital range:', idx)
+
+  if ref_fch is None:
+    mol_ref = lmo_ref = None
+  else:
+    ref = load_fch(ref_fch)
+    mol_ref = load_mol_from_fch(ref)
+    lmo_ref = ref.mo(spin)[:,idx]
+
+  if center_xyz is None:
+    mo, info = localize(mol, fch.mo(spin), idx, method=method, dis_tol=dis_tol,
+                        conv_tol=conv_tol, return_info=True,
+                        max_memory=max_memory, solver=solver, DIIS=DIIS,
+                        para_nmo=para_nmo, nthreads=nthreads, lmo_ref=lmo_ref,
+                        mol_ref=mol_ref, cluster_nmo=cluster_nmo, nproc=nproc,
+                        verbose=verbose)
+  else:                        # print LMO centers into xyz
+    mo, mo_center, info = localize(mol, fch.mo(spin), idx, method=method,
+                                   dis_tol=dis_tol, conv_tol=conv_tol,
+                                   return_centers=True, return_info=True,
+                                   max_memory=max_memory, solver=solver,
+                                   DIIS=DIIS, para_nmo=para_nmo,
+                                   nthreads=nthreads, lmo_ref=lmo_ref,
+                                   mol_ref=mol_ref, cluster_nmo=cluster_nmo,
+                                   nproc=nproc, verbose=verbose)
     if ions_centers is True:
+      natom = mol.natm
       k = natom + nmo
       elem = np.full(k, 'X ', dtype='U2')
       elem0, nuc, coor0, ch, mu = read_elem_and_coor_from_fch(fchname, natom)
@@ -264,15 +1018,18 @@ def loc(fchname, idx, method='pm', alpha=True, center_xyz=None, ions_centers=Fal
       elem = np.full(nmo, 'X ', dtype='U2')
       pt.write_xyz(nmo, elem, mo_center, center_xyz, np.zeros((3,3)))
 
-  mo[:,idx] = lmo.copy()
   noon = np.zeros(nif)
   shutil.copyfile(fchname, fchname1)
   py2fch(fchname1, nbf, nif, mo, spin, noon, False, False)
-  print('Localized orbitals exported to file '+fchname1)
 
   t1 = time.perf_counter()
   elapsed_time = t1 - t0
-  print(f"Localization time(sec): {elapsed_time:.2f}", flush=True)
+  if verbose:
+    print('Localized orbitals exported to file '+fchname1)
+    print(f"Localization time(sec): {elapsed_time:.2f}", flush=True)
+  if return_info:
+    info['time'] = elapsed_time
+    return info
 
 
 def get_db_idx_from_molden(molden, on_thres=1e-6):
@@ -288,35 +1045,10 @@ def get_db_idx_from_molden(molden, on_thres=1e-6):
   return np.where(occ > 2.0-on_thres)[0]
 
 
-def pbc_loc(molden, box, method='berry', wannier_xyz=None, ions_centers=False,
-            mo_idx=None, proj_list=None, dis_tol=27.0, conv_tol=1e-5,
-            init_guess='atomic', maxcyc=1499, DIIS=False, save_lmo=False,
-            old_fch=None):
-  '''
-  Perform orbital localization for a specified set of orbitals in a given
-  CP2K .molden file. The method can be either 'berry' or 'pm'.
-  dis_tol=17.0/27.0 are sufficient for water / SnO2-H2O, respectively.
-  Current limitations:
-   1) only gamma-point; 2) only CP2K molden; 3) only Alpha spin.
-  Only cubic cells have been tested so far.
-  dis_tol=10.0 A for Berry, water128 box
-  dis_tol= 9.5 A for Berry, water512 box
-  dis_tol=27.0 A for Berry, SnO2-H2O box
-
-  Simple usage::
-  >>> # perform Boys orbital localization for water64 box
-  >>> from mokit.lib.gaussian import pbc_loc
-  >>> pbc_loc('water64-MOS-1_0.molden',box=np.eye(3)*12.42)
-  '''
-  import time
-  from pyscf.pbc.df.ft_ao import ft_aopair
+def _check_pbc_loc_args(box, dis_tol, conv_tol, solver):
+  # check arguments of pbc_loc/pbc_loc_trajectory, return lattice vectors
   from mokit.lib.rwwfn import read_lat_vec_from_file
-  from mokit.lib.rwgeom import periodic_table as pt
-  from mokit.lib.rwgeom import read_elem_and_coor_from_fch
-  from mokit.lib.lo import gen_loc_ini_guess, berry, boys, pm, \
-                           calc_dis_mat_from_coor_pbc
 
-  t0 = time.perf_counter()
   if dis_tol < 0.1:
     raise ValueError('dis_tol must be a reasonable and positive float number')
 
@@ -325,6 +1057,9 @@ def pbc_loc(molden, box, method='berry', wannier_xyz=None, ions_centers=False,
   elif conv_tol < 1e-8:
     raise ValueError('conv_tol must be >= 1e-8')
 
+  if solver not in ('jacobi', 'qn'):
+    raise ValueError(f'Localization solver {solver} cannot be recognized.')
+
   # determine the lattice vectors
   if isinstance(box, np.ndarray):
     lat_vec = box
@@ -332,28 +1067,41 @@ def pbc_loc(molden, box, method='berry', wannier_xyz=None, ions_centers=False,
     lat_vec = read_lat_vec_from_file(box)
   else:
     raise ValueError('datatype of box cannot be identified.')
+  return lat_vec
 
-  proname = molden[0:molden.rindex('.molden')]
-  fchname = proname+'.fch'
-  lmo_fch = proname+'_LMO.fch'
-  if wannier_xyz is None:
-    wannier_xyz = proname+'_wannier.xyz'
-
-  if old_fch is None:
-    with os.popen('molden2fch '+molden+' -cp2k') as run:
-      null = run.read()
-  else:
-    fchname = old_fch
 
+def _load_wrapped_cell(fchname, lat_vec):
+  # load the cell from fchname with lattice vectors lat_vec, and wrap atoms
+  # outside the box back into the box, which can save memory and avoid linear
+  # dependency of ao_ovlp in PySCF
   cell = load_cell_from_fch(fchname)
   cell.a = lat_vec
   coor, cell = wrap_atoms_into_cell(cell)
-  # wrap atoms outside the box back into the box, which can save memory and avoid
-  # linear dependency of ao_ovlp in PySCF
   cell.build(parse_arg=False)
+  return coor, cell
+
 
-  nbf, nif = read_nbf_and_nif_from_fch(fchname)
-  na, nmo = read_na_and_nb_from_fch(fchname)
+def _pbc_loc_frame(cell, coor, mo, nmo, method, mo_idx, proj_list, dis_tol,
+                   conv_tol, init_guess, maxcyc, DIIS, solver, para_nmo, nthreads,
+                   max_memory, ref=None, cluster_nmo=None, nproc=1,
+                   verbose=True):
+  # Orbital localization of one PBC frame, shared by pbc_loc and
+  # pbc_loc_trajectory. cell is built with wrapped atoms, coor (3,natom) are the
+  # wrapped Cartesian coordinates in Angstrom, mo (nbf,nif) are the Alpha MOs
+  # and nmo is the number of orbitals to be localized if mo_idx is None.
+  # ref=(ref_cell, ref_mo): reference LMOs for the initial guess (warm start).
+  # cluster_nmo, nproc: divide-and-conquer localization, see localize().
+  # Return (mo, mo_center, info), in which MOs are updated by LMOs, mo_center
+  # (3,nmo1) are LMO centers in Angstrom, info is the convergence information
+  # (see localize()).
+  from mokit.lib.rwwfn import calc_dis_mat_from_coor_pbc
+  from mokit.lib.lo import gen_loc_ini_guess
+
+  if method not in ('berry', 'pm'):
+    raise ValueError(f'Localization method {method} cannot be recognized.')
+
+  mo = mo.copy()
+  nbf = mo.shape[0]
   natom = cell.natm
   # Currently `gto.inter_distance` cannot be used here, since it calculates the
   # inter-atomic distances of an isolated molecule.
@@ -368,24 +1116,34 @@ def pbc_loc(molden, box, method='berry', wannier_xyz=None, ions_centers=False,
   else:
     chosen = np.zeros(natom, dtype=bool)
     chosen[proj_list] = True
-    print('LEN(proj_list)= %d' % len(proj_list))
+    if verbose:
+      print('LEN(proj_list)= %d' % len(proj_list))
 
-  print('Lattice vectors\n', lat_vec)
-  mo = fch2py(fchname, nbf, nif, 'a')
-  S = cell.pbc_intor('int1e_ovlp', hermi=1)
-  # do not use cell.intor_symmetric('int1e_ovlp') here, since it returns the AO
-  # overlap of an isolated molecule
+  ints = AOIntegrals(cell)
+  S = ints.ovlp()
 
   # generate initial guess orbitals (which are unitary transformation of
   # original orbitals)
-  if init_guess == 'atomic':
+  if ref is not None:
+    if proj_list is not None:
+      raise ValueError('proj_list cannot be used with reference LMOs')
+    ref_cell, ref_mo = ref
     if mo_idx is None:
-      nmo1, lmo_ini = gen_loc_ini_guess(natom, nbf, nmo, chosen, bfirst, S,
-                                        mo[:,:nmo])
+      mo_idx1 = range(nmo)
     else:
       nmo = len(mo_idx)
-      nmo1, lmo_ini = gen_loc_ini_guess(natom, nbf, nmo, chosen, bfirst, S,
-                                        mo[:,mo_idx])
+      mo_idx1 = mo_idx
+    nmo1 = nmo
+    lmo_ini = resemble_lmo(cell, mo[:,mo_idx1], ref_cell, ref_mo[:,mo_idx1])
+  elif init_guess == 'atomic':
+    with loc_verbose(verbose):
+      if mo_idx is None:
+        nmo1, lmo_ini = gen_loc_ini_guess(natom, nbf, nmo, chosen, bfirst, S,
+                                          mo[:,:nmo])
+      else:
+        nmo = len(mo_idx)
+        nmo1, lmo_ini = gen_loc_ini_guess(natom, nbf, nmo, chosen, bfirst, S,
+                                          mo[:,mo_idx])
   elif init_guess == 'input':
     if proj_list is not None:
       raise ValueError("proj_list cannot be used when init_guess='input'")
@@ -399,31 +1157,162 @@ def pbc_loc(molden, box, method='berry', wannier_xyz=None, ions_centers=False,
   else:
     raise ValueError("init_guess can only be 'atomic' or 'input'")
 
-  if method == 'berry':
-    # Note: ao_zdip is a (double) complex array with size (3,nmo,nmo)
-    ao_zdip = ft_aopair(cell, Gv=cell.reciprocal_vectors())
-    ao_zdip *= cell.a.diagonal()[:, None, None]
-    lmo = berry(natom, nbf, nmo1, maxcyc, DIIS, bfirst, dis, lmo_ini[:,:nmo1],
-                ao_zdip, dis_tol, conv_tol)
-  elif method == 'pm':
-    lmo = pm(natom, nbf, nmo1, bfirst, dis, lmo_ini[:,:nmo1], S, 'mulliken',
-             dis_tol, conv_tol)
+  args = (cell, method, bfirst, dis, dis_tol, conv_tol, maxcyc, DIIS, solver,
+          para_nmo, nthreads, max_memory, verbose)
+  if cluster_nmo is None or nmo1 <= cluster_nmo:
+    lmo, info = _pbc_loc_solve(lmo_ini[:,:nmo1], *args)
   else:
-    raise ValueError(f'Localization method {method} cannot be recognized.')
-
-  # print LMO centers into xyz
-  if method == 'berry':
-    ao_zdip /= cell.a.diagonal()[:, None, None]
+    clusters = partition_orbitals(lmo_ini[:,:nmo1], S, bfirst, dis, cluster_nmo)
+    if verbose:
+      print('Localize %d clusters of orbitals independently...' % len(clusters))
+    lmo = _localize_by_clusters(lmo_ini[:,:nmo1], clusters,
+                                (_pbc_loc_solve, args), nproc)
+    if verbose:
+      print('Global sweeps to clean up the boundaries of clusters...')
+    lmo, info = _pbc_loc_solve(lmo, *args)
+    info['nclusters'] = len(clusters)
+
+  # update MOs
+  if mo_idx is None:
+    mo[:,:nmo1] = lmo.copy()
+    if nmo1 < nmo:
+      mo[:,nmo1:nmo] = lmo_ini[:,nmo1:].copy()
   else:
-    ao_zdip = ft_aopair(cell, Gv=cell.reciprocal_vectors())
-  mo_zdip = np.einsum('ui,xuv,vi->xi', lmo, ao_zdip, lmo, optimize=True)
+    mo[:,mo_idx[:nmo1]] = lmo.copy()
+    if nmo1 < nmo:
+      mo[:,mo_idx[nmo1:]] = lmo_ini[:,nmo1:].copy()
+
+  # LMO centers (3,nmo1) in Angstrom
+  mo_zdip = ints.ft_aopair_mo(lmo, max_memory, diag=True)
   mo_dip = -np.angle(mo_zdip)/(2*np.pi)
   mo_dip[mo_dip < 0] += 1.0
   mo_center = BOHR2ANG*np.dot(cell.lattice_vectors(), mo_dip)
+  return mo, mo_center, info
+
+
+def _pbc_loc_solve(lmo_ini, cell, method, bfirst, dis, dis_tol, conv_tol, maxcyc,
+                   DIIS, solver, para_nmo, nthreads, max_memory, verbose):
+  # Berry/PM localization of orbitals lmo_ini (nbf,nmo) of a cell, return
+  # (LMOs, info)
+  from mokit.lib.lo import berry_mo, pm
+  from mokit.lib.lo_qn import boys_qn, pm_qn
+
+  natom = cell.natm
+  nbf, nmo = lmo_ini.shape
+  ints = AOIntegrals(cell)
+  if method == 'berry':
+    if solver == 'qn':
+      # Note: ao_zdip is a (double) complex array with size (3,nbf,nbf). It is
+      # shared with the cache, so it is not scaled by lattice lengths, but the
+      # small MO-basis matrices are (in boys_qn).
+      ao_zdip = ints.ft_aopair()
+      lmo, info = boys_qn(lmo_ini, ao_zdip, conv_tol, maxcyc, verbose,
+                          scale=cell.a.diagonal())
+    else:
+      mo_zdip = ints.ft_aopair_mo(lmo_ini, max_memory)
+      mo_zdip *= cell.a.diagonal()[:, None, None]
+      # Berry rotations are always serial, no need to time Jacobi sweeps
+      if para_nmo == 'auto':
+        para_nmo = 500
+      with loc_para(para_nmo, nthreads), loc_verbose(verbose):
+        lmo = berry_mo(natom, nbf, nmo, maxcyc, DIIS, bfirst, dis, lmo_ini,
+                       mo_zdip, dis_tol, conv_tol)
+      mo_zdip = None
+      info = get_loc_info()
+  else:
+    S = ints.ovlp()
+    if solver == 'qn':
+      lmo, info = pm_qn(bfirst, lmo_ini, S, 'mulliken', conv_tol, maxcyc,
+                        verbose)
+    else:
+      with loc_para(para_nmo, nthreads, nmo), loc_verbose(verbose):
+        lmo = pm(natom, nbf, nmo, bfirst, dis, lmo_ini, S, 'mulliken', dis_tol,
+                 conv_tol)
+      info = get_loc_info()
+  return lmo, info
+
+
+def pbc_loc(molden, box, method='berry', wannier_xyz=None, ions_centers=False,
+            mo_idx=None, proj_list=None, dis_tol=27.0, conv_tol=1e-5,
+            init_guess='atomic', maxcyc=1499, DIIS=False, save_lmo=False,
+            old_fch=None, solver='jacobi', para_nmo=500, nthreads=None,
+            ref_fch=None, max_memory=4000, cluster_nmo=None, nproc=1,
+            verbose=True, return_info=False):
+  '''
+  Perform orbital localization for a specified set of orbitals in a given
+  CP2K .molden file. The method can be either 'berry' or 'pm'.
+  dis_tol=17.0/27.0 are sufficient for water / SnO2-H2O, respectively.
+  Current limitations:
+   1) only gamma-point; 2) only CP2K molden; 3) only Alpha spin.
+  Only cubic cells have been tested so far.
+  dis_tol=10.0 A for Berry, water128 box
+  dis_tol= 9.5 A for Berry, water512 box
+  dis_tol=27.0 A for Berry, SnO2-H2O box
+  solver: 'jacobi' (successive 2*2 rotations, screened by dis_tol) or 'qn'
+   (quasi-Newton steps rotating all orbitals at once, dis_tol and DIIS are not
+   used). See localize().
+  para_nmo, nthreads: see localize(). para_nmo only affects PM here, since
+   Berry localization always uses serial Jacobi rotations.
+  ref_fch: a .fch file holding reference LMOs, e.g. *_LMO.fch (save_lmo=True)
+   of the previous frame of an MD trajectory, in the same box. If given, the
+   initial guess is obtained by rotating MOs to resemble them (see
+   resemble_lmo()) instead of init_guess, which needs only a few sweeps.
+  max_memory: memory budget (MB) of the AO-basis Berry phase integrals
+   (3,nbf,nbf). If they are larger, they are computed block by block and
+   transformed into MO basis on the fly (see AOIntegrals.ft_aopair_mo()), and
+   never stored as a whole. Not used by solver='qn', which needs the AO ones.
+  cluster_nmo, nproc: divide-and-conquer localization for large boxes, see
+   localize(). Clusters are formed using the PBC distances.
+  verbose: False to turn off the printing of localization routines
+  return_info: return a dict of convergence information (see localize()), with
+   an additional key 'time', i.e. the total wall time (s)
+
+  Simple usage::
+  >>> # perform Boys orbital localization for water64 box
+  >>> from mokit.lib.gaussian import pbc_loc
+  >>> pbc_loc('water64-MOS-1_0.molden',box=np.eye(3)*12.42)
+  '''
+  import time
+  from mokit.lib.rwgeom import periodic_table as pt
+  from mokit.lib.moldenfile import MoldenFile
+
+  t0 = time.perf_counter()
+  lat_vec = _check_pbc_loc_args(box, dis_tol, conv_tol, solver)
+
+  proname = molden[0:molden.rindex('.molden')]
+  fchname = proname+'.fch'
+  lmo_fch = proname+'_LMO.fch'
+  if wannier_xyz is None:
+    wannier_xyz = proname+'_wannier.xyz'
+
+  if old_fch is None: # parsed in process, no .fch file is generated
+    fch = MoldenFile(molden, 'cp2k')
+  else:
+    fch = load_fch(old_fch)
+    fchname = fch.fchname
+  coor, cell = _load_wrapped_cell(fch, lat_vec)
+  natom = cell.natm
+  nbf, nif = fch.nbf, fch.nif
+  if verbose:
+    print('Lattice vectors\n', lat_vec)
+
+  if ref_fch is None:
+    ref = None
+  else:
+    ref = (_load_wrapped_cell(ref_fch, lat_vec)[1], load_fch(ref_fch).mo('a'))
+
+  mo, mo_center, info = _pbc_loc_frame(cell, coor, fch.mo('a'), fch.nb, method,
+                                       mo_idx, proj_list, dis_tol, conv_tol,
+                                       init_guess, maxcyc, DIIS, solver, para_nmo,
+                                       nthreads, max_memory, ref, cluster_nmo,
+                                       nproc, verbose)
+
+  # print LMO centers into xyz
+  nmo1 = mo_center.shape[1]
   if ions_centers is True:
     k = natom + nmo1
     elem = np.full(k, 'X ', dtype='U2')
-    elem0, nuc, coor0, ch, mu = read_elem_and_coor_from_fch(fchname, natom)
+    elem0, coor0 = _elem_and_coor(fch)
     elem[:natom] = elem0
     coor = np.zeros((3,k))
     coor[:,:natom] = coor0
@@ -433,59 +1322,216 @@ def pbc_loc(molden, box, method='berry', wannier_xyz=None, ions_centers=False,
     elem = np.full(nmo1, 'X ', dtype='U2')
     pt.write_xyz(nmo1, elem, mo_center, wannier_xyz, cell.a)
 
-  # update MOs and print them into .fch
-  if mo_idx is None:
-    mo[:,:nmo1] = lmo.copy()
-    if nmo1 < nmo:
-      mo[:,nmo1:nmo] = lmo_ini[:,nmo1:].copy()
-  else:
-    mo[:,mo_idx[:nmo1]] = lmo.copy()
-    if nmo1 < nmo:
-      mo[:,mo_idx[nmo1:]] = lmo_ini[:,nmo1:].copy()
-
   if save_lmo is True:
     noon = np.zeros(nif)
-    if fchname != lmo_fch:
-      shutil.copyfile(fchname, lmo_fch)
-    py2fch(lmo_fch, nbf, nif, mo, 'a', noon, False, False)
-    print('Localized orbitals exported to file '+lmo_fch)
+    if old_fch is None: # written from the in-process molden data
+      from mokit.lib.py2fch_direct import mol2fch
+      mol2fch(load_mol_from_fch(fch), lmo_fch, False, mo, mo_e=noon)
+    else:
+      if fchname != lmo_fch:
+        shutil.copyfile(fchname, lmo_fch)
+      py2fch(lmo_fch, nbf, nif, mo, 'a', noon, False, False)
+    if verbose:
+      print('Localized orbitals exported to file '+lmo_fch)
 
-  if old_fch is None:
-    os.remove(fchname)
   t1 = time.perf_counter()
   elapsed_time = t1 - t0
-  print(f"Localization time(sec): {elapsed_time:.1f}", flush=True)
+  if verbose:
+    print(f"Localization time(sec): {elapsed_time:.1f}", flush=True)
+  if return_info:
+    info['time'] = elapsed_time
+    return info
+
+
+def pbc_loc_trajectory(molden_files, box, method='berry', wannier_xyz='wannier_traj.xyz',
+                       npz=None, ions_centers=False, mo_idx=None, proj_list=None,
+                       dis_tol=27.0, conv_tol=1e-5, init_guess='atomic',
+                       maxcyc=1499, DIIS=False, solver='jacobi', warm_start=True,
+                       nproc=1, para_nmo=500, nthreads=None, max_memory=4000,
+                       cluster_nmo=None, verbose=True, return_info=False):
+  '''
+  Perform orbital localization (see pbc_loc()) for every frame of a CP2K MD
+  trajectory, i.e. a list of .molden files of the same atoms and basis set in
+  the same box. The cell object is built only once (per process) and atoms are
+  moved for each frame. LMO centers of all frames are appended into a single
+  multi-frame .xyz file wannier_xyz, and saved into npz (if given) as arrays
+  'centers' (nframe,3,nmo) in Angstrom (padded by NaN if the number of LMOs
+  differs among frames), 'nmo' (nframe), 'niter' (nframe), 'time' (nframe, wall
+  time of localization iterations in seconds) and 'lat_vec' (3,3).
+  warm_start: use LMOs of the previous frame as the initial guess (see
+   resemble_lmo()), which needs fewer sweeps. Not used if proj_list is given.
+  nproc: the number of processes. Frames are split into nproc consecutive
+   chunks, each chunk is localized in one process (warm started within the
+   chunk). If nproc>1 and nthreads is None, each process uses 1 OpenMP thread.
+  cluster_nmo: divide-and-conquer localization of each frame, see localize().
+   Clusters are localized one by one, since processes are used for frames.
+  return_info: also return a list of convergence information (see localize())
+   of all frames
+  Other arguments: see pbc_loc(). Return a list of LMO centers (3,nmo) of all
+  frames.
+
+  Simple usage::
+  >>> from glob import glob
+  >>> from mokit.lib.gaussian import pbc_loc_trajectory
+  >>> moldens = sorted(glob('water64-MOS-1_*.molden'))
+  >>> centers = pbc_loc_trajectory(moldens, box=np.eye(3)*12.42, nproc=4,
+  ...                              npz='water64_wannier.npz')
+  '''
+  import time
+
+  t0 = time.perf_counter()
+  lat_vec = _check_pbc_loc_args(box, dis_tol, conv_tol, solver)
+  molden_files = list(molden_files)
+  nframe = len(molden_files)
+  if nframe == 0:
+    raise ValueError('No .molden file is given.')
+  nproc = max(1, min(nproc, nframe))
+
+  kwargs = {'method':method, 'mo_idx':mo_idx, 'proj_list':proj_list,
+            'dis_tol':dis_tol, 'conv_tol':conv_tol, 'init_guess':init_guess,
+            'maxcyc':maxcyc, 'DIIS':DIIS, 'solver':solver, 'para_nmo':para_nmo,
+            'nthreads':nthreads, 'max_memory':max_memory,
+            'cluster_nmo':cluster_nmo, 'verbose':verbose}
+  warm_start = warm_start and proj_list is None
+  chunks = [[molden_files[i] for i in c] for c in
+            np.array_split(np.arange(nframe), nproc)]
+  if nproc == 1:
+    frames = _pbc_loc_frames(chunks[0], lat_vec, ions_centers, warm_start, kwargs)
+  else:
+    from concurrent.futures import ProcessPoolExecutor
+    if nthreads is None:
+      kwargs['nthreads'] = 1
+    with ProcessPoolExecutor(nproc) as pool:
+      jobs = [pool.submit(_pbc_loc_frames, c, lat_vec, ions_centers, warm_start,
+                          kwargs) for c in chunks]
+      frames = [frame for job in jobs for frame in job.result()]
+
+  centers = [frame[0] for frame in frames]
+  infos = [frame[3] for frame in frames]
+  with open(wannier_xyz, 'w') as f:
+    for center, elem0, coor0, info in frames:
+      nmo1 = center.shape[1]
+      elem = np.full(nmo1, 'X ', dtype='U2')
+      if ions_centers is True:
+        elem = np.concatenate((np.array(elem0, dtype='U2'), elem))
+        center = np.hstack((coor0, center))
+      _write_xyz_frame(f, elem, center, lat_vec)
+  if verbose:
+    print('LMO centers of %d frames exported to file %s' % (nframe, wannier_xyz))
+
+  if npz is not None:
+    nmo = np.array([c.shape[1] for c in centers])
+    arr = np.full((nframe,3,nmo.max()), np.nan)
+    for i, c in enumerate(centers):
+      arr[i,:,:nmo[i]] = c
+    niter = np.array([info['niter'] for info in infos])
+    t = np.array([info['history']['time'].sum() for info in infos])
+    np.savez(npz, centers=arr, nmo=nmo, niter=niter, time=t, lat_vec=lat_vec)
+
+  t1 = time.perf_counter()
+  if verbose:
+    print(f"Localization time(sec): {t1-t0:.1f}", flush=True)
+  if return_info:
+    return centers, infos
+  return centers
+
+
+def _pbc_loc_frames(molden_files, lat_vec, ions_centers, warm_start, kwargs):
+  # localize frames one by one, the cell object is built from the first frame
+  # and atoms are moved for later frames. Return a list of (mo_center, elem0,
+  # coor0, info), elem0/coor0 are atoms (None if ions_centers=False).
+  from mokit.lib.rwgeom import pbc_wrap_atoms
+  from mokit.lib.moldenfile import MoldenFile
+
+  res = []
+  cell0 = ref = None
+  for molden in molden_files:
+    fch = MoldenFile(molden, 'cp2k')
+    if cell0 is None:
+      coor, cell = _load_wrapped_cell(fch, lat_vec)
+      cell0, ielem0, nbf0 = cell, fch.ielem, fch.nbf
+    else:
+      if fch.nbf != nbf0 or not np.array_equal(fch.ielem, ielem0):
+        raise ValueError(f'Atoms or basis set in {molden} differ from those in {molden_files[0]}.')
+      coor = pbc_wrap_atoms(cell0.a.diagonal(), cell0.natm, fch.coor*BOHR2ANG)
+      cell = cell0.copy()
+      cell.set_geom_(coor.T, unit='Angstrom')
+
+    mo, mo_center, info = _pbc_loc_frame(cell, coor, fch.mo('a'), fch.nb,
+                                         ref=ref if warm_start else None, **kwargs)
+    if ions_centers is True:
+      res.append((mo_center, *_elem_and_coor(fch), info))
+    else:
+      res.append((mo_center, None, None, info))
+    ref = (cell, mo)
+  return res
+
+
+def _elem_and_coor(fch):
+  # element symbols and Cartesian coordinates (3,natom) in Angstrom of atoms in
+  # an FchFile (or MoldenFile) object
+  from pyscf.data.elements import ELEMENTS
+  return [ELEMENTS[i].ljust(2) for i in fch.ielem], fch.coor*BOHR2ANG
+
+
+def _write_xyz_frame(f, elem, coor, lat_vec):
+  # append one frame to an opened .xyz file, the same format as write_xyz in
+  # rwgeom
+  f.write('%d\n' % len(elem))
+  f.write('Lattice="%s"\n' % ''.join('%9.4f' % x for x in lat_vec.ravel(order='F')))
+  for e, (x, y, z) in zip(elem, coor.T):
+    f.write('%-2s %18.8f %18.8f %18.8f\n' % (e, x, y, z))
+
+
+def uno_arrays(mol_or_S, mo_a, mo_b, na, nb, uno_thres=1e-5):
+  '''
+  Generate UHF natural orbitals(UNOs) from UHF MOs in memory, no file is read or
+  written. mol_or_S can be either a PySCF mol object or the AO-basis overlap
+  integrals (nbf,nbf) in the same AO order as mo_a/mo_b.
+  Return (uno_coeff, noon, idx), where idx=[start of pair, start of virtual,
+  nopen] is in Fortran convention (i.e. starts from 1), the same as subroutine
+  uno in pyuno.f90. Active UNOs are idx[0]-1:idx[1]-1 in Python convention.
+
+  Simple usage::
+  >>> from mokit.lib.gaussian import uno_arrays
+  >>> mf = mol.UHF().run()
+  >>> no, noon, idx = uno_arrays(mol, mf.mo_coeff[0], mf.mo_coeff[1], *mf.nelec)
+  '''
+  from mokit.lib.uno import uno as uhf_no
+  from mokit.lib.rwwfn import construct_vir
+
+  if isinstance(mol_or_S, np.ndarray):
+    S = mol_or_S
+  else:
+    S = AOIntegrals(mol_or_S).ovlp()
+  nbf, nif = mo_a.shape
+  # a blank output filename means no output file
+  idx, noon, coeff = uhf_no(' ', nbf, nif, na, nb, mo_a, mo_b, S, uno_thres)
+  coeff = construct_vir(nbf, nif, idx[1], coeff, S)
+  return coeff, noon, idx
 
 
 def uno(fchname):
   '''
   Generate UHF natural orbitals(UNOs) from a given Gaussian .fch(k) file
-  (AO-basis overlap integrals are computed using PySCF)
-  
+  (AO-basis overlap integrals are computed using PySCF). fchname can be either
+  a filename or an FchFile object. See uno_arrays() for the in-memory version.
+
   Simple usage::
   >>> # generate UNOs for a UHF wave function of benzene
   >>> # a file named benzene_uhf_UNO.fch will be created
   >>> from mokit.lib.gaussian import uno
   >>> uno(fchname='benzene_uhf.fch')
   '''
-  from mokit.lib.uno import uno as uhf_no
-  from mokit.lib.rwwfn import construct_vir
+  from mokit.lib.fchfile import fch_u2r
 
-  os.system('fch_u2r '+fchname)
-  fchname0 = fchname[0:fchname.rindex('.fch')]+'_r.fch'
+  fch = load_fch(fchname)
+  fchname = fch.fchname
   fchname1 = fchname[0:fchname.rindex('.fch')]+'_UNO.fch'
-  outname = str(random.randint(1,10000))+'.out'
-  os.rename(fchname0, fchname1)
-  nbf, nif = read_nbf_and_nif_from_fch(fchname)
-  na, nb = read_na_and_nb_from_fch(fchname)
-  alpha_mo = fch2py(fchname, nbf, nif, 'a')
-  beta_mo  = fch2py(fchname, nbf, nif, 'b')
-  mol = load_mol_from_fch(fchname)
-  S = mol.intor_symmetric('int1e_ovlp')
-  idx, noon, alpha_coeff = uhf_no(outname,nbf,nif,na,nb,alpha_mo,beta_mo,S,1e-5)
-  alpha_coeff = construct_vir(nbf, nif, idx[1], alpha_coeff, S)
-  os.remove(outname)
-  py2fch(fchname1, nbf, nif, alpha_coeff, 'a', noon, True, True)
+  mol = load_mol_from_fch(fch)
+  coeff, noon, idx = uno_arrays(mol, fch.mo('a'), fch.mo('b'), fch.na, fch.nb)
+  fch_u2r(fch, fchname1)
+  py2fch(fchname1, fch.nbf, fch.nif, coeff, 'a', noon, True, True)
   print('UNOs exported to file '+fchname1)
 
 
@@ -494,17 +1540,18 @@ def permute_orb(fchname, orb1, orb2):
   Permute two orbitals in a given Gaussian .fch(k) file.
   Note: orb1/orb2 are in Fortran convention (starts from 1)
   '''
-  from mokit.lib.rwwfn import read_mo_from_fch, write_mo_into_fch, \
-    read_eigenvalues_from_fch, write_eigenvalues_to_fch
+  from mokit.lib.rwwfn import write_mo_into_fch, write_eigenvalues_to_fch
 
-  nbf, nif = read_nbf_and_nif_from_fch(fchname)
-  mo = read_mo_from_fch(fchname, nbf, nif, 'a')
+  fch = load_fch(fchname)
+  fchname = fch.fchname
+  nbf, nif = fch.nbf, fch.nif
+  mo = fch.raw_mo('a').copy()
   mo1 = mo[:,orb1-1].copy()
   mo2 = mo[:,orb2-1].copy()
   mo[:,orb1-1] = mo2.copy()
   mo[:,orb2-1] = mo1.copy()
 
-  ev = read_eigenvalues_from_fch(fchname, nif, 'a')
+  ev = fch.eigenvalues('a')
   r = ev[orb1-1]
   ev[orb1-1] = ev[orb2-1]
   ev[orb2-1] = r
@@ -523,7 +1570,7 @@ def lin_comb_two_mo(fchname, orb1, orb2, start_from_one=False):
    want to starts from 1, please set start_from_one=True.
   '''
   import math
-  from mokit.lib.rwwfn import read_mo_from_fch, write_mo_into_fch
+  from mokit.lib.rwwfn import write_mo_into_fch
 
   if start_from_one is True:
     k1 = orb1-1
@@ -531,8 +1578,10 @@ def lin_comb_two_mo(fchname, orb1, orb2, start_from_one=False):
   else:
     k1 = orb1
     k2 = orb2
-  nbf, nif = read_nbf_and_nif_from_fch(fchname)
-  mo = read_mo_from_fch(fchname, nbf, nif, 'a')
+  fch = load_fch(fchname)
+  fchname = fch.fchname
+  nbf, nif = fch.nbf, fch.nif
+  mo = fch.raw_mo('a').copy()
   mo1 = mo[:,k1].copy()
   mo2 = mo[:,k2].copy()
   cons = 0.5*math.sqrt(2.0)
@@ -578,7 +1627,9 @@ def gen_fcidump(fchname, nacto, nacte, mem=4000):
   from pyscf.tools.fcidump import from_integrals
 
   # load the mol object from a given .fch(k) file
-  mol = load_mol_from_fch(fchname)
+  fch = load_fch(fchname)
+  fchname = fch.fchname
+  mol = load_mol_from_fch(fch)
 
   if mol.spin == 0:
     mf = scf.RHF(mol)
@@ -591,8 +1642,7 @@ def gen_fcidump(fchname, nacto, nacte, mem=4000):
   mf.kernel()
 
   # read MOs from a given .fch(k) file
-  nbf, nif = read_nbf_and_nif_from_fch(fchname)
-  mf.mo_coeff = fch2py(fchname, nbf, nif, 'a')
+  mf.mo_coeff = fch.mo('a')
 
   # generate integrals and create FCIDUMP
   mc = mcscf.CASCI(mf, nacto, nacte)
@@ -614,105 +1664,190 @@ def make_orb_resemble(target_fch, ref_fch, nmo=None, align=False):
   nmo: indices 1~nmo MOs in ref_fch will be labeled as reference MOs
   align: whether to align two molecules
   If nmo is not given, it will be set as na (the number of alpha electrons)
+  target_fch/ref_fch can be either filenames or FchFile objects.
+  See make_orb_resemble_batch() for many target files.
   '''
-  from pyscf import gto
-  from mokit.lib.rwgeom import read_natom_from_fch, read_coor_from_fch
-  from mokit.lib.mirror_wfn import rotate_atoms_wfn2
-  from mokit.lib.mo_svd import orb_resemble
-  from mokit.lib.qchem import read_hf_type_from_fch
+  make_orb_resemble_batch([target_fch], ref_fch, nmo=nmo, align=align)
 
-  nmo_given = True
-  if nmo is None:
-    nmo_given = False
-    nmo, nb = read_na_and_nb_from_fch(ref_fch)
-    # nmo default: the number of alpha occupied orbitals
 
-  if align is True:
-    natom = read_natom_from_fch(target_fch)
-    coor = read_coor_from_fch(target_fch, natom)
-    ref_fch1 = ref_fch[0:ref_fch.rindex('.fch')]+'_rot.fch'
-    rotate_atoms_wfn2(ref_fch, natom, coor, ref_fch1)
-  else:
-    ref_fch1 = ref_fch
+# (mol, reference MOs) of make_orb_resemble_batch, set in each worker process
+_resemble_ref = None
+
+def _init_resemble_worker(ref):
+  global _resemble_ref
+  _resemble_ref = ref
+
+
+def _resemble_target(task):
+  # rotate the MOs of one target to resemble reference MOs, return a list of
+  # MOs (alpha, and beta if UHF) in PySCF order
+  from pyscf import gto
+  from mokit.lib.mo_svd import orb_resemble
 
+  target_fch, nif1, ref = task
+  mol2, mo2 = _resemble_ref if ref is None else ref
   mol1 = load_mol_from_fch(target_fch)
-  mol2 = load_mol_from_fch(ref_fch1)
-  ao_S1 = mol1.intor_symmetric('int1e_ovlp')
+  ao_S1 = AOIntegrals(mol1).ovlp()
   cross_S = gto.intor_cross('int1e_ovlp', mol1, mol2)
+  nbf1, nbf2 = mol1.nao, mol2.nao
+  return [orb_resemble(nbf1, nif1, nbf2, c.shape[1], c, ao_S1, cross_S)
+          for c in mo2]
 
-  nbf1, nif1 = read_nbf_and_nif_from_fch(target_fch)
-  nbf2, nif2 = read_nbf_and_nif_from_fch(ref_fch1)
-  mo2 = fch2py(ref_fch1, nbf2, nif2, 'a')
-
-  # rotate alpha MOs of target molecule at target basis to resemble known orbitals
-  mo1 = orb_resemble(nbf1, nif1, nbf2, nmo, mo2[:,:nmo], ao_S1, cross_S)
-  noon = np.zeros(nif1)
-  py2fch(target_fch, nbf1, nif1, mo1, 'a', noon, False, False)
 
-  # If UHF, rotate beta MOs, too
-  ihf = read_hf_type_from_fch(ref_fch1)
+def _resemble_ref_mo(ref, nmo):
+  # reference MOs, alpha (and beta if UHF)
+  ihf = ref.hf_type
   if ihf==1 or ihf==101: # real R(O)HF
-    if align is True:
-      os.remove(ref_fch1)
+    return [ref.mo('a')[:,:(ref.na if nmo is None else nmo)]]
   elif ihf == 2: # UHF
-    if nmo_given is False:
-      na, nmo = read_na_and_nb_from_fch(ref_fch1)
-      # reset nmo as the number of beta occupied orbitals
-    mo2 = fch2py(ref_fch1, nbf2, nif2, 'b')
-    if align is True:
-      os.remove(ref_fch1)
-    mo1 = orb_resemble(nbf1, nif1, nbf2, nmo, mo2[:,:nmo], ao_S1, cross_S)
-    py2fch(target_fch, nbf1, nif1, mo1, 'b', noon, False, False)
+    return [ref.mo('a')[:,:(ref.na if nmo is None else nmo)],
+            ref.mo('b')[:,:(ref.nb if nmo is None else nmo)]]
   else:
     raise NotImplementedError('Unsupported HF type in make_orb_resemble')
 
 
+def make_orb_resemble_batch(target_fchs, ref_fch, nmo=None, align=False,
+                            nproc=1):
+  '''
+  make MOs in each of target_fchs resemble the reference MOs in ref_fch, e.g.
+  map one set of reference MOs onto many conformers or basis sets. Arguments
+  have the same meaning as those in make_orb_resemble(). The reference file is
+  read and its mol object is built only once (if align=False). Overlap
+  integrals and projections of targets are computed in nproc processes, and
+  each target file is updated in one pass by write_fch_sections().
+  target_fchs: a list of .fch(k) filenames or FchFile objects
+
+  Simple usage::
+  >>> from mokit.lib.gaussian import make_orb_resemble_batch
+  >>> fchs = ['conf%d.fch' % i for i in range(50)]
+  >>> make_orb_resemble_batch(fchs, 'ref.fch', nproc=4)
+  '''
+  from mokit.lib.fchfile import write_fch_sections
+
+  targets = [load_fch(t) for t in target_fchs]
+  ref = load_fch(ref_fch)
+  ref_fch = ref.fchname
+
+  # with align=True, the reference is rotated onto each target geometry
+  if align is True:
+    from mokit.lib.mirror_wfn import rotate_atoms_wfn2
+    ref_fch1 = ref_fch[0:ref_fch.rindex('.fch')]+'_rot.fch'
+    tasks = []
+    for target in targets:
+      rotate_atoms_wfn2(ref_fch, target.natom, target.coor*BOHR2ANG, ref_fch1)
+      ref1 = load_fch(ref_fch1)
+      tasks.append((target.fchname, target.nif, (load_mol_from_fch(ref1,
+                    cache=False), _resemble_ref_mo(ref1, nmo))))
+      os.remove(ref_fch1)
+    ref = None
+  else:
+    tasks = [(target.fchname, target.nif, None) for target in targets]
+    ref = (load_mol_from_fch(ref), _resemble_ref_mo(ref, nmo))
+
+  def write_mo(target, mo1):
+    perm = target.permutation()
+    sections = {}
+    for ab, c in zip(('Alpha', 'Beta'), mo1):
+      sections[ab+' Orbital Energies'] = np.zeros(target.nif)
+      sections[ab+' MO coefficients'] = perm.mo2gau(c).T
+    write_fch_sections(target, sections)
+
+  if nproc>1 and len(tasks)>1:
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(min(nproc,len(tasks)),
+                             initializer=_init_resemble_worker,
+                             initargs=(ref,)) as pool:
+      for target, mo1 in zip(targets, pool.map(_resemble_target, tasks)):
+        write_mo(target, mo1)
+  else:
+    _init_resemble_worker(ref)
+    for target, task in zip(targets, tasks):
+      write_mo(target, _resemble_target(task))
+    _init_resemble_worker(None)
+
+
 def proj2target_basis(fchname, target_basis='cc-pVTZ', nmo=None, cart=False):
   '''
   Project MOs of the original basis set onto the target basis set.
   cart: True/False for Cartesian-type or spherical harmonic type functions
+  fchname can be either a filename or an FchFile object.
+  The file with suffix _proj.fch will be generated. See project_basis_ladder()
+  for a series of basis sets.
   '''
-  from pyscf import scf
-  from mokit.lib.qchem import read_hf_type_from_fch
-  from mokit.lib.rwwfn import gen_no_from_dm_and_ao_ovlp, get_nmo_from_ao_ovlp
-  from mokit.lib.py2fch_direct import fchk
+  project_basis_ladder(fchname, [target_basis], nmo=nmo, cart=cart)
 
-  mol = load_mol_from_fch(fchname)
-  mol.basis = target_basis
-  mol.cart = cart
-  mol.build(parse_arg=False)
 
-  ihf = read_hf_type_from_fch(fchname)
+def project_basis_ladder(fchname, bases, nmo=None, cart=False, write_all=False):
+  '''
+  Project MOs of the original basis set onto a series of larger basis sets step
+  by step, e.g. DZ->TZ->QZ. Each step is the same as proj2target_basis(), i.e.
+  occupied MOs (or 1~nmo MOs) are projected from the previous basis set and
+  virtual MOs are constructed by PAO, but mol objects and MOs are kept in
+  memory, and the AO overlap (for the linear dependence check and projection)
+  and the cross overlap between two consecutive basis sets are computed only
+  once per step.
+  bases: a list of basis sets, e.g. ['cc-pVTZ','cc-pVQZ']
+  cart: True/False for Cartesian-type or spherical harmonic type functions
+  write_all: if True, MOs at the k-th basis set are also written into the file
+   with suffix _proj{k}.fch (k starts from 1). The file with suffix _proj.fch
+   holds MOs at the last basis set anyway.
+  Return the list of generated .fch filenames.
+
+  Simple usage::
+  >>> from mokit.lib.gaussian import project_basis_ladder
+  >>> project_basis_ladder('h2o_dz.fch', ['cc-pVTZ','cc-pVQZ']) # h2o_dz_proj.fch
+  '''
+  from pyscf import gto, scf
+  from mokit.lib.rwwfn import get_nmo_from_ao_ovlp
+  from mokit.lib.mo_svd import orb_resemble
+  from mokit.lib.py2fch_direct import fchk
+
+  fch = load_fch(fchname)
+  fchname = fch.fchname
+  ihf = fch.hf_type
   if ihf == 1:     # real RHF
-    mf = scf.RHF(mol)
+    scf_class = scf.RHF
   elif ihf == 2:   # UHF
-    mf = scf.UHF(mol)
+    scf_class = scf.UHF
   elif ihf == 101: # real ROHF
-    mf = scf.ROHF(mol)
+    scf_class = scf.ROHF
   else:
     raise NotImplementedError('proj2target_basis supports only R(O)HF/UHF currently.')
 
-  S = mol.intor_symmetric('int1e_ovlp')
-  nbf = S.shape[0]
-  nif = get_nmo_from_ao_ovlp(nbf, S)
-  if nif < nbf:
-    mf2 = mf.copy()
-    mf = scf.remove_linear_dep_(mf2, threshold=1.1e-6, lindep=1.1e-6)
-
-  dm0 = mf.get_init_guess(mol, '1e')
-  if ihf == 1:   # real RHF
-    mf.mo_energy, mf.mo_coeff = gen_no_from_dm_and_ao_ovlp(nbf, nif, dm0, S)
-  elif ihf == 2: # UHF
-    dm0 = dm0[0] + dm0[1]
-    mo_e_a, alpha_mo = gen_no_from_dm_and_ao_ovlp(nbf, nif, dm0, S)
-    mf.mo_energy = (mo_e_a, mo_e_a)
-    mf.mo_coeff = (alpha_mo, alpha_mo)
-  if ihf == 101: # real ROHF
-    dm0 = dm0[0] + dm0[1]
-    mf.mo_energy, mf.mo_coeff = gen_no_from_dm_and_ao_ovlp(nbf, nif, dm0, S)
-  target_fch = fchname[0:fchname.rindex('.fch')]+'_proj.fch'
-  fchk(mf, target_fch)
-  make_orb_resemble(target_fch, fchname, nmo=nmo, align=False)
+  mol0 = load_mol_from_fch(fch)
+  mo0 = _resemble_ref_mo(fch, nmo)
+  stem = fchname[0:fchname.rindex('.fch')]
+  fchs = []
+  for k, basis in enumerate(bases):
+    mol = mol0.copy() # do not touch the cached mol object
+    mol.basis = basis
+    mol.cart = cart
+    mol.build(parse_arg=False)
+    S = AOIntegrals(mol).ovlp()
+    nbf = S.shape[0]
+    nif = get_nmo_from_ao_ovlp(nbf, S)
+    cross_S = gto.intor_cross('int1e_ovlp', mol, mol0)
+    mo = [orb_resemble(nbf, nif, mol0.nao, c.shape[1], c, S, cross_S)
+          for c in mo0]
+
+    names = [stem+'_proj%d.fch' % (k+1)] if write_all else []
+    if k == len(bases)-1:
+      names.append(stem+'_proj.fch')
+    if len(names) > 0:
+      mf = scf_class(mol)
+      if ihf == 2:
+        mf.mo_coeff = (mo[0], mo[1])
+        mf.mo_energy = (np.zeros(nif), np.zeros(nif))
+      else:
+        mf.mo_coeff = mo[0]
+        mf.mo_energy = np.zeros(nif)
+      for name in names:
+        fchk(mf, name, overwrite_mol=True)
+      fchs.extend(names)
+    # the projected occupied MOs are the reference of the next step
+    mol0 = mol
+    mo0 = [c1[:,:c.shape[1]] for c1, c in zip(mo, mo0)]
+  return fchs
 
 
 def mo_svd_in_fch(fchname1, fchname2, idx1=None, idx2=None):
@@ -735,12 +1870,12 @@ def export_mo_e2txt(fchname):
   '''
   export the data of Alpha Orbital Energies in a .fch file into a plain text file
   '''
-  from mokit.lib.rwwfn import read_eigenvalues_from_fch, export_rarray2txt
+  from mokit.lib.rwwfn import export_rarray2txt
 
+  fch = load_fch(fchname)
+  fchname = fch.fchname
   txtname = fchname[0:fchname.rindex('.fch')]+'.txt'
-  nbf, nif = read_nbf_and_nif_from_fch(fchname)
-  ev = read_eigenvalues_from_fch(fchname, nif, 'a')
-  export_rarray2txt(txtname, 'MO Eigenvalues', nif, ev)
+  export_rarray2txt(txtname, 'MO Eigenvalues', fch.nif, fch.eigenvalues('a'))
 
 
 def nio(n_fch, n_1_fch):
@@ -752,30 +1887,31 @@ def nio(n_fch, n_1_fch):
   This module can also be used for EA(electron affinity) process, where `n_fch`/
   n_1_fch stand for N+1/N electronic states, respectively. But remember that a
   basis set with diffuse functions may be required for the N+1 species.
+  n_fch/n_1_fch can be either filenames or FchFile objects.
   '''
   from mokit.lib.lo import get_ao_ovlp_using_fch
-  from mokit.lib.rwwfn import read_dm_from_fch, gen_no_from_dm_and_ao_ovlp, \
-   check_uhf_in_fch, write_mo_into_fch, write_dm_into_fch, write_eigenvalues_to_fch
-
-  nbf, nif = read_nbf_and_nif_from_fch(n_fch)
-  nbf1, nif1 = read_nbf_and_nif_from_fch(n_1_fch)
-  if nbf != nbf1:
+  from mokit.lib.rwwfn import gen_no_from_dm_and_ao_ovlp, write_mo_into_fch, \
+   write_dm_into_fch, write_eigenvalues_to_fch
+
+  fch_n = load_fch(n_fch)
+  fch_n_1 = load_fch(n_1_fch)
+  n_fch = fch_n.fchname
+  nbf, nif = fch_n.nbf, fch_n.nif
+  if nbf != fch_n_1.nbf:
     raise ValueError('The number of basis functions are not equal in two .fch(k) files!')
 
   ao_ovlp = get_ao_ovlp_using_fch(n_fch, nbf)
-  dm_n = read_dm_from_fch(n_fch, 1, nbf)
-  dm_n_1 = read_dm_from_fch(n_1_fch, 1, nbf)
+  dm_n = fch_n.dm(1)
+  dm_n_1 = fch_n_1.dm(1)
   dm_n -= dm_n_1 # difference of N/N-1 density matrices
   noon, no_coeff = gen_no_from_dm_and_ao_ovlp(nbf, nif, dm_n, ao_ovlp)
 
   nio_fch = n_fch[0:n_fch.rindex('.fch')]+'_nio.fch'
-  uhf = check_uhf_in_fch(n_fch)
-  if uhf == 0: # not UHF type
+  if fch_n.hf_type != 2: # not UHF type
     shutil.copyfile(n_fch, nio_fch)
   else:        # UHF type
-    os.system('fch_u2r '+n_fch)
-    r_fch = n_fch[0:n_fch.rindex('.fch')]+'_r.fch'
-    os.rename(r_fch, nio_fch)
+    from mokit.lib.fchfile import fch_u2r
+    fch_u2r(fch_n, nio_fch)
 
   write_mo_into_fch(nio_fch, nbf, nif, 'a', no_coeff)
   write_dm_into_fch(nio_fch, True, nbf, dm_n)
@@ -783,7 +1919,7 @@ def nio(n_fch, n_1_fch):
 
 
 def find_antibonding_orb(mol, mo, i1=0, i2=0, i3=0, start_from_one=False,
-                         ao_ovlp=None, popm='lowdin'):
+                         ao_ovlp=None, popm='lowdin', ints=None):
   '''
   Construct antibonding orbitals for a set of bonding orbitals.
   mol: PySCF molecule object
@@ -795,6 +1931,8 @@ def find_antibonding_orb(mol, mo, i1=0, i2=0, i3=0, start_from_one=False,
    using mol.intor_symmetric('int1e_ovlp') below, otherwise it will be directly
    used.
   popm: population method, 'mulliken' or 'lowdin'
+  ints: an AOIntegrals object of mol, which provides (cached) overlap and dipole
+   integrals. If `None` is given, it will be created here.
   Note:
   1) mo(:,i3:nif) will be updated, where mo(:,i3:i3+i2-i1) are generated anti-
    bonding orbitals, and mo(:,i3+i2-i1+1:nif) are remaining virtual orbitals.
@@ -824,14 +1962,16 @@ def find_antibonding_orb(mol, mo, i1=0, i2=0, i3=0, start_from_one=False,
   bfirst = np.ones(natom+1, dtype=np.int32)
   bfirst[1:] = mol.aoslice_by_atom()[:,3] + 1
 
+  if ints is None:
+    ints = AOIntegrals(mol)
   if ao_ovlp is None:
-    S = mol.intor_symmetric('int1e_ovlp')
+    S = ints.ovlp()
   else:
     S = ao_ovlp
   check_orthonormal(nbf, nif, mo, S)
   pop = calc_diag_gross_pop(natom, nbf, npair, bfirst, S, mo[:,k1-1:k2], popm)
   mo_center = get_mo_center_from_pop(natom, npair, pop)
-  center, ao_dip = get_ao_dip(mol, fix_center=True)
+  center, ao_dip = get_ao_dip(mol, fix_center=True, ints=ints)
   mo = find_antibonding_orbitals(k1, k2, k3, natom, nbf, nif, bfirst, mo_center,
                                  S, ao_dip, mo)
   check_orthonormal(nbf, nif, mo, S)
@@ -850,16 +1990,17 @@ def find_antibonding_orb_in_fch(fchname, i1, i2, i3, start_from_one=False, popm=
   1) mo(:,i3:nif) will be updated, where mo(:,i3:i3+i2-i1) are generated anti-
    bonding orbitals, and mo(:,i3+i2-i1+1:nif) are remaining virtual orbitals.
   2) all MOs are still orthonormalized after calling this function.
+  fchname can be either a filename or an FchFile object.
   '''
-  from mokit.lib.rwwfn import read_eigenvalues_from_fch
-
-  mol = load_mol_from_fch(fchname)
-  nbf, nif = read_nbf_and_nif_from_fch(fchname)
-  mo = fch2py(fchname, nbf, nif, 'a')
+  fch = load_fch(fchname)
+  fchname = fch.fchname
+  mol = load_mol_from_fch(fch)
+  nbf, nif = fch.nbf, fch.nif
+  mo = fch.mo('a')
   new_mo = find_antibonding_orb(mol, mo, i1, i2, i3, start_from_one, None, popm)
   new_fch = fchname[0:fchname.rindex('.fch')]+'_a.fch'
   shutil.copyfile(fchname, new_fch)
-  ev = read_eigenvalues_from_fch(fchname, nif, 'a')
+  ev = fch.eigenvalues('a')
   py2fch(new_fch, nbf, nif, new_mo, 'a', ev, False, False)
 
 
@@ -867,7 +2008,7 @@ def mo_g_int(fnames, x, na=None, nb=None, trace_PS=False):
   '''
   Generate occupied MOs of a new geometry using Grassmann interpolation. Currently
    only available for R(O)HF and UHF.
-  fnames  : a series of .fch(k) files and a .gjf file
+  fnames  : a series of .fch(k) files (or FchFile objects) and a .gjf file
   x       : a series of the changed variable (bond distance, angle, dihedral, even
             composite coordinate)
   na      : the number of alpha occupied orbitals
@@ -876,79 +2017,146 @@ def mo_g_int(fnames, x, na=None, nb=None, trace_PS=False):
   Example:
     mo_g_int(['h2o_105.fch', 'h2o_115.fch', 'h2o_120.fch', 'h2o_109_5.gjf'],
              [105.0, 115.0, 120.0, 109.5])
+  See mo_g_int_batch() for many new geometries.
   '''
-  from mokit.lib.qchem import read_hf_type_from_fch, construct_vir
-  from mokit.lib.mirror_wfn import mo_grassmann_intrplt
-  from mokit.lib.rwgeom import replace_coor_in_fch_by_gjf
-
   nfile = len(fnames)
   if nfile < 2:
     raise ValueError('At least two files must be provided.')
   if len(x) != nfile:
     raise ValueError('Size of arrays fnames and x are not equal.')
+  mo_g_int_batch(fnames[:-1], x[:-1], [fnames[-1]], [x[-1]], na=na, nb=nb,
+                 trace_PS=trace_PS)
 
-  # copy a .fch file and replace coordinates therein by coordinates from .gjf
-  gjfname = fnames[nfile-1]
-  new_fch = gjfname[0:gjfname.rindex('.gjf')]+'.fch'
-  shutil.copyfile(fnames[0], new_fch)
-  replace_coor_in_fch_by_gjf(gjfname, new_fch)
 
-  nbf, nif = read_nbf_and_nif_from_fch(fnames[0])
-  na0, nb0 = read_na_and_nb_from_fch(fnames[0])
-  if na is None:
-    na = na0
-  if nb is None:
-    nb = nb0
+# (new_fch skeleton, x, spins, mo_ref, gammas, nif, perm, trace_PS) of
+#  mo_g_int_batch, set in each worker process
+_grassmann_ref = None
+
+def _init_grassmann_worker(ref):
+  global _grassmann_ref
+  _grassmann_ref = ref
 
-  S = np.zeros([nbf,nbf,nfile])
-  mo = np.zeros([nbf,na,nfile-1])
 
-  for i in range(nfile-1):
-    mol = load_mol_from_fch(fnames[i])
-    S[:,:,i] = mol.intor_symmetric('int1e_ovlp')
-    coeff = fch2py(fnames[i], nbf, nif, 'a')
-    mo[:,:na,i] = coeff[:,:na]
+def _grassmann_target(task):
+  # interpolate occupied MOs of one new geometry, construct virtual MOs by PAO,
+  # and write all MOs into the .fch file of the new geometry
+  from mokit.lib.rwwfn import construct_vir
+  from mokit.lib.mirror_wfn import calc_1d_lagrange_w, grassmann_exp_map
+  from mokit.lib.rwgeom import replace_coor_in_fch_by_gjf
+  from mokit.lib.fchfile import format_fch_reals, write_fch_sections
+
+  gjfname, x1 = task
+  fch0, x, spins, mo_ref, gammas, nif, perm, trace_PS = _grassmann_ref
 
+  # copy a .fch file and replace coordinates therein by coordinates from .gjf
+  new_fch = gjfname[0:gjfname.rindex('.gjf')]+'.fch'
+  shutil.copyfile(fch0, new_fch)
+  replace_coor_in_fch_by_gjf(gjfname, new_fch)
   mol = load_mol_from_fch(new_fch)
-  S[:,:,nfile-1] = mol.intor_symmetric('int1e_ovlp')
+  S = AOIntegrals(mol).ovlp()
+  nbf = S.shape[0]
+
+  # the 1st known geometry is the reference, whose GAMMA matrix is zero. See
+  # subroutine mo_grassmann_intrplt in mirror_wfn.f90
+  if len(x) > 1:
+    weight = calc_1d_lagrange_w(np.append(np.asarray(x[1:], dtype=float), x1))
+    print("\nWeights of Lagrange's interpolation:\n"+format_fch_reals(weight),
+          end='')
+  else:
+    weight = []
 
-  # generate alpha occupied MOs of the new geometry
-  new_mo = mo_grassmann_intrplt(nbf, na, nfile, x, S, mo)
+  sections = {}
   coeff0 = np.zeros([nbf,nif])
-  coeff0[:,:na] = new_mo[:,:na]
-
-  # construct alpha virtual MOs of the new geometry using PAO
-  coeff = construct_vir(nbf, nif, na+1, coeff0, S[:,:,nfile-1])
-
-  # export alpha MOs to .fch file
-  mo_e = np.zeros(nif)
-  py2fch(new_fch, nbf, nif, coeff, 'a', mo_e, False, False)
-
-  # check the number of alpha electrons
-  if trace_PS is True:
-    dm = np.dot(coeff[:,:na], coeff[:,:na].transpose())
-    ne_a = np.trace(np.dot(dm,S[:,:,nfile-1]))
-    print('No. alpha electrons: %.4f' %ne_a)
-
-# Note: DO NOT merge beta occupied MOs into the array mo for UHF, otherwise MOs
-#       in the array mo are non-orthogonal. In fact, alpha/beta should be dealt
-#       with separately.
-  ihf = read_hf_type_from_fch(fnames[0])
-  if ihf == 2:   # real UHF
-    mo = np.zeros([nbf,nb,nfile-1])
-    for i in range(nfile-1):
-      coeff = fch2py(fnames[i], nbf, nif, 'b')
-      mo[:,:nb,i] = coeff[:,:nb]
-    # generate beta occupied MOs of the new geometry
-    new_mo = mo_grassmann_intrplt(nbf, nb, nfile, x, S, mo)
-    coeff0[:,:nb] = new_mo[:,:nb]
-    # construct beta virtual MOs of the new geometry using PAO
-    coeff = construct_vir(nbf, nif, nb+1, coeff0, S[:,:,nfile-1])
-    # export beta MOs to .fch file
-    py2fch(new_fch, nbf, nif, coeff, 'b', mo_e, False, False)
-    # check the number of beta electrons
+  for (ab, n, ab_name), c_ref, gamma in zip(spins, mo_ref, gammas):
+    g = np.zeros([nbf,n])
+    for w, gamma_i in zip(weight, gamma):
+      if abs(w) < 1e-7:
+        continue
+      g = g + w*gamma_i
+    # generate occupied MOs of the new geometry, and virtual MOs using PAO
+    coeff0[:,:n] = grassmann_exp_map(nbf, n, c_ref, g, S)
+    coeff = construct_vir(nbf, nif, n+1, coeff0, S)
+    sections[ab_name+' Orbital Energies'] = np.zeros(nif)
+    sections[ab_name+' MO coefficients'] = perm.mo2gau(coeff).T
+    # check the number of alpha/beta electrons
     if trace_PS is True:
-      dm = np.dot(coeff[:,:nb], coeff[:,:nb].transpose())
-      ne_b = np.trace(np.dot(dm,S[:,:,nfile-1]))
-      print('No. beta electrons: %.4f' %ne_b)
+      dm = np.dot(coeff[:,:n], coeff[:,:n].transpose())
+      ne = np.trace(np.dot(dm,S))
+      print('No. %s electrons: %.4f' %(ab_name.lower(), ne))
+  write_fch_sections(new_fch, sections)
+  return new_fch
+
+
+def mo_g_int_batch(fnames, x, gjfnames, x_new, na=None, nb=None, trace_PS=False,
+                   nproc=1):
+  '''
+  Generate occupied MOs of many new geometries using Grassmann interpolation,
+  e.g. for points of a relaxed scan or NEB images. The same as calling
+  mo_g_int() once per new geometry, but known geometries are processed only
+  once: the tangent-space log-maps (GAMMA matrices) of known MOs are computed
+  once, then each new geometry only needs its own AO overlap and an exp-map.
+  New geometries are handled in nproc processes, and each .fch file is written
+  in one pass. Currently only available for R(O)HF and UHF.
+  fnames  : a series of .fch(k) files (or FchFile objects) of known geometries
+  x       : the changed variable of known geometries
+  gjfnames: .gjf files of new geometries, file foo.gjf -> foo.fch
+  x_new   : the changed variable of new geometries
+  Other arguments are the same as those in mo_g_int().
+  Return the list of generated .fch filenames.
 
+  Simple usage::
+  >>> from mokit.lib.gaussian import mo_g_int_batch
+  >>> mo_g_int_batch(['h2o_105.fch', 'h2o_115.fch', 'h2o_120.fch'],
+  ...                [105.0, 115.0, 120.0], ['h2o_107.gjf', 'h2o_109.gjf',
+  ...                'h2o_111.gjf'], [107.0, 109.0, 111.0], nproc=3)
+  '''
+  from mokit.lib.mirror_wfn import grassmann_ref_mo, grassmann_log_map
+
+  if len(fnames) < 1:
+    raise ValueError('At least one .fch(k) file must be provided.')
+  if len(x) != len(fnames):
+    raise ValueError('Size of arrays fnames and x are not equal.')
+  if len(x_new) != len(gjfnames):
+    raise ValueError('Size of arrays gjfnames and x_new are not equal.')
+  fchs = [load_fch(f) for f in fnames]
+  nbf, nif = fchs[0].nbf, fchs[0].nif
+  if na is None:
+    na = fchs[0].na
+  if nb is None:
+    nb = fchs[0].nb
+
+# Note: DO NOT merge beta occupied MOs into alpha ones for UHF, otherwise MOs
+#       are non-orthogonal. In fact, alpha/beta should be dealt with separately.
+  spins = [('a', na, 'Alpha')]
+  if fchs[0].hf_type == 2: # real UHF
+    spins.append(('b', nb, 'Beta'))
+
+  # MOs at the orthogonal basis of the reference (1st) geometry, and GAMMA
+  # matrices of other known geometries. The AO overlap of each known geometry
+  # is computed only once, for both alpha and beta.
+  mo_ref = [None]*len(spins)
+  gammas = [[] for ab in spins]
+  for i, fch in enumerate(fchs):
+    S = AOIntegrals(load_mol_from_fch(fch)).ovlp()
+    for k, (ab, n, ab_name) in enumerate(spins):
+      mo = fch.mo(ab)[:,:n]
+      if i == 0:
+        mo_ref[k] = grassmann_ref_mo(nbf, n, S, mo)
+      else:
+        gammas[k].append(grassmann_log_map(nbf, n, mo_ref[k], S, mo))
+  S = None
+
+  ref = (fchs[0].fchname, list(x), spins, mo_ref, gammas, nif,
+         fchs[0].permutation(), trace_PS)
+  tasks = list(zip(gjfnames, x_new))
+  if nproc>1 and len(tasks)>1:
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(min(nproc,len(tasks)),
+                             initializer=_init_grassmann_worker,
+                             initargs=(ref,)) as pool:
+      new_fchs = list(pool.map(_grassmann_target, tasks))
+  else:
+    _init_grassmann_worker(ref)
+    new_fchs = [_grassmann_target(task) for task in tasks]
+    _init_grassmann_worker(None)
+  return new_fchs
@@ -0,0 +1,194 @@
+# written at 20261016: quasi-Newton orbital localization with full unitary steps,
+#  an alternative engine to the Jacobi 2*2 rotations in lo.f90
+
+# All three localization functions (Boys, Berry, Pipek-Mezey) have the form
+#   f = sum_c sum_i |M_c,ii|^2
+# where M_c is a symmetric matrix in MO basis (dipole integrals for Boys, complex
+# dipole integrals for Berry, gross populations on atom c for PM). For MOs
+# C' = C*exp(X) with X antisymmetric, the gradient and the diagonal Hessian with
+# respect to X are obtained from the same pair quantities A_ij, B_ij used in the
+# Jacobi kernels of lo.f90, so each step rotates all MOs at once. A trust radius
+# on the largest rotation angle controls the step length.
+
+import numpy as np
+
+
+def _pair_terms(m, f, a, b):
+    '''
+    Accumulate the target function and pair quantities of one component. m is a
+    (real or complex) symmetric (nmo,nmo) matrix. Let h_ij=(m_ii-m_jj)/2, then
+    the function value along the 2*2 rotation of MOs i and j is
+     f(t) = const + A_ij*cos(4t) + B_ij*sin(4t)
+    with A_ij = sum |h_ij|^2 - |m_ij|^2, B_ij = sum 2*Re(h_ij*conj(m_ij)).
+    '''
+    d = m.diagonal()
+    h = 0.5*(d[:,None] - d[None,:])
+    f += np.vdot(d, d).real
+    a += (h*h.conj()).real - (m*m.conj()).real
+    b += 2.0*(h*m.conj()).real
+    return f, a, b
+
+
+class _Boys(object):
+    # Boys/Berry: M_x = s_x*C^T D_x C, D_x are (complex) AO dipole integrals and
+    #  s_x are optional scale factors (e.g. lattice lengths for Berry)
+    def __init__(self, ao_dip, scale=None):
+        self.ao_dip = ao_dip
+        self.scale = np.ones(len(ao_dip)) if scale is None else scale
+
+    def __call__(self, mo):
+        nmo = mo.shape[1]
+        f = 0.0
+        a = np.zeros((nmo,nmo))
+        b = np.zeros((nmo,nmo))
+        for s, d in zip(self.scale, self.ao_dip):
+            f, a, b = _pair_terms(s*(mo.T @ d @ mo), f, a, b)
+        return f, a, b
+
+
+class _PM(object):
+    # Pipek-Mezey: M_A = 0.5*(C_A^T (SC)_A + (SC)_A^T C_A) with Mulliken charges,
+    #  or M_A = (S^1/2 C)_A^T (S^1/2 C)_A with Lowdin charges
+    def __init__(self, bfirst, ao_ovlp, popm='mulliken'):
+        self.bfirst = np.asarray(bfirst) - 1
+        if popm == 'mulliken':
+            self.s = ao_ovlp
+            self.lowdin = False
+        elif popm == 'lowdin':
+            w, v = np.linalg.eigh(ao_ovlp)
+            self.s = (v*np.sqrt(w)) @ v.T
+            self.lowdin = True
+        else:
+            raise ValueError("popm can only be 'mulliken' or 'lowdin'")
+
+    def __call__(self, mo):
+        nmo = mo.shape[1]
+        sc = self.s @ mo
+        f = 0.0
+        a = np.zeros((nmo,nmo))
+        b = np.zeros((nmo,nmo))
+        for i0, i1 in zip(self.bfirst[:-1], self.bfirst[1:]):
+            if self.lowdin:
+                q = sc[i0:i1].T @ sc[i0:i1]
+            else:
+                q = mo[i0:i1].T @ sc[i0:i1]
+                q = 0.5*(q + q.T)
+            f, a, b = _pair_terms(q, f, a, b)
+        return f, a, b
+
+
+def qn_localize(fun, mo, conv_tol=1e-5, maxcyc=500, trust=0.3, verbose=True):
+    '''
+    Maximize fun(mo) over unitary transformations of mo with trust-region
+    Newton steps, using the exact gradient and diagonal Hessian.
+    fun(mo) returns (f, A, B), see _pair_terms().
+    Converged when the sum of increases obtainable by all 2*2 rotations (the same
+    quantity as sum_change of the Jacobi engine in lo.f90) is below conv_tol.
+    Return (new_mo, info), info is a dict with keys 'niter', 'converged',
+    'tot_change' and 'history' (per-iteration records, see
+    gaussian.get_loc_info()).
+    '''
+    import time
+    from scipy.linalg import expm
+    from mokit.lib.gaussian import LOC_HIST_DTYPE
+
+    nmo = mo.shape[1]
+    info = {'niter': 0, 'converged': True, 'tot_change': 0.0,
+            'history': np.zeros(0, dtype=LOC_HIST_DTYPE)}
+    if nmo == 1:
+        return mo.copy(), info
+
+    mo = mo.copy()
+    iu = np.triu_indices(nmo, 1)
+    f0 = f = None
+    converged = False
+    history = []
+    t0 = time.perf_counter()
+    if verbose:
+        print('\nPerform quasi-Newton localization...')
+        print('conv_thres=%9.2E, nmo=%d' % (conv_tol, nmo))
+
+    for niter in range(1, maxcyc+1):
+        if f is None:
+            f, a, b = fun(mo)
+            if f0 is None:
+                f0 = f
+        au = a[iu]
+        bu = b[iu]
+        # increase obtainable by all independent 2*2 rotations
+        pair_change = np.sum(np.hypot(au, bu) - au)
+        if verbose:
+            print('niter=%4d, f=%18.8f, pair_change=%14.8f, trust=%6.3f' %
+                  (niter, f, pair_change, trust))
+        if pair_change < conv_tol:
+            converged = True
+            history.append((0.0, iu[0].size, time.perf_counter()-t0, 0))
+            break
+
+        # Newton step for the angles t_ij, with |A_ij| as a safeguard if the
+        # diagonal Hessian -16*A_ij is not negative (i.e. not a maximum)
+        h = np.maximum(np.abs(au), 1e-4*max(np.abs(au).max(), 1e-8))
+        t = bu/(4.0*h)
+        tmax = np.abs(t).max()
+        if tmax > trust:
+            t *= trust/tmax
+
+        while True:
+            x = np.zeros((nmo,nmo))
+            x[iu] = -t   # MO i is rotated toward MO j by angle t_ij
+            x -= x.T
+            new_mo = mo @ expm(x)
+            f1, a1, b1 = fun(new_mo)
+            pred = np.sum(4.0*bu*t - 8.0*au*t*t)
+            ratio = (f1 - f)/pred if pred > 0.0 else 0.0
+            if f1 > f:
+                break
+            trust *= 0.5
+            t *= 0.5
+            if trust < 1e-6:
+                break
+
+        t1 = time.perf_counter()
+        history.append((max(f1-f, 0.0), iu[0].size, t1-t0, 0))
+        t0 = t1
+        if f1 <= f: # no improvement at all, stop here
+            break
+        if ratio > 0.75 and np.abs(t).max() > 0.99*trust:
+            trust = min(2.0*trust, 0.785)
+        elif ratio < 0.25:
+            trust *= 0.5
+        mo, f, a, b = new_mo, f1, a1, b1
+
+    info['niter'] = niter
+    info['converged'] = converged
+    info['tot_change'] = float(f - f0)
+    info['history'] = np.array(history, dtype=LOC_HIST_DTYPE)
+    if verbose:
+        print('tot_change=%20.8f' % info['tot_change'])
+        if converged:
+            print('Orbital localization converged successfully.', flush=True)
+        else:
+            print('Warning from qn_localize: not converged. Final orbitals will be saved.',
+                  flush=True)
+    return mo, info
+
+
+def boys_qn(mo, ao_dip, conv_tol=1e-5, maxcyc=500, verbose=True, scale=None):
+    '''
+    Boys (real ao_dip) or Berry (complex ao_zdip) localization of mo (nbf,nmo).
+    ao_dip has shape (3,nbf,nbf). scale (3) multiplies each component in MO
+    basis, such that ao_dip itself is not modified. Return (new_mo, info).
+    '''
+    return qn_localize(_Boys(ao_dip, scale), mo, conv_tol, maxcyc,
+                       verbose=verbose)
+
+
+def pm_qn(bfirst, mo, ao_ovlp, popm='mulliken', conv_tol=1e-5, maxcyc=500,
+          verbose=True):
+    '''
+    Pipek-Mezey localization of mo (nbf,nmo). bfirst (natom+1) are indices (start
+    from 1) of the first basis function of each atom, the same as pm() in lo.f90.
+    Return (new_mo, info).
+    '''
+    return qn_localize(_PM(bfirst, ao_ovlp, popm), mo, conv_tol, maxcyc,
+                       verbose=verbose)
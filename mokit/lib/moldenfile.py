@@ -0,0 +1,408 @@
+#!/usr/bin/env python
+# This file is created at 20261017: parse a .molden file in process into the
+#  same arrays as those in the .fch file generated by molden2fch, without any
+#  subprocess or temporary file
+
+import hashlib
+import numpy as np
+from mokit.lib.fchfile import FchFile
+
+BOHR2ANG = 0.52917721092e0
+
+# .molden files of these programs can be parsed in process. For other programs,
+#  use the utility molden2fch.
+PROGRAMS = ('cp2k', 'orca', 'molpro')
+
+_ANG = 'spdfghi'
+
+# angular momenta of spherical harmonic functions declared by each keyword, all
+#  others are Cartesian functions. There is no keyword for h and higher, they
+#  are spherical harmonic ones if g functions are
+_SPH_KEYS = {'5D': (2,3), '5D7F': (2,3), '5D10F': (2,), '7F': (3,), '9G': (4,5,6)}
+
+
+def _d2e(s):
+    return s.replace('D', 'E').replace('d', 'e')
+
+
+def _split_sections(lines):
+    # return a dict: section name (upper case) -> (the rest of the header line,
+    #  data lines). Only the first section of each name is kept.
+    sections = {}
+    name = None
+    for line in lines:
+        s = line.strip()
+        if s.startswith('['):
+            k = s.find(']')
+            name = s[1:k].upper()
+            if name in sections:
+                name = None
+            else:
+                sections[name] = (s[k+1:], [])
+        elif name is not None:
+            sections[name][1].append(line)
+    return sections
+
+
+def _norm_fac_of_contract_gau(ang, e, c):
+    # the same as function norm_fac_of_contract_gau in read_mkl.f90
+    S = (4.0*np.outer(e,e)/np.add.outer(e,e)**2)**(0.25*(2*ang+3))
+    return c @ S @ c
+
+
+def _norm_fac_of_prim_gau(ang, e):
+    # the same as function norm_fac_of_prim_gau in read_mkl.f90
+    fac = (2.0*np.pi)**(0.5*ang)*(2.0*e/np.pi)**(0.25*(2*ang+3))
+    if ang == 6:
+        fac = fac/np.sqrt(10395.0)
+    return fac
+
+
+def _normalize_contr_coeff(ang, e, c):
+    '''
+    Return contraction coefficients of normalized primitives, such that the
+    contracted function is normalized. Coefficients in a .molden file may be
+    either normalized or un-normalized. The same as subroutine
+    un_normalized_all_pg in read_mkl.f90.
+    '''
+    if len(e) == 1:
+        return np.ones(1)
+    norm0 = _norm_fac_of_contract_gau(ang, e, c)
+    c1, norm = c, norm0
+    if abs(1.0-norm) > 1e-4:
+        c1 = c/_norm_fac_of_prim_gau(ang, e)
+        norm = _norm_fac_of_contract_gau(ang, e, c1)
+    if abs(1.0-norm) > 1e-4:
+        c1 = c/np.sqrt(norm0)
+        norm = _norm_fac_of_contract_gau(ang, e, c1)
+    if abs(1.0-norm) > 1e-3:
+        raise ValueError('Contraction coefficients must be either normalized or '
+                         'un-normalized ones. l=%d, norm_fac=%.8f' % (ang, norm))
+    return c1
+
+
+def _molpro_sph2cart():
+    '''
+    Expansion matrices of spherical harmonic functions (columns, in the order of
+    0,+1,-1,+2,-2,...) by normalized Cartesian functions (rows, in the molden
+    order) for d, f and g functions in Molpro .molden files. The same as rd2,
+    rf2 and rg2 in molden2fch.f90.
+    '''
+    s = np.sqrt
+    r10, r29, r56, r57, r58 = s(0.075), s(0.375), s(0.75), s(0.625), s(1.125)
+    r59, r60, r61, r62, r63 = s(0.45), s(1.2), s(0.140625), s(0.3125), s(0.546875)
+    r64, r65, r66, r67, r68 = s(5/28), s(1.25), s(45/56), s(10/7), s(27/560)
+    r69, r70, r71, r72, r73 = s(1.6875), s(27/35), s(27/28), s(9/56), s(9/7)
+    rd = [[-0.5,-0.5, 1.0, 0.0, 0.0, 0.0],
+          [ 0.0, 0.0, 0.0, 0.0, 1.0, 0.0],
+          [ 0.0, 0.0, 0.0, 0.0, 0.0, 1.0],
+          [ r56,-r56, 0.0, 0.0, 0.0, 0.0],
+          [ 0.0, 0.0, 0.0, 1.0, 0.0, 0.0]]
+    rf = [[ 0.0, 0.0, 1.0, 0.0, 0.0,-r59, 0.0, 0.0,-r59, 0.0],
+          [-r29, 0.0, 0.0,-r10, 0.0, 0.0, r60, 0.0, 0.0, 0.0],
+          [ 0.0,-r29, 0.0, 0.0,-r10, 0.0, 0.0, r60, 0.0, 0.0],
+          [ 0.0, 0.0, 0.0, 0.0, 0.0, r56, 0.0, 0.0,-r56, 0.0],
+          [ 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0],
+          [ r57, 0.0, 0.0,-r58, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+          [ 0.0,-r57, 0.0, 0.0, r58, 0.0, 0.0, 0.0, 0.0, 0.0]]
+    rg = [[r61, r61, 1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, r68,-r70,-r70, 0.0, 0.0, 0.0],
+          [0.0, 0.0, 0.0, 0.0,-r66, 0.0, 0.0, r67, 0.0, 0.0, 0.0, 0.0, 0.0,-r72, 0.0],
+          [0.0, 0.0, 0.0, 0.0, 0.0, 0.0,-r66, 0.0, r67, 0.0, 0.0, 0.0,-r72, 0.0, 0.0],
+          [-r62,r62, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, r71,-r71, 0.0, 0.0, 0.0],
+          [0.0, 0.0, 0.0,-r64, 0.0,-r64, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, r73],
+          [0.0, 0.0, 0.0, 0.0, r57, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0,-r58, 0.0],
+          [0.0, 0.0, 0.0, 0.0, 0.0, 0.0,-r57, 0.0, 0.0, 0.0, 0.0, 0.0, r58, 0.0, 0.0],
+          [r63, r63, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0,-r69, 0.0, 0.0, 0.0, 0.0, 0.0],
+          [0.0, 0.0, 0.0, r65, 0.0,-r65, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]]
+    return {2: np.array(rd).T, 3: np.array(rf).T, 4: np.array(rg).T}
+
+
+class MoldenFile(FchFile):
+    '''
+    In-memory representation of a .molden file generated by CP2K, ORCA or
+    Molpro. Geometry, basis set, MOs and occupation numbers are parsed in
+    process into the same arrays (Gaussian AO order and section names) as those
+    in the .fch file generated by `molden2fch moldenname -<program>`, including
+    the program-specific conventions, i.e.
+     CP2K: only MO coefficients larger than a threshold may be printed.
+     ORCA: F+3/F-3, G+3/G-3/G+4/G-4 (and so on) functions are multiplied by -1.
+     Molpro: spherical harmonic functions are written as Cartesian ones, which
+      are transformed back.
+    Since the .molden file has no spin multiplicity, it is guessed from the
+    occupation numbers, and the charge is guessed from the number of electrons
+    (absurd when ECP/PP is used, except ORCA which has a [Pseudo] section).
+    A MoldenFile object can be passed into load_mol_from_fch, load_cell_from_fch
+    and other functions in gaussian.py which only read data from an FchFile,
+    but not into functions which call Fortran utilities on the .fch file itself.
+
+    Simple usage::
+    >>> from mokit.lib.moldenfile import MoldenFile
+    >>> from mokit.lib.gaussian import load_mol_from_fch
+    >>> molden = MoldenFile('h2o.molden', 'orca')
+    >>> mol = load_mol_from_fch(molden)
+    >>> mo = molden.mo('a')
+    >>> print(molden.nbf, molden.nif, molden.na, molden.nb, molden.mo_occ('a'))
+    '''
+    def __init__(self, moldenname, program):
+        program = program.lower().lstrip('-')
+        if program not in PROGRAMS:
+            raise NotImplementedError(f'program={program} is not supported. Supported'
+                                      f' programs: {PROGRAMS}. Please use molden2fch.')
+        self.fchname = self.moldenname = moldenname
+        self.program = program
+        self.save_index = False
+        self._load_index()
+
+    def _load_index(self):
+        with open(self.moldenname, 'r') as f:
+            sections = _split_sections(f.readlines())
+        for key in ('ATOMS', 'GTO', 'MO'):
+            if key not in sections:
+                raise ValueError(f'No [{key}] section found in file {self.moldenname}')
+        self.title = self.moldenname
+        self.job_info = None
+        self.stamp = None
+        self.index = None
+        self.arrays = None
+        self._permute = None
+        self.data = {}
+        # angular momenta of spherical harmonic functions in the .molden file,
+        #  e.g. [5D10F] means spherical d and Cartesian f functions
+        sph = set()
+        for key in sections:
+            sph.update(_SPH_KEYS.get(key, ()))
+        self._read_atoms(sections)
+        self._read_gto(sections['GTO'][1], sph)
+        self._read_mo(sections['MO'][1])
+
+    def _read_atoms(self, sections):
+        unit, lines = sections['ATOMS']
+        ielem, coor = [], []
+        for line in lines:
+            tok = line.split()
+            if len(tok) < 6:
+                continue
+            ielem.append(int(float(tok[2])))
+            coor.append([float(_d2e(x)) for x in tok[3:6]])
+        ielem = np.array(ielem, dtype=np.int64)
+        coor = np.array(coor)
+        if 'ANG' in unit.upper():
+            coor = coor/BOHR2ANG
+        # ORCA writes the number of electrons of each atom into [Pseudo] if ECP/PP
+        #  is used
+        nuc = ielem.astype(float)
+        if 'PSEUDO' in sections:
+            for line in sections['PSEUDO'][1]:
+                tok = line.split()
+                if len(tok) > 2:
+                    nuc[int(tok[1])-1] = float(tok[2])
+        d = self.data
+        d['Number of atoms'] = len(ielem)
+        d['Atomic numbers'] = ielem
+        d['Nuclear charges'] = nuc
+        d['Current cartesian coordinates'] = coor.ravel()
+
+    def _read_gto(self, lines, sph):
+        # shells are [l, iatom, exponents, coefficients]
+        shells = []
+        iatom = nleft = 0
+        for line in lines:
+            tok = line.split()
+            if len(tok) == 0:
+                continue
+            if nleft > 0:
+                shells[-1][2].append(float(_d2e(tok[0])))
+                shells[-1][3].append(float(_d2e(tok[1])))
+                nleft -= 1
+            elif tok[0].isdigit():
+                iatom = int(tok[0])
+            else:
+                ang = tok[0].lower()
+                if len(ang)>1 or ang not in _ANG:
+                    raise ValueError(f'Unsupported angular momentum {tok[0]} in file '
+                                     f'{self.moldenname}')
+                nleft = int(tok[1])
+                shells.append([_ANG.index(ang), iatom, [], []])
+
+        shell_type, prim_per_shell, shell2atom_map = [], [], []
+        prim_exp, contr_coeff = [], []
+        for ang, iatom, e, c in shells:
+            e, c = np.array(e), np.array(c)
+            keep = np.abs(c) >= 1e-9
+            if not np.any(keep):
+                raise ValueError(f'All contraction coefficients of a shell are zero in '
+                                 f'file {self.moldenname}')
+            e, c = e[keep], c[keep]
+            # Molpro writes spherical harmonic functions as Cartesian ones
+            if ang>3 and ang not in sph and self.program!='molpro':
+                raise NotImplementedError(f'Cartesian {_ANG[ang]} functions in file '
+                                          f'{self.moldenname} are not supported.')
+            if ang>1 and (ang in sph or self.program=='molpro'):
+                shell_type.append(-ang)
+            else:
+                shell_type.append(ang)
+            prim_per_shell.append(len(e))
+            shell2atom_map.append(iatom)
+            prim_exp.append(e)
+            contr_coeff.append(_normalize_contr_coeff(ang, e, c))
+
+        d = self.data
+        d['Shell types'] = np.array(shell_type, dtype=np.int64)
+        d['Number of primitives per shell'] = np.array(prim_per_shell, dtype=np.int64)
+        d['Shell to atom map'] = np.array(shell2atom_map, dtype=np.int64)
+        d['Primitive exponents'] = np.concatenate(prim_exp)
+        d['Contraction coefficients'] = np.concatenate(contr_coeff)
+        self._sph = sph
+
+    def _read_mo(self, lines):
+        # keys (Sym=, Ene=, Spin=, Occup=) of each orbital, followed by lines of
+        #  (basis function index, coefficient)
+        ene, occ, beta = [], [], []
+        owner, clines = [], []
+        new = True
+        for line in lines:
+            if '=' in line:
+                if new:
+                    ene.append(0.0)
+                    occ.append(0.0)
+                    beta.append(False)
+                    new = False
+                key, val = line.split('=', 1)
+                key = key.strip().lower()
+                if key == 'ene':
+                    ene[-1] = float(_d2e(val))
+                elif key == 'occup':
+                    occ[-1] = float(_d2e(val))
+                elif key == 'spin':
+                    beta[-1] = val.strip().lower().startswith('b')
+            elif line.strip():
+                new = True
+                owner.append(len(ene)-1)
+                clines.append(line)
+
+        # the number of basis functions of each shell in the .molden file, i.e.
+        #  Cartesian ones before the transformation for Molpro
+        shell_type = self.data['Shell types']
+        ang = np.abs(shell_type)
+        nbf0 = np.where(np.isin(ang, list(self._sph)), 2*ang+1, (ang+1)*(ang+2)//2)
+        nbf = int(nbf0.sum())
+        dat = np.array(_d2e(' '.join(clines)).split(), dtype=float).reshape(-1,2)
+        idx = dat[:,0].astype(np.int64) - 1
+        if idx.size>0 and (idx.min()<0 or idx.max()>=nbf):
+            raise ValueError(f'Basis function index out of range in file {self.moldenname}')
+        coeff = np.zeros((nbf,len(ene)))
+        coeff[idx,np.array(owner)] = dat[:,1]
+
+        ene, occ, beta = np.array(ene), np.array(occ), np.array(beta)
+        uhf = bool(np.any(beta))
+        nif = int(np.count_nonzero(~beta))
+        if nif < np.count_nonzero(beta):
+            raise ValueError('The number of Alpha spin orbitals is less than that of '
+                             'Beta spin orbitals. Not supported.')
+        # ORCA sets linearly dependent MOs as zero, remove them
+        mo_a = coeff[:,~beta]
+        nlin = 0
+        for i in range(nif-1, -1, -1):
+            if abs(occ[~beta][i])>=1e-6 or np.sum(np.abs(mo_a[:,i]))>=1e-6:
+                break
+            nlin += 1
+        nif -= nlin
+        sets = [(mo_a[:,:nif], ene[~beta][:nif], occ[~beta][:nif])]
+        if uhf:
+            nmo_b = min(nif, np.count_nonzero(beta))
+            mo_b = np.zeros((nbf,nif))
+            e_b = np.zeros(nif)
+            occ_b = np.zeros(nif)
+            mo_b[:,:nmo_b] = coeff[:,beta][:,:nmo_b]
+            e_b[:nmo_b] = ene[beta][:nmo_b]
+            occ_b[:nmo_b] = occ[beta][:nmo_b]
+            sets.append((mo_b, e_b, occ_b))
+
+        sets = [(self._program_convention(mo, nbf0), e, o) for mo, e, o in sets]
+        nbf = sets[0][0].shape[0]
+
+        if uhf:
+            na = int(round(np.sum(sets[0][2])))
+            nb = int(round(np.sum(sets[1][2])))
+        else:
+            occ_a = sets[0][2]
+            nopen = int(np.count_nonzero(np.abs(occ_a-1.0) < 1e-5))
+            na = int(round((np.sum(occ_a)+nopen)*0.5))
+            nb = int(round((np.sum(occ_a)-nopen)*0.5))
+
+        d = self.data
+        d['Charge'] = int(round(np.sum(d['Nuclear charges']))) - na - nb
+        d['Multiplicity'] = na - nb + 1
+        d['Number of electrons'] = na + nb
+        d['Number of alpha electrons'] = na
+        d['Number of beta electrons'] = nb
+        d['Number of basis functions'] = nbf
+        d['Number of independent functions'] = nif
+        self._occ = {}
+        for ab, (mo, e, o) in zip(('Alpha', 'Beta'), sets):
+            d[ab+' Orbital Energies'] = e
+            d[ab+' MO coefficients'] = mo.T.ravel()
+            self._occ[ab[0].lower()] = o
+
+    def _program_convention(self, mo, nbf0):
+        # convert MO coefficients into those of Gaussian conventions, the same as
+        #  subroutine molden2fch in molden2fch.f90
+        shell_type = self.data['Shell types']
+        if self.program == 'orca':
+            # F+3, F-3, G+3, G-3, G+4, G-4 (H, I likewise) multiplied by -1
+            mo = mo.copy()
+            k = 0
+            for itype, n in zip(shell_type, nbf0):
+                if itype == -3:
+                    mo[k+5:k+7] *= -1.0
+                elif itype < -3:
+                    mo[k+5:k+9] *= -1.0
+                k += n
+        elif self.program=='molpro':
+            # Cartesian -> spherical harmonic functions
+            if any(itype < -4 and -itype not in self._sph for itype in shell_type):
+                raise ValueError('Molpro cannot generate .molden file for angular '
+                                 'momentum >=h. This molden file is suspicious.')
+            R = _molpro_sph2cart()
+            blocks = []
+            k = 0
+            for itype, n in zip(shell_type, nbf0):
+                if itype < -1 and -itype not in self._sph:
+                    blocks.append(np.linalg.lstsq(R[-itype], mo[k:k+n], rcond=None)[0])
+                else:
+                    blocks.append(mo[k:k+n])
+                k += n
+            mo = np.vstack(blocks)
+        return mo
+
+    def _check_stamp(self):
+        pass
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def keys(self):
+        return self.data.keys()
+
+    def digest(self, keys):
+        '''
+        Return the SHA-1 hex digest of given arrays, see FchFile.digest().
+        '''
+        h = hashlib.sha1()
+        for key in keys:
+            if key not in self.data:
+                continue
+            h.update(key.encode())
+            h.update(np.ascontiguousarray(self.data[key]).tobytes())
+        return h.hexdigest()
+
+    def mo_occ(self, ab='a'):
+        '''
+        Return occupation numbers (nif) of alpha or beta MOs.
+        '''
+        if ab not in self._occ:
+            raise ValueError("ab can only be 'a' or 'b' (UHF-type .molden only)")
+        return self._occ[ab].copy()
@@ -1,21 +1,31 @@
-from mokit.lib.py2fch import molinfo2fch, molecp2fch, py2fch
+from mokit.lib.py2fch import (molinfo2fch, molecp2fch, py2fch,
+                              set_mo_into_fch_content, set_dm_into_fch_content,
+                              write_pyscf_dm_into_fch)
+from mokit.lib.fchfile import save_fch_arrays, get_basis_permutation
 import os
 import numpy as np
-try:
+
+
+def _import_pyscf_scf():
+    # PySCF is imported at the first call of fchk/mol2fch, not when this module
+    #  (or mokit.lib) is imported, since importing PySCF is expensive
     from pyscf import scf, mcscf
-    from pyscf.data import elements, nist
-    from pyscf.gto.mole import ANG_OF, NPRIM_OF, NCTR_OF, PTR_EXP, PTR_COEFF, gto_norm
-except:
-    print("Warning: pyscf not found. All py2xxx functionality cannot work.")
-else:
     if hasattr(mcscf.casci, 'CASBase'):
         CASBase = mcscf.casci.CASBase
     else:
         CASBase = mcscf.casci.CASCI
+    return scf, CASBase
 
 
-def mol2fch(mol, fchname='test.fch', uhf=False, mo=None, irel=-1, trim_zeros=True):
+def mol2fch(mol, fchname='test.fch', uhf=False, mo=None, irel=-1, trim_zeros=True,
+            mo_e=None, dm=None, spin_dm=None):
     # irel=-3/-2/-1/0/2/4 for sfX2C/RESC/None/DKH0/DKH2/DKH4 relativistic Hamiltonian
+    # If mo_e is given, MOs (mo) and orbital energies/occupation numbers (mo_e),
+    #  as well as the Total/Spin SCF Density (dm/spin_dm, if given), are written
+    #  together with the basis set data in one pass. The basis function permutation
+    #  PySCF->Gaussian is computed only once here.
+    from pyscf.data import elements, nist
+    from pyscf.gto.mole import ANG_OF, NPRIM_OF, NCTR_OF, PTR_EXP, PTR_COEFF, gto_norm
     nbf = mol.nao
     if mo is not None:
         if uhf:
@@ -133,6 +143,18 @@ def mol2fch(mol, fchname='test.fch', uhf=False, mo=None, irel=-1, trim_zeros=Tru
         CLP = np.zeros(0)
         ZLP = np.zeros(0)
     
+    if mo_e is not None:
+        perm = get_basis_permutation(shell_type, shell2atom_map, nbf)
+        if uhf:
+            for ab, c, e in zip('ab', mo, mo_e):
+                set_mo_into_fch_content(ab, nbf, nif, perm.mo2gau(c), e)
+        else:
+            set_mo_into_fch_content('a', nbf, nif, perm.mo2gau(mo), mo_e)
+        if dm is not None:
+            set_dm_into_fch_content(1, nbf, perm.dm2gau(dm))
+        if spin_dm is not None:
+            set_dm_into_fch_content(2, nbf, perm.dm2gau(spin_dm))
+
     if LenNCZ > 0:
         molecp2fch(fchname, uhf, nbf, nif, na, nb, ncontr, nprimitive, charge, mult, natom, LenNCZ, 
              ielem, ghost, shell_type, prim_per_shell, shell2atom_map, 
@@ -146,7 +168,30 @@ def mol2fch(mol, fchname='test.fch', uhf=False, mo=None, irel=-1, trim_zeros=Tru
              #KFirst, KLast, Lmax, LPSkip, NLP, RNFroz, CLP, ZLP
              )
 
+def get_mol_permutation(mol):
+    '''
+    Return the (cached) BasisPermutation object between the PySCF and Gaussian
+    AO orders of the basis set in mol, see mokit.lib.fchfile.BasisPermutation.
+
+    Simple usage::
+    >>> from mokit.lib.py2fch_direct import get_mol_permutation
+    >>> perm = get_mol_permutation(mol)
+    >>> mo_gau = perm.mo2gau(mf.mo_coeff)
+    >>> dip_gau = perm.int2gau(mol.intor_symmetric('int1e_r'))
+    '''
+    shell_type = []
+    shell2atom_map = []
+    for i in range(mol.nbas):
+        itype = mol.bas_angular(i)
+        if not mol.cart and itype > 1:
+            itype = -itype
+        nctr = mol.bas_nctr(i)
+        shell_type.extend([itype]*nctr)
+        shell2atom_map.extend([mol.bas_atom(i)+1]*nctr)
+    return get_basis_permutation(shell_type, shell2atom_map, mol.nao)
+
 def find_irel_from_mf(mf):
+    scf, CASBase = _import_pyscf_scf()
     irel = -1 # initialization
 
     if isinstance(mf, scf.hf.SCF):
@@ -164,26 +209,44 @@ def find_irel_from_mf(mf):
 def fchk_uno(mf, fchname, uno, unoon, density=False, overwrite_mol=False):
     if (not os.path.isfile(fchname)) or overwrite_mol:
         irel = find_irel_from_mf(mf)
-        mol2fch(mf.mol, fchname, False, uno, irel)
-    py2fch(fchname, uno.shape[0], uno.shape[1], uno, 'a', unoon, True, density)
+        dm = np.dot(uno*unoon, uno.T) if density else None
+        mol2fch(mf.mol, fchname, False, uno, irel, mo_e=unoon, dm=dm)
+    else:
+        py2fch(fchname, uno.shape[0], uno.shape[1], uno, 'a', unoon, True, density)
 
-def fchk(mf, fchname, density=False, overwrite_mol=False, mo_coeff=None, mo_occ=None):
+def fchk(mf, fchname, density=False, overwrite_mol=False, mo_coeff=None, mo_occ=None,
+         binary=False):
+    '''
+    Dump the wave function in a PySCF object into a Gaussian .fch file.
+    If fchname does not exist (or overwrite_mol=True), the whole file, including
+    MOs, orbital energies/occupation numbers and densities, is written in one pass.
+    Otherwise only the MO (and density) sections of the existing file are updated.
+    density: also write the Total SCF Density (and the Spin SCF Density for
+     UHF/ROHF).
+    binary: also save MOs, orbital energies/occupation numbers and the total
+     density (if density=True), all in PySCF AO order, into the binary companion
+     of the .fch file (see
+     mokit.lib.fchfile.save_fch_arrays), which can be memory-mapped later by
+     mo_fch2py/FchFile without parsing the text .fch file.
+    '''
+    scf, CASBase = _import_pyscf_scf()
     is_uhf = isinstance(mf, scf.uhf.UHF)
     if mo_coeff is None:
         mo = mf.mo_coeff
     else:
         mo = mo_coeff
-    if (not os.path.isfile(fchname)) or overwrite_mol:
-        irel = find_irel_from_mf(mf)
-        mol2fch(mf.mol, fchname, is_uhf, mo, irel)
+    dm = None
+    spin_dm = None
     if isinstance(mf, scf.hf.SCF):
         if isinstance(mf, (scf.ghf.GHF, scf.dhf.DHF)):
             raise NotImplementedError('GHF/DHF not supported in py2fch currently.')
-        if not is_uhf: # ROHF is also RHF here
-            py2fch(fchname, mo.shape[0], mo.shape[1], mo, 'a', mf.mo_energy, False, density)
-        else:
-            py2fch(fchname, mo[0].shape[0], mo[0].shape[1], mo[0], 'a', mf.mo_energy[0], False, density)
-            py2fch(fchname, mo[1].shape[0], mo[1].shape[1], mo[1], 'b', mf.mo_energy[1], False, density)
+        ev = mf.mo_energy
+        natorb = False
+        if density:
+            dm = mf.make_rdm1(mo, mf.mo_occ)
+            if dm.ndim == 3: # UHF/ROHF
+                spin_dm = dm[0] - dm[1]
+                dm = dm[0] + dm[1]
     elif isinstance(mf, CASBase):
         if mf.mo_occ is None and mo_occ is None:
             if density is True:
@@ -191,7 +254,7 @@ def fchk(mf, fchname, density=False, overwrite_mol=False, mo_coeff=None, mo_occ=
                                           'Dumping CASSCF density without natural orbitals is not supported yet.'
                                           'Use mf.natorb=True if you want to dump density.')
             else:
-                occ = mf.mo_energy
+                ev = mf.mo_energy
                 # Here we assume that HF canonical orbitals are stored in CASCI obj.
                 # For BDF program, the HF canonical orbital energies must be written
                 #  into the .scforb file, otherwise SCF in BDF cannot be converged in
@@ -199,14 +262,38 @@ def fchk(mf, fchname, density=False, overwrite_mol=False, mo_coeff=None, mo_occ=
                 # For non-canonical orbitals, this section is useless, either.
                 # Considering all cases above, occ = mf.mo_energy seems a good choice.
         elif mo_occ is not None:
-            occ = mo_occ
+            ev = mo_occ
         else:
-            occ = mf.mo_occ
-
-        py2fch(fchname, mo.shape[0], mo.shape[1], mo, 'a', occ, True, density)
+            ev = mf.mo_occ
+        natorb = True
+        if density:
+            dm = np.dot(mo*ev, mo.T)
     else:
         raise TypeError('cannot dump fchk for %s job' %mf.__class__ )
 
+    if (not os.path.isfile(fchname)) or overwrite_mol:
+        irel = find_irel_from_mf(mf)
+        mol2fch(mf.mol, fchname, is_uhf, mo, irel, mo_e=ev, dm=dm, spin_dm=spin_dm)
+    else:
+        if is_uhf:
+            py2fch(fchname, mo[0].shape[0], mo[0].shape[1], mo[0], 'a', ev[0], False, False)
+            py2fch(fchname, mo[1].shape[0], mo[1].shape[1], mo[1], 'b', ev[1], False, False)
+            if density:
+                write_pyscf_dm_into_fch(fchname, 1, dm.shape[0], dm, True)
+        else:
+            py2fch(fchname, mo.shape[0], mo.shape[1], mo, 'a', ev, natorb, density)
+        if spin_dm is not None:
+            write_pyscf_dm_into_fch(fchname, 2, spin_dm.shape[0], spin_dm, True)
+
+    if binary:
+        if is_uhf:
+            arrays = {'alpha_mo': mo[0], 'alpha_e': ev[0], 'beta_mo': mo[1], 'beta_e': ev[1]}
+        else:
+            arrays = {'alpha_mo': mo, 'alpha_e': ev}
+        if dm is not None:
+            arrays['dm'] = dm
+        save_fch_arrays(fchname, **arrays)
+
 # alias
 py2gau = fchk
 
@@ -388,13 +388,10 @@ subroutine prt_auto_pair_script_into_py(pyname)
    write(fid2,'(A)') 'from mokit.lib.gaussian import find_antibonding_orb'
   end if
 
-  if(TRIM(localm) == 'boys') then
-   write(fid2,'(A)') 'from mokit.lib.gaussian import get_ao_dip, BOHR2ANG'
-  end if
   ! dipole_integral is always needed in this file
   write(fid2,'(A)') 'from pyscf.lo.boys import dipole_integral'
   write(fid2,'(A)') 'from mokit.lib.auto_pair import pair_by_tdm'
-  write(fid2,'(A,/)') 'from mokit.lib.auto import loc_ini_guess, loc_driver'
+  write(fid2,'(A,/)') 'from mokit.lib.gaussian import localize'
 
   do while(.true.)
    read(fid1,'(A)',iostat=i) buf
@@ -410,21 +407,17 @@ subroutine prt_auto_pair_script_into_py(pyname)
   write(fid2,'(A)') 'nval = nb - ncore'
   write(fid2,'(A)') 'npair = min(npair, nval)'
   write(fid2,'(A)') 'occ_idx = range(ncore,nb)'
-  write(fid2,'(A)') 'occ_mo = mo[:,occ_idx].copy()'
-  write(fid2,'(A)') 'nmo1, lmo_ini = loc_ini_guess(mol, occ_mo, nval)'
 
   ! There exist multiple local minima of vir_idx orbital localization at target
   ! basis set. Since 20250113 this orbital localization is replaced by an
   ! orbital localization at the minimal basis set using loc(), followed by a
   ! virtual space projection using orb_resemble_ref1().
+  ! LMOs are obtained in memory, without any .fch file written or read
   select case(TRIM(localm))
   case('pm')   ! Pipek-Mezey orbital localization
-   write(fid2,'(A)') "occ_lmo = loc_driver(mol, lmo_ini, nval, method='pm')"
+   write(fid2,'(A)') "mo = localize(mol, mo, occ_idx, method='pm')"
   case('boys') ! Foster-Boys orbital localization
-   write(fid2,'(A)') 'center, ao_dip = get_ao_dip(mol)'
-   write(fid2,'(A)') 'ao_dip = ao_dip*BOHR2ANG'
-   write(fid2,'(A)') "occ_lmo = loc_driver(mol, lmo_ini, nval, method='boys', a&
-                     &o_dip=ao_dip)"
+   write(fid2,'(A)') "mo = localize(mol, mo, occ_idx, method='boys')"
   case default
    write(6,'(/,A)') 'ERROR in subroutine prt_auto_pair_script_into_py: unknown &
                     &orbital local-'
@@ -432,7 +425,6 @@ subroutine prt_auto_pair_script_into_py(pyname)
    stop
   end select
 
-  write(fid2,'(A)') 'mo[:,occ_idx] = occ_lmo.copy()'
   write(fid2,'(A)') '# localization done'
   write(fid2,'(/,A)') '# pair the active orbitals'
   write(fid2,'(A)') 'mo_dipole = dipole_integral(mol, mo)'
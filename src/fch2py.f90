@@ -62,11 +62,64 @@ subroutine fch2py(fchname, nbf, nif, ab, coeff2)
   stop
  end if
 
+ ! 'Shell types' and 'Shell to atom map' are ahead of MOs in a .fch(k) file,
+ ! so read them first and then go on to MOs. This avoids rewinding the file
+ ! and scanning it from the beginning again.
  open(newunit=fchid,file=TRIM(fchname),status='old',position='rewind')
  do while(.true.)
-  read(fchid,'(A)') buffer
+  read(fchid,'(A)',iostat=i) buffer
+  if(i /= 0) exit
+  if(buffer(1:11) == 'Shell types') exit
+ end do ! for while
+
+ if(i /= 0) then
+  write(6,'(/,A)') "ERROR in subroutine fch2py: missing the 'Shell types'&
+                   & section in .fch file!"
+  write(6,'(A)') TRIM(fchname)
+  close(fchid)
+  stop
+ end if
+
+ BACKSPACE(fchid)
+ read(fchid,'(A49,2X,I10)') buffer, k
+
+ allocate(shell_type(2*k), source=0)
+ read(fchid,'(6(6X,I6))') (shell_type(i),i=1,k)
+ ! read Shell types done
+
+ ! find and read Shell to atom map
+ do while(.true.)
+  read(fchid,'(A)',iostat=i) buffer
+  if(i /= 0) exit
+  if(buffer(1:13) == 'Shell to atom') exit
+ end do ! for while
+
+ if(i /= 0) then
+  write(6,'(/,A)') "ERROR in subroutine fch2py: missing the 'Shell to atom map'&
+                   & section in file"
+  write(6,'(A)') TRIM(fchname)
+  close(fchid)
+  stop
+ end if
+
+ allocate(shell_to_atom_map(2*k), source=0)
+ read(fchid,'(6(6X,I6))') (shell_to_atom_map(i),i=1,k)
+ ! read Shell to atom map done
+
+ ! go on to find Alpha MO or Beta MO
+ do while(.true.)
+  read(fchid,'(A)',iostat=i) buffer
+  if(i /= 0) exit
   if(buffer(1:8) == key) exit
  end do
+
+ if(i /= 0) then
+  write(6,'(/,A)') "ERROR in subroutine fch2py: no '"//TRIM(key)//"' found in&
+                   & file "//TRIM(fchname)
+  close(fchid)
+  stop
+ end if
+
  BACKSPACE(fchid)
  read(fchid,'(A49,2X,I10)') buffer, ncoeff
 
@@ -132,45 +185,6 @@ subroutine fch2py(fchname, nbf, nif, ab, coeff2)
 
  deallocate(coeff)
 
- rewind(fchid)   ! find and read Shell types
- do while(.true.)
-  read(fchid,'(A)',iostat=i) buffer
-  if(buffer(1:11) == 'Shell types') exit
- end do ! for while
-
- if(i /= 0) then
-  write(6,'(/,A)') "ERROR in subroutine fch2py: missing the 'Shell types'&
-                   & section in .fch file!"
-  write(6,'(A)') TRIM(fchname)
-  close(fchid)
-  stop
- end if
-
- BACKSPACE(fchid)
- read(fchid,'(A49,2X,I10)') buffer, k
-
- allocate(shell_type(2*k), source=0)
- read(fchid,'(6(6X,I6))') (shell_type(i),i=1,k)
- ! read Shell types done
-
- ! find and read Shell to atom map
- do while(.true.)
-  read(fchid,'(A)',iostat=i) buffer
-  if(buffer(1:13) == 'Shell to atom') exit
- end do ! for while
-
- if(i /= 0) then
-  write(6,'(/,A)') "ERROR in subroutine fch2py: missing the 'Shell to atom map'&
-                   & section in file"
-  write(6,'(A)') TRIM(fchname)
-  close(fchid)
-  stop
- end if
-
- allocate(shell_to_atom_map(2*k), source=0)
- read(fchid,'(6(6X,I6))') (shell_to_atom_map(i),i=1,k)
- ! read Shell to atom map done
-
  ! all information in .fchk file read done
  close(fchid)
 
@@ -2,6 +2,16 @@
 ! updated by jxzou at 20200411: add Pipek-Mezey orbital localization (DOI: 10.1063/1.456588)
 ! updated by jxzou at 20200413: add Cholesky decomposition LMOs (DOI: 10.1063/1.2360264)
 ! updated by jxzou at 20220520: generate NO from a NSO .fch file
+! updated at 20261016: add subroutine get_loc_conv_info
+! updated at 20261016: add sparse PM localization (subroutine pm_sparse) under
+!  a memory budget
+! updated at 20261016: add DIIS for Boys localization
+! updated at 20261016: run-time serial/parallel cutoff and OpenMP threads (subroutine
+!  set_loc_para)
+! updated at 20261017: Berry localization with given MO-basis integrals (subroutine
+!  berry_mo)
+! updated at 20261017: per-iteration records of localization (subroutine
+!  get_loc_hist) and a switch of printing (subroutine set_loc_verbose)
 
 ! Note: before PySCF-1.6.4, its dumped .molden file is wrong when using Cartesian functions.
 
@@ -590,6 +600,7 @@ end subroutine combined_ao_cholesky
 ! new_mo is the unitary transformation of mo.
 subroutine gen_loc_ini_guess(natom, nbf, nif, chosen, bfirst, ao_ovlp, mo, &
                              nif1, new_mo)
+ use lo_info, only: loc_verbose
  implicit none
  integer :: i, j, k, nbf1
  integer, intent(in) :: natom, nbf, nif
@@ -616,13 +627,15 @@ subroutine gen_loc_ini_guess(natom, nbf, nif, chosen, bfirst, ao_ovlp, mo, &
 !f2py intent(in) :: chosen
 !f2py depend(natom) :: chosen
 
- write(6,'(/,A)') 'Construct AO-like LMOs as initial guess...'
+ if(loc_verbose > 0) then
+  write(6,'(/,A)') 'Construct AO-like LMOs as initial guess...'
+ end if
 
  if(ALL(chosen .eqv. .true.)) then
   nif1 = nif
   new_mo = mo
   call resemble_ao(nbf, nif, ao_ovlp, .true., new_mo)
-  write(6,'(A)') 'Done construction.'
+  if(loc_verbose > 0) write(6,'(A)') 'Done construction.'
   return
  end if
 
@@ -632,9 +645,11 @@ subroutine gen_loc_ini_guess(natom, nbf, nif, chosen, bfirst, ao_ovlp, mo, &
   return
  end if
 
- write(6,'(A)') 'Not all atoms are chosen. Only localized orbitals centered on &
-                &specified atoms to'
- write(6,'(A)') 'be solved...'
+ if(loc_verbose > 0) then
+  write(6,'(A)') 'Not all atoms are chosen. Only localized orbitals centered o&
+                 &n specified atoms to'
+  write(6,'(A)') 'be solved...'
+ end if
  allocate(idx(nbf), source=0)
  nbf1 = 0
 
@@ -674,8 +689,10 @@ subroutine gen_loc_ini_guess(natom, nbf, nif, chosen, bfirst, ao_ovlp, mo, &
  allocate(u(nif,nif), vt(k,k), s(nif))
  call do_svd(nif, k, mo_ovlp, u, vt, s)
  nif1 = COUNT(s > sv_thres)
- write(6,'(A)') 'Singular values:'
- write(6,'(5(1X,ES15.8))') s
+ if(loc_verbose > 0) then
+  write(6,'(A)') 'Singular values:'
+  write(6,'(5(1X,ES15.8))') s
+ end if
  deallocate(mo_ovlp, u, s)
 
  ! solve reference MOs proj_mo(:,1:nif1)
@@ -690,7 +707,7 @@ subroutine gen_loc_ini_guess(natom, nbf, nif, chosen, bfirst, ao_ovlp, mo, &
  ! will probably be unused in subsequent orbital localization.
  call orb_resemble_ref1(nbf, nif, mo, nbf1, nif1, proj_mo, ao_ovlp2, new_mo)
  deallocate(proj_mo, ao_ovlp2)
- write(6,'(A)') 'Done construction.'
+ if(loc_verbose > 0) write(6,'(A)') 'Done construction.'
 end subroutine gen_loc_ini_guess
 
 subroutine classify_lmo(nmo, natom, gross, conn)
@@ -738,10 +755,8 @@ end subroutine classify_lmo
 ! The input ao_zdip must be in unit Angstrom.
 subroutine berry(natom, nbf, nmo, maxcyc, lo_diis, bfirst, dis, mo, ao_zdip, &
                  dis_tol, conv_tol, new_mo)
- use lo_info, only: max_niter, dis_thres, conv_thres, npair, ijmap, diis, u, &
-  cayley_k, k_old, k_diis, nfile, binfile
+ use lo_info, only: loc_niter, loc_tot_change, loc_verbose
  implicit none
- integer :: k
  integer, intent(in) :: natom, nbf, nmo, maxcyc
 !f2py intent(in) :: natom, nbf, nmo, maxcyc
  integer, intent(in) :: bfirst(natom+1)
@@ -758,23 +773,86 @@ subroutine berry(natom, nbf, nmo, maxcyc, lo_diis, bfirst, dis, mo, ao_zdip, &
 !f2py intent(in) :: ao_zdip
 !f2py depend(nbf) :: ao_zdip
  complex(kind=8), allocatable :: mo_zdip(:,:,:)
- character(len=240) :: proname
  logical, intent(in) :: lo_diis
 !f2py intent(in) :: lo_diis
 
- write(6,'(/,A)') 'Berry orbital localization begins:'
- new_mo = mo; dis_thres = dis_tol; conv_thres = conv_tol
- diis = lo_diis; max_niter = maxcyc
+ if(loc_verbose > 0) write(6,'(/,A)') 'Berry orbital localization begins:'
+ loc_niter = 0; loc_tot_change = 0d0
+ new_mo = mo
 
  if(nmo == 1) then
   write(6,'(A)') 'Warning from subroutine berry: only 1 orbital. No rotation.'
   return
  end if
 
- write(6,'(/,A)') 'Transform AO complex dipole integrals to MO ones...'
+ if(loc_verbose > 0) then
+  write(6,'(/,A)') 'Transform AO complex dipole integrals to MO ones...'
+ end if
  allocate(mo_zdip(3,nmo,nmo))
  call ao2mo_zdip(nbf, nmo, new_mo, ao_zdip, mo_zdip)
- write(6,'(A)') 'Done update.'
+ if(loc_verbose > 0) write(6,'(A)') 'Done update.'
+
+ call berry_core(natom, nbf, nmo, maxcyc, lo_diis, bfirst, dis, new_mo, &
+                 mo_zdip, dis_tol, conv_tol)
+ deallocate(mo_zdip)
+end subroutine berry
+
+! The same as subroutine berry, but the complex dipole integrals in MO basis
+! mo_zdip (in unit Angstrom) are given instead of AO ones, so that the AO
+! tensor (3,nbf,nbf) needs not be stored (it can be transformed block by block
+! in Python). mo_zdip is overwritten.
+subroutine berry_mo(natom, nbf, nmo, maxcyc, lo_diis, bfirst, dis, mo, mo_zdip,&
+                    dis_tol, conv_tol, new_mo)
+ use lo_info, only: loc_niter, loc_tot_change, loc_verbose
+ implicit none
+ integer, intent(in) :: natom, nbf, nmo, maxcyc
+!f2py intent(in) :: natom, nbf, nmo, maxcyc
+ integer, intent(in) :: bfirst(natom+1)
+!f2py intent(in) :: bfirst
+!f2py depend(natom) :: bfirst
+ real(kind=8), intent(in) :: dis(natom,natom), mo(nbf,nmo), dis_tol, conv_tol
+!f2py intent(in) :: dis, mo, dis_tol, conv_tol
+!f2py depend(natom) :: dis
+!f2py depend(nbf,nmo) :: mo
+ real(kind=8), intent(out) :: new_mo(nbf,nmo)
+!f2py intent(out) :: new_mo
+!f2py depend(nbf,nmo) :: new_mo
+ complex(kind=8), intent(inout) :: mo_zdip(3,nmo,nmo) ! complex symmetric
+!f2py intent(inout) :: mo_zdip
+!f2py depend(nmo) :: mo_zdip
+ logical, intent(in) :: lo_diis
+!f2py intent(in) :: lo_diis
+
+ if(loc_verbose > 0) write(6,'(/,A)') 'Berry orbital localization begins:'
+ loc_niter = 0; loc_tot_change = 0d0
+ new_mo = mo
+
+ if(nmo == 1) then
+  write(6,'(A)') 'Warning from subroutine berry_mo: only 1 orbital. No rotation.'
+  return
+ end if
+
+ call berry_core(natom, nbf, nmo, maxcyc, lo_diis, bfirst, dis, new_mo, &
+                 mo_zdip, dis_tol, conv_tol)
+end subroutine berry_mo
+
+! Jacobian 2*2 rotations of Berry localization, mo and mo_zdip are updated
+subroutine berry_core(natom, nbf, nmo, maxcyc, lo_diis, bfirst, dis, mo, &
+                      mo_zdip, dis_tol, conv_tol)
+ use lo_info, only: max_niter, dis_thres, conv_thres, npair, ijmap, diis, u, &
+  cayley_k, k_old, k_diis, nfile, binfile
+ implicit none
+ integer :: k
+ integer, intent(in) :: natom, nbf, nmo, maxcyc
+ integer, intent(in) :: bfirst(natom+1)
+ real(kind=8), intent(in) :: dis(natom,natom), dis_tol, conv_tol
+ real(kind=8), intent(inout) :: mo(nbf,nmo)
+ complex(kind=8), intent(inout) :: mo_zdip(3,nmo,nmo)
+ character(len=240) :: proname
+ logical, intent(in) :: lo_diis
+
+ dis_thres = dis_tol; conv_thres = conv_tol
+ diis = lo_diis; max_niter = maxcyc
 
  npair = nmo*(nmo-1)/2
  allocate(ijmap(2,npair))
@@ -787,29 +865,115 @@ subroutine berry(natom, nbf, nmo, maxcyc, lo_diis, bfirst, dis, mo, ao_zdip, &
  end if
 
  if(nmo < 10) then
-  call serial2by2_cmplx(nbf, nmo, new_mo, mo_zdip)
+  call serial2by2_cmplx(nbf, nmo, mo, mo_zdip)
  else
-  call serial22berry(natom, nbf, nmo, bfirst, dis, new_mo, mo_zdip)
+  call serial22berry(natom, nbf, nmo, bfirst, dis, mo, mo_zdip)
  end if
  !else if(nmo < 500) then
- ! call serial22berry(natom, nbf, nmo, bfirst, dis, new_mo, mo_zdip)
+ ! call serial22berry(natom, nbf, nmo, bfirst, dis, mo, mo_zdip)
  !else
- ! call para22berry(natom, nbf, nmo, bfirst, dis, new_mo, mo_zdip)
+ ! call para22berry(natom, nbf, nmo, bfirst, dis, mo, mo_zdip)
  !end if
 
  ! job accomplished, no need to update the lower triangle part of mo_zdip
- deallocate(mo_zdip, ijmap)
+ deallocate(ijmap)
  if(diis) then
   call delete_files(nfile, binfile)
   deallocate(u, cayley_k, k_old, k_diis, binfile)
  end if
-end subroutine berry
+end subroutine berry_core
+
+! Initialize DIIS for Boys Jacobi 2*2 rotations, which is the same algorithm
+! as that in Berry localization: all 2*2 rotations are accumulated into a
+! unitary matrix u, and the Cayley transformation K of u is extrapolated by DIIS
+! every two cycles (after ndiis cycles). Previous K matrices are stored in
+! binary files.
+subroutine init_jacobi_diis(label, nmo)
+ implicit none
+ integer :: k
+ integer, intent(in) :: nmo
+ character(len=*), intent(in) :: label
+ character(len=240) :: proname
+
+ call get_a_random_int(k)
+ write(proname,'(A,I0)') label, k
+ call init_lo_diis(proname, nmo)
+end subroutine init_jacobi_diis
+
+subroutine free_jacobi_diis()
+ use lo_info, only: nfile, binfile, u, cayley_k, k_old, k_diis
+ implicit none
+
+ call delete_files(nfile, binfile)
+ deallocate(u, cayley_k, k_old, k_diis, binfile)
+end subroutine free_jacobi_diis
+
+! Undo a DIIS extrapolation (which makes the target function decrease) done by
+! subroutine get_mo_and_u_from_cayley_k_diis. v is the transpose of u_tmp.
+subroutine undo_jacobi_diis(nbf, nmo, v, mo)
+ use lo_info, only: u, cayley_k, k_old
+ implicit none
+ integer, intent(in) :: nbf, nmo
+ real(kind=8), intent(in) :: v(nmo,nmo)
+ real(kind=8), intent(inout) :: mo(nbf,nmo)
+ real(kind=8), allocatable :: r(:,:)
+
+ allocate(r(nbf,nmo), source=mo)
+ call dgemm('N','N', nbf, nmo, nmo, 1d0, r, nbf, v, nmo, 0d0, mo, nbf)
+ deallocate(r)
+ allocate(r(nmo,nmo), source=u)
+ call dgemm('N','N', nmo, nmo, nmo, 1d0, r, nmo, v, nmo, 0d0, u, nmo)
+ deallocate(r)
+ cayley_k = k_old
+end subroutine undo_jacobi_diis
+
+! Perform the DIIS part of the i-th cycle of Boys localization. If an
+! extrapolation is performed and accepted, solve_new_mo=.false. and sum_change
+! (the increase of the Boys function) are returned. An extrapolation which makes
+! the Boys function decrease is rejected.
+subroutine boys_diis_step(i, nbf, nmo, mo, mo_dip, sum_change, solve_new_mo)
+ use lo_info, only: ndiis, ijmap, u, k_old, cayley_k, k_diis, binfile
+ implicit none
+ integer, intent(in) :: i, nbf, nmo
+ real(kind=8) :: fboys0, fboys
+ real(kind=8), intent(inout) :: mo(nbf,nmo), mo_dip(3,nmo,nmo)
+ real(kind=8), intent(out) :: sum_change
+ real(kind=8), allocatable :: u_tmp(:,:)
+ logical, intent(out) :: solve_new_mo
+
+ solve_new_mo = .true.; sum_change = 0d0
+ if((i>1 .and. i<ndiis+3) .or. (i>ndiis+2 .and. MOD(i,2)==1)) then
+  call save_cayley_k_old(nmo, ndiis, k_old, binfile)
+ end if
+ if(.not. (i>ndiis .and. MOD(i,2)==0)) return
+
+ allocate(u_tmp(nmo,nmo))
+ call get_mo_and_u_from_cayley_k_diis(nbf, nmo, ndiis, ijmap, binfile, k_diis,&
+                                      u, mo, k_old, cayley_k, u_tmp)
+ call get_fboys(nmo, mo_dip, fboys0)
+ call symmetrize_mo_dip(nmo, mo_dip) ! remember to symmetrize mo_dip
+ call update_mo_dip_by_u(nmo, u_tmp, mo_dip)
+ call get_fboys(nmo, mo_dip, fboys)
+
+ if(fboys < fboys0) then
+  u_tmp = TRANSPOSE(u_tmp)
+  call update_mo_dip_by_u(nmo, u_tmp, mo_dip)
+  call undo_jacobi_diis(nbf, nmo, u_tmp, mo)
+ else
+  sum_change = fboys - fboys0
+  solve_new_mo = .false.
+ end if
+ deallocate(u_tmp)
+end subroutine boys_diis_step
 
 ! Perform Boys orbital localization (Jacobian 2*2 rotations) on a set of MOs.
 ! The input ao_dip must be in unit Angstrom.
+! lo_diis: whether to accelerate the 2*2 rotations by DIIS (nmo>=10 only), see
+!  subroutine init_jacobi_diis
 subroutine boys(natom, nbf, nmo, bfirst, dis, mo, ao_dip, dis_tol, conv_tol, &
-                new_mo)
- use lo_info, only: dis_thres, conv_thres, npair, ijmap
+                lo_diis, new_mo)
+ use lo_info, only: dis_thres, conv_thres, npair, ijmap, diis, para_nmo
+ use lo_info, only: loc_niter, loc_tot_change, loc_verbose
  implicit none
  integer, intent(in) :: natom, nbf, nmo
 !f2py intent(in) :: natom, nbf, nmo
@@ -826,9 +990,13 @@ subroutine boys(natom, nbf, nmo, bfirst, dis, mo, ao_dip, dis_tol, conv_tol, &
 !f2py intent(out) :: new_mo
 !f2py depend(nbf,nmo) :: new_mo
  real(kind=8), allocatable :: mo_dip(:,:,:) !, u(:,:), save_mo(:,:)
+ logical, intent(in) :: lo_diis
+!f2py logical, intent(in), optional :: lo_diis = 0
 
- write(6,'(/,A)') 'Boys orbital localization begins:'
+ if(loc_verbose > 0) write(6,'(/,A)') 'Boys orbital localization begins:'
+ loc_niter = 0; loc_tot_change = 0d0
  new_mo = mo; dis_thres = dis_tol; conv_thres = conv_tol
+ diis = (lo_diis .and. nmo>9)
 
  if(nmo == 1) then
   write(6,'(A)') 'Warning from subroutine boys: only 1 orbital. No rotation.'
@@ -839,18 +1007,22 @@ subroutine boys(natom, nbf, nmo, bfirst, dis, mo, ao_dip, dis_tol, conv_tol, &
  allocate(ijmap(2,npair))
  call get_triu_idx1(nmo, ijmap)
 
- write(6,'(/,A)') 'Transform AO dipole integrals to MO ones...'
+ if(loc_verbose > 0) then
+  write(6,'(/,A)') 'Transform AO dipole integrals to MO ones...'
+ end if
  allocate(mo_dip(3,nmo,nmo))
  call ao2mo_dip(nbf, nmo, new_mo, ao_dip, mo_dip)
- write(6,'(A)') 'Done update.'
+ if(loc_verbose > 0) write(6,'(A)') 'Done update.'
 
+ if(diis) call init_jacobi_diis('boys', nmo)
  if(nmo < 10) then
   call serial2by2(nbf, nmo, 3, new_mo, mo_dip)
- else if(nmo < 500) then
+ else if(nmo < para_nmo) then
   call serial22boys(natom, nbf, nmo, bfirst, dis, new_mo, mo_dip)
  else
   call para22boys(natom, nbf, nmo, bfirst, dis, new_mo, mo_dip)
  end if
+ if(diis) call free_jacobi_diis()
 
  !call ao2mo_dip(nbf, nmo, new_mo, ao_dip, mo_dip)
  !allocate(u(nmo,nmo))
@@ -865,15 +1037,23 @@ subroutine boys(natom, nbf, nmo, bfirst, dis, mo, ao_dip, dis_tol, conv_tol, &
 end subroutine boys
 
 ! perform Pipek-Mezey orbital localization (Jacobian 2*2 rotations) on a set of MOs
+! max_memory (MB) is the memory budget of the gross population tensor. If the
+! dense gross(natom,nmo,nmo) is larger than max_memory, the sparse algorithm
+! (see subroutine pm_sparse) is used, which stores no gross(:,:,:).
+! DIIS is not used, since each extrapolation would re-calculate the whole gross
+! matrix.
 subroutine pm(natom, nbf, nmo, bfirst, dis, mo, ao_ovlp, popm, dis_tol, &
-              conv_tol, new_mo)
- use lo_info, only: dis_thres, conv_thres, npair, ijmap
+              conv_tol, max_memory, new_mo)
+ use lo_info, only: dis_thres, conv_thres, npair, ijmap, diis, para_nmo
+ use lo_info, only: loc_niter, loc_tot_change, loc_verbose
  implicit none
- integer, intent(in) :: natom, nbf, nmo
+ integer, intent(in) :: natom, nbf, nmo, max_memory
 !f2py intent(in) :: natom, nbf, nmo
+!f2py integer, intent(in), optional :: max_memory = 4000
  integer, intent(in) :: bfirst(natom+1)
 !f2py intent(in) :: bfirst
 !f2py depend(natom) :: bfirst
+ real(kind=8) :: dense_mem
  real(kind=8), intent(in) :: dis(natom,natom), mo(nbf,nmo), ao_ovlp(nbf,nbf),&
                              dis_tol, conv_tol
 !f2py intent(in) :: dis, mo, ao_ovlp, dis_tol, conv_tol
@@ -887,9 +1067,13 @@ subroutine pm(natom, nbf, nmo, bfirst, dis, mo, ao_ovlp, popm, dis_tol, &
  character(len=8), intent(in) :: popm ! 'mulliken'/'lowdin'
 !f2py intent(in) :: popm
 
- write(6,'(/,A)') 'PM orbital localization begins: using '//TRIM(popm)//&
-                  ' population'
+ if(loc_verbose > 0) then
+  write(6,'(/,A)') 'PM orbital localization begins: using '//TRIM(popm)//&
+                   ' population'
+ end if
+ loc_niter = 0; loc_tot_change = 0d0
  new_mo = mo; dis_thres = dis_tol; conv_thres = conv_tol
+ diis = .false.
 
  if(nmo == 1) then
   write(6,'(A)') 'Warning from subroutine pm: only 1 orbital. No rotation.'
@@ -900,14 +1084,27 @@ subroutine pm(natom, nbf, nmo, bfirst, dis, mo, ao_ovlp, popm, dis_tol, &
  allocate(ijmap(2,npair))
  call get_triu_idx1(nmo, ijmap)
 
- write(6,'(/,A)') 'Construct gross matrix...'
+ ! in MB, use real(kind=8) to avoid integer overflow
+ dense_mem = 8d0*DBLE(natom)*DBLE(nmo)*DBLE(nmo)/1048576d0
+ if(dense_mem > DBLE(max_memory)) then
+  if(loc_verbose > 0) then
+   write(6,'(A,F12.1,A,I0,A)') 'Dense gross matrix requires', dense_mem, &
+                    ' MB > max_memory=', max_memory, ' MB. Use sparse PM.'
+  end if
+  call pm_sparse(natom, nbf, nmo, bfirst, dis, ao_ovlp, popm, max_memory, &
+                 new_mo)
+  deallocate(ijmap)
+  return
+ end if
+
+ if(loc_verbose > 0) write(6,'(/,A)') 'Construct gross matrix...'
  allocate(gross(natom,nmo,nmo))
  call calc_gross_pop(natom, nbf, nmo, bfirst, ao_ovlp, new_mo, popm, gross)
- write(6,'(A)') 'Done construction.'
+ if(loc_verbose > 0) write(6,'(A)') 'Done construction.'
 
  if(nmo < 10) then
   call serial2by2(nbf, nmo, natom, new_mo, gross)
- else if(nmo < 500) then
+ else if(nmo < para_nmo) then
   call serial22pm(natom, nbf, nmo, dis, new_mo, gross)
  else
   call para22pm(natom, nbf, nmo, dis, new_mo, gross)
@@ -917,9 +1114,506 @@ subroutine pm(natom, nbf, nmo, bfirst, dis, mo, ao_ovlp, popm, dis_tol, &
  deallocate(gross, ijmap)
 end subroutine pm
 
+! Sparse Pipek-Mezey orbital localization. The gross population tensor is not
+! stored. Instead, the MO coefficients C and SC (Mulliken) or (S^1/2)C (Lowdin)
+! are kept, and for each MO pair (i,j) only gross(A,i,i), gross(A,i,j) and
+! gross(A,j,j) on atoms A with non-negligible population of MO i or j (i.e. the
+! union of mo_atm(i) and mo_atm(j)) are evaluated. Both SC and mo_atm are updated
+! in place during 2*2 rotations. The memory cost is about 8*(nbf+natom)*nmo bytes.
+subroutine pm_sparse(natom, nbf, nmo, bfirst, dis, ao_ovlp, popm, max_memory, &
+                     coeff)
+ use lo_info, only: mo_atm, para_nmo
+ implicit none
+ integer, intent(in) :: natom, nbf, nmo, max_memory
+ integer, intent(in) :: bfirst(natom+1)
+ real(kind=8) :: sparse_mem
+ real(kind=8), intent(in) :: dis(natom,natom), ao_ovlp(nbf,nbf)
+ real(kind=8), intent(inout) :: coeff(nbf,nmo)
+ real(kind=8), allocatable :: sc(:,:), rootS(:,:), n_rootS(:,:)
+ character(len=8), intent(in) :: popm
+ logical :: lowdin
+
+ sparse_mem = 8d0*DBLE(nbf+natom)*DBLE(nmo)/1048576d0
+ if(sparse_mem > DBLE(max_memory)) then
+  write(6,'(A,F12.1,A)') 'Warning from subroutine pm_sparse: sparse PM require&
+                         &s about', sparse_mem, ' MB,'
+  write(6,'(A,I0,A)') 'which is still larger than max_memory=', max_memory, &
+                      ' MB. Continue anyway.'
+ end if
+
+ allocate(sc(nbf,nmo), source=0d0)
+ select case(TRIM(popm))
+ case('mulliken')
+  lowdin = .false.
+  call dsymm('L', 'L', nbf, nmo, 1d0, ao_ovlp, nbf, coeff, nbf, 0d0, sc, nbf)
+ case('lowdin')
+  lowdin = .true.
+  allocate(rootS(nbf,nbf), n_rootS(nbf,nbf))
+  call mat_dsqrt(nbf, ao_ovlp, .false., rootS, n_rootS)
+  deallocate(n_rootS)
+  call dsymm('L', 'L', nbf, nmo, 1d0, rootS, nbf, coeff, nbf, 0d0, sc, nbf)
+  deallocate(rootS)
+ case default
+  write(6,'(/,A)') 'ERROR in subroutine pm_sparse: wrong population method pro&
+                   &vided.'
+  write(6,'(A)') "Only 'mulliken' or 'lowdin' supported. But input popm="//popm
+  stop
+ end select
+
+ allocate(mo_atm(nmo))
+ if(nmo < para_nmo) then
+  call serial22pm_sparse(natom, nbf, nmo, bfirst, dis, lowdin, coeff, sc)
+ else
+  call para22pm_sparse(natom, nbf, nmo, bfirst, dis, lowdin, coeff, sc)
+ end if
+ deallocate(sc, mo_atm)
+end subroutine pm_sparse
+
+! Calculate the diagonal gross populations pop(A,i)=gross(A,i,i) from MO
+! coefficients and SC (Mulliken) or (S^1/2)C (Lowdin), and find atoms with non-
+! negligible population for each MO, i.e. mo_atm(i).
+subroutine calc_diag_gross_sparse(natom, nbf, nmo, bfirst, lowdin, coeff, sc, &
+                                  pop)
+ use lo_info, only: mo_atm, sparse_pop_thres
+ implicit none
+ integer :: i, k, i1, i2, i3, n
+ integer, intent(in) :: natom, nbf, nmo
+ integer, intent(in) :: bfirst(natom+1)
+ real(kind=8) :: ddot
+ real(kind=8), intent(in) :: coeff(nbf,nmo), sc(nbf,nmo)
+ real(kind=8), intent(out) :: pop(natom,nmo)
+ logical, intent(in) :: lowdin
+
+!$omp parallel do schedule(dynamic) default(private) &
+!$omp shared(natom,nmo,bfirst,lowdin,coeff,sc,pop,mo_atm)
+ do i = 1, nmo, 1
+  do k = 1, natom, 1
+   i1 = bfirst(k); i2 = bfirst(k+1) - 1
+   i3 = i2 - i1 + 1
+   if(lowdin) then
+    pop(k,i) = ddot(i3, sc(i1:i2,i), 1, sc(i1:i2,i), 1)
+   else
+    pop(k,i) = ddot(i3, coeff(i1:i2,i), 1, sc(i1:i2,i), 1)
+   end if
+  end do ! for k
+
+  n = COUNT(ABS(pop(:,i)) > sparse_pop_thres)
+  if(allocated(mo_atm(i)%idx)) deallocate(mo_atm(i)%idx)
+  if(n == 0) then ! keep at least one atom
+   mo_atm(i)%nc = 1
+   allocate(mo_atm(i)%idx(1))
+   mo_atm(i)%idx = MAXLOC(ABS(pop(:,i)))
+  else
+   mo_atm(i)%nc = n
+   allocate(mo_atm(i)%idx(n))
+   mo_atm(i)%idx = PACK([(k,k=1,natom)], ABS(pop(:,i)) > sparse_pop_thres)
+  end if
+ end do ! for i
+!$omp end parallel do
+end subroutine calc_diag_gross_sparse
+
+! Merge two lists of atoms (both in ascending order) into one list, with
+! duplicate atoms removed.
+subroutine merge_atm_list(n1, a1, n2, a2, n, a)
+ implicit none
+ integer :: i, j
+ integer, intent(in) :: n1, n2
+ integer, intent(in) :: a1(n1), a2(n2)
+ integer, intent(out) :: n, a(n1+n2)
+
+ i = 1; j = 1; n = 0
+ do while(i<=n1 .or. j<=n2)
+  n = n + 1
+  if(j > n2) then
+   a(n) = a1(i); i = i + 1
+  else if(i > n1) then
+   a(n) = a2(j); j = j + 1
+  else if(a1(i) < a2(j)) then
+   a(n) = a1(i); i = i + 1
+  else if(a1(i) > a2(j)) then
+   a(n) = a2(j); j = j + 1
+  else
+   a(n) = a1(i); i = i + 1; j = j + 1
+  end if
+ end do
+end subroutine merge_atm_list
+
+! Perform a 2*2 rotation between MOs i and j in the sparse PM localization. The
+! gross populations gross(A,i,i), gross(A,i,j) and gross(A,j,j) are evaluated
+! only on atoms in the union of mo_atm(i) and mo_atm(j), and the atom list of
+! each rotated MO is re-screened over this union, so that lists do not only grow.
+subroutine rotate_pm_pair_sparse(natom, nbf, nmo, bfirst, lowdin, i, j, coeff, &
+                                 sc, change)
+ use lo_info, only: QPI, HPI, upd_thres, mo_atm
+ implicit none
+ integer :: k, m, n, i1, i2, i3
+ integer, intent(in) :: natom, nbf, nmo, i, j
+ integer, intent(in) :: bfirst(natom+1)
+ integer, allocatable :: atm(:)
+ real(kind=8) :: ddot, rtmp, Aij, Bij, alpha, sin_4a, cos_a, sin_a, gii, gjj, &
+  gij
+ real(kind=8), intent(inout) :: coeff(nbf,nmo), sc(nbf,nmo)
+ real(kind=8), intent(out) :: change
+ logical, intent(in) :: lowdin
+
+ change = 0d0
+ allocate(atm(mo_atm(i)%nc + mo_atm(j)%nc))
+ call merge_atm_list(mo_atm(i)%nc, mo_atm(i)%idx, mo_atm(j)%nc, mo_atm(j)%idx,&
+                     n, atm)
+ Aij = 0d0; Bij = 0d0
+
+ do m = 1, n, 1
+  k = atm(m)
+  i1 = bfirst(k); i2 = bfirst(k+1) - 1
+  i3 = i2 - i1 + 1
+  if(lowdin) then
+   gii = ddot(i3, sc(i1:i2,i), 1, sc(i1:i2,i), 1)
+   gjj = ddot(i3, sc(i1:i2,j), 1, sc(i1:i2,j), 1)
+   gij = ddot(i3, sc(i1:i2,i), 1, sc(i1:i2,j), 1)
+  else
+   gii = ddot(i3, coeff(i1:i2,i), 1, sc(i1:i2,i), 1)
+   gjj = ddot(i3, coeff(i1:i2,j), 1, sc(i1:i2,j), 1)
+   gij = 0.5d0*(ddot(i3, coeff(i1:i2,i), 1, sc(i1:i2,j), 1) + &
+                ddot(i3, coeff(i1:i2,j), 1, sc(i1:i2,i), 1))
+  end if
+  Aij = Aij + gij*gij - 0.25d0*(gii-gjj)*(gii-gjj)
+  Bij = Bij + (gii-gjj)*gij
+ end do ! for m
+
+ rtmp = HYPOT(Aij, Bij)
+ sin_4a = Bij/rtmp
+ rtmp = rtmp + Aij
+ if(rtmp < upd_thres) then
+  deallocate(atm)
+  return
+ end if
+
+ change = rtmp
+ alpha = 0.25d0*DASIN(MAX(-1d0, MIN(sin_4a, 1d0)))
+ if(Aij > 0d0) then
+  alpha = QPI - alpha
+ else if(Aij<0d0 .and. Bij<0d0) then
+  alpha = HPI + alpha
+ end if
+ if(alpha > QPI) alpha = alpha - HPI
+ cos_a = DCOS(alpha); sin_a = DSIN(alpha)
+
+ call rotate_mo_ij(cos_a, sin_a, nbf, coeff(:,i), coeff(:,j))
+ call rotate_mo_ij(cos_a, sin_a, nbf, sc(:,i), sc(:,j))
+
+ ! both rotated MOs live on (a subset of) the union of the two atom lists
+ call screen_atm_list(natom, nbf, bfirst, lowdin, coeff(:,i), sc(:,i), n, &
+                      atm(1:n), i)
+ call screen_atm_list(natom, nbf, bfirst, lowdin, coeff(:,j), sc(:,j), n, &
+                      atm(1:n), j)
+ deallocate(atm)
+end subroutine rotate_pm_pair_sparse
+
+! Find atoms (among n atoms in atm) with non-negligible diagonal gross
+! population of MO i, and store them into mo_atm(i). c and s are coefficients
+! and SC (or (S^1/2)C) of MO i.
+subroutine screen_atm_list(natom, nbf, bfirst, lowdin, c, s, n, atm, i)
+ use lo_info, only: mo_atm, sparse_pop_thres
+ implicit none
+ integer :: k, m, i1, i2, i3, nc
+ integer, intent(in) :: natom, nbf, n, i
+ integer, intent(in) :: bfirst(natom+1), atm(n)
+ real(kind=8) :: ddot
+ real(kind=8), intent(in) :: c(nbf), s(nbf)
+ real(kind=8), allocatable :: pop(:)
+ logical, intent(in) :: lowdin
+
+ allocate(pop(n))
+ do m = 1, n, 1
+  k = atm(m)
+  i1 = bfirst(k); i2 = bfirst(k+1) - 1
+  i3 = i2 - i1 + 1
+  if(lowdin) then
+   pop(m) = ddot(i3, s(i1:i2), 1, s(i1:i2), 1)
+  else
+   pop(m) = ddot(i3, c(i1:i2), 1, s(i1:i2), 1)
+  end if
+ end do ! for m
+
+ nc = COUNT(ABS(pop) > sparse_pop_thres)
+ if(allocated(mo_atm(i)%idx)) deallocate(mo_atm(i)%idx)
+ if(nc == 0) then ! keep at least one atom
+  mo_atm(i)%nc = 1
+  allocate(mo_atm(i)%idx(1))
+  mo_atm(i)%idx = atm(MAXLOC(ABS(pop)))
+ else
+  mo_atm(i)%nc = nc
+  allocate(mo_atm(i)%idx(nc))
+  mo_atm(i)%idx = PACK(atm, ABS(pop) > sparse_pop_thres)
+ end if
+ deallocate(pop)
+end subroutine screen_atm_list
+
+! perform serial sparse Pipek-Mezey 2-by-2 Jacobi rotations on given MOs with
+! distance considered
+subroutine serial22pm_sparse(natom, nbf, nmo, bfirst, dis, lowdin, coeff, sc)
+ use lo_info, only: npair, max_niter, dis_thres, conv_thres, mo_cen, &
+  eff_npair, eff_ijmap, find_eff_ijmap
+ use lo_info, only: loc_niter, loc_tot_change, loc_verbose, init_loc_hist, &
+  add_loc_hist
+ implicit none
+ integer :: i, nact, m
+ integer, intent(in) :: natom, nbf, nmo
+ integer, intent(in) :: bfirst(natom+1)
+ real(kind=8) :: change, sum_change, tot_change
+ real(kind=8), intent(in) :: dis(natom,natom)
+ real(kind=8), intent(inout) :: coeff(nbf,nmo), sc(nbf,nmo)
+ real(kind=8), allocatable :: mo_dis(:), pop(:,:)
+ logical, intent(in) :: lowdin
+
+ if(loc_verbose > 0) then
+  write(6,'(/,A)') 'Perform serial sparse PM 2*2 rotation...'
+  write(6,'(A,F8.2,A,ES9.2,A,I0)') 'dis_thres=', dis_thres, ', conv_thres=', &
+                                    conv_thres, ', nmo=', nmo
+ end if
+ allocate(mo_cen(nmo), mo_dis(npair), pop(natom,nmo))
+ tot_change = 0d0
+ call init_loc_hist(.false.)
+
+ do i = 1, max_niter, 1
+  call calc_diag_gross_sparse(natom, nbf, nmo, bfirst, lowdin, coeff, sc, pop)
+  call get_mo_center_from_diag_gross(natom, nmo, pop, mo_cen)
+  call atm_dis2mo_dis(natom, nmo, npair, dis, mo_cen, mo_dis)
+  call find_eff_ijmap(nmo, mo_dis)
+  nact = eff_npair
+  sum_change = 0d0
+  do m = 1, eff_npair, 1
+   call rotate_pm_pair_sparse(natom, nbf, nmo, bfirst, lowdin, eff_ijmap(1,m),&
+                              eff_ijmap(2,m), coeff, sc, change)
+   sum_change = sum_change + change
+  end do ! for m
+  deallocate(eff_ijmap)
+  tot_change = tot_change + sum_change
+  call add_loc_hist(i, sum_change, nact)
+  if(sum_change < conv_thres) exit
+ end do ! for i
+
+ deallocate(mo_cen, mo_dis, pop)
+ if(loc_verbose > 0) write(6,'(A,F20.8)') 'tot_change=', tot_change
+ loc_niter = i; loc_tot_change = tot_change
+ if(loc_verbose>0 .or. i>max_niter) then
+  call prt_loc_conv_remark(i, max_niter, 'serial22pm_sparse')
+ end if
+end subroutine serial22pm_sparse
+
+! perform parallel sparse Pipek-Mezey 2-by-2 Jacobi rotations on given MOs.
+! MO pairs in each sweep of the ring ordering share no MO, so they are rotated
+! in parallel.
+subroutine para22pm_sparse(natom, nbf, nmo, bfirst, dis, lowdin, coeff, sc)
+ use lo_info, only: np, npair, nsweep, max_niter, dis_thres, conv_thres, &
+  mo_cen, rrmap, rot_idx, screen_jacobi_idx_by_dis
+ use lo_info, only: loc_niter, loc_tot_change, loc_verbose, init_loc_hist, &
+  add_loc_hist
+ implicit none
+ integer :: i, nact, m, n, npair0
+ integer, intent(in) :: natom, nbf, nmo
+ integer, intent(in) :: bfirst(natom+1)
+ real(kind=8) :: change, sum_change, tot_change
+ real(kind=8), intent(in) :: dis(natom,natom)
+ real(kind=8), intent(inout) :: coeff(nbf,nmo), sc(nbf,nmo)
+ real(kind=8), allocatable :: mo_dis(:), pop(:,:)
+ logical, intent(in) :: lowdin
+
+ if(loc_verbose > 0) then
+  write(6,'(/,A)') 'Perform parallel sparse PM 2*2 rotation...'
+  write(6,'(A,F8.2,A,ES9.2,A,I0)') 'dis_thres=', dis_thres, ', conv_thres=', &
+                                    conv_thres, ', nmo=', nmo
+ end if
+ np = (nmo+1)/2
+ nsweep = 4*np - 2
+ allocate(rrmap(2,np,nsweep))
+ call init_ring_jacobi_idx(nmo, np, rrmap)
+
+ allocate(mo_cen(nmo), mo_dis(npair), pop(natom,nmo))
+ tot_change = 0d0
+ call init_loc_hist(.true.)
+
+ do i = 1, max_niter, 1
+  call calc_diag_gross_sparse(natom, nbf, nmo, bfirst, lowdin, coeff, sc, pop)
+  call get_mo_center_from_diag_gross(natom, nmo, pop, mo_cen)
+  call atm_dis2mo_dis(natom, nmo, npair, dis, mo_cen, mo_dis)
+  call screen_jacobi_idx_by_dis(nmo, mo_dis)
+  nact = SUM(rot_idx(:)%npair)
+  sum_change = 0d0
+
+  do m = 1, nsweep, 1
+   npair0 = rot_idx(m)%npair
+   if(npair0 == 0) cycle
+   !$omp parallel do schedule(dynamic) default(private) &
+   !$omp reduction(+:sum_change) &
+   !$omp shared(natom,nbf,nmo,bfirst,lowdin,m,npair0,rot_idx,coeff,sc)
+   do n = 1, npair0, 1
+    call rotate_pm_pair_sparse(natom, nbf, nmo, bfirst, lowdin, &
+     rot_idx(m)%pair_idx(1,n), rot_idx(m)%pair_idx(2,n), coeff, sc, change)
+    sum_change = sum_change + change
+   end do ! for n
+   !$omp end parallel do
+  end do ! for m
+
+  tot_change = tot_change + sum_change
+  call add_loc_hist(i, sum_change, nact)
+  if(sum_change < conv_thres) exit
+ end do ! for i
+
+ deallocate(mo_cen, mo_dis, pop, rrmap, rot_idx)
+ if(loc_verbose > 0) write(6,'(A,F20.8)') 'tot_change=', tot_change
+ loc_niter = i; loc_tot_change = tot_change
+ if(loc_verbose>0 .or. i>max_niter) then
+  call prt_loc_conv_remark(i, max_niter, 'para22pm_sparse')
+ end if
+end subroutine para22pm_sparse
+
+! Return the convergence information of the last orbital localization performed
+! by subroutine berry/boys/pm. converged=.False. if max_niter is exceeded.
+subroutine get_loc_conv_info(niter, tot_change, converged)
+ use lo_info, only: max_niter, loc_niter, loc_tot_change
+ implicit none
+ integer, intent(out) :: niter
+!f2py intent(out) :: niter
+ real(kind=8), intent(out) :: tot_change
+!f2py intent(out) :: tot_change
+ logical, intent(out) :: converged
+!f2py intent(out) :: converged
+
+ niter = MIN(loc_niter, max_niter)
+ tot_change = loc_tot_change
+ converged = (loc_niter <= max_niter)
+end subroutine get_loc_conv_info
+
+! Return per-iteration records (4,n) of the last orbital localization performed
+! by subroutine berry/boys/pm, n is niter from subroutine get_loc_conv_info. Each
+! column: change of the target function, the number of 2*2 rotations tried (MO
+! pairs after distance screening, 0 for a DIIS extrapolation step), wall time (s)
+! and the number of OpenMP threads.
+subroutine get_loc_hist(n, hist)
+ use lo_info, only: loc_hist
+ implicit none
+ integer :: m
+ integer, intent(in) :: n
+!f2py intent(in) :: n
+ real(kind=8), intent(out) :: hist(4,n)
+!f2py intent(out) :: hist
+!f2py depend(n) :: hist
+
+ hist = 0d0
+ if(.not. allocated(loc_hist)) return
+ m = MIN(n, SIZE(loc_hist,2))
+ if(m > 0) hist(:,1:m) = loc_hist(:,1:m)
+end subroutine get_loc_hist
+
+! Turn off (verbose=0) or on (verbose>0) the printing of orbital localization
+! routines, and return the previous setting. Errors and warnings are always
+! printed.
+subroutine set_loc_verbose(verbose, old_verbose)
+ use lo_info, only: loc_verbose
+ implicit none
+ integer, intent(in) :: verbose
+!f2py intent(in) :: verbose
+ integer, intent(out) :: old_verbose
+!f2py intent(out) :: old_verbose
+
+ old_verbose = loc_verbose
+ loc_verbose = verbose
+end subroutine set_loc_verbose
+
+! Set the serial/parallel cutoff of Jacobi 2*2 rotations in Boys/PM localization,
+! i.e. the parallel (ring ordered) rotations are used when nmo>=nmo_para, and
+! set the number of OpenMP threads (unchanged if nthreads<1).
+subroutine set_loc_para(nmo_para, nthreads)
+ use lo_info, only: para_nmo
+!$ use omp_lib, only: omp_set_num_threads
+ implicit none
+ integer, intent(in) :: nmo_para, nthreads
+!f2py intent(in) :: nmo_para, nthreads
+
+ para_nmo = MAX(10, nmo_para)
+!$ if(nthreads > 0) call omp_set_num_threads(nthreads)
+end subroutine set_loc_para
+
+! Return current settings of subroutine set_loc_para
+subroutine get_loc_para(nmo_para, nthreads)
+ use lo_info, only: para_nmo
+!$ use omp_lib, only: omp_get_max_threads
+ implicit none
+ integer, intent(out) :: nmo_para, nthreads
+!f2py intent(out) :: nmo_para, nthreads
+
+ nmo_para = para_nmo
+ nthreads = 1
+!$ nthreads = omp_get_max_threads()
+end subroutine get_loc_para
+
+! Time (in seconds) one sweep of serial (para=.False.) or parallel (para=.True.)
+! Boys Jacobi 2*2 rotations over all pairs of nmo orbitals, using random dipole
+! integrals. This is a micro-benchmark to choose the serial/parallel cutoff, see
+! get_para_nmo() in $MOKIT_ROOT/mokit/lib/gaussian.py
+subroutine time_jacobi_sweep(nmo, para, t)
+ use lo_info, only: np, npair, eff_npair, nsweep, dis_thres, diis, ijmap, &
+  rrmap, rot_idx, find_eff_ijmap, screen_jacobi_idx_by_dis, para22boys_kernel
+ implicit none
+ integer :: np_bak, npair_bak, eff_npair_bak, nsweep_bak
+ integer(kind=8) :: t0, t1, rate
+ integer, intent(in) :: nmo
+!f2py intent(in) :: nmo
+ real(kind=8) :: change, dis_bak
+ real(kind=8), intent(out) :: t
+!f2py intent(out) :: t
+ real(kind=8), allocatable :: coeff(:,:), mo_dip(:,:,:), mo_dis(:)
+ logical, intent(in) :: para
+!f2py intent(in) :: para
+ logical :: diis_bak
+
+ if(nmo < 10) then
+  write(6,'(/,A)') 'ERROR in subroutine time_jacobi_sweep: nmo>=10 is required.'
+  write(6,'(A,I0)') 'nmo=', nmo
+  stop
+ end if
+
+ ! module variables changed here are restored before return, such that a later
+ ! localization is not affected
+ np_bak = np; npair_bak = npair; eff_npair_bak = eff_npair; nsweep_bak = nsweep
+ allocate(coeff(nmo,nmo), mo_dip(3,nmo,nmo))
+ call random_number(coeff)
+ call random_number(mo_dip)
+ call symmetrize_mo_dip(nmo, mo_dip)
+ npair = nmo*(nmo-1)/2
+ allocate(ijmap(2,npair), mo_dis(npair))
+ call get_triu_idx1(nmo, ijmap)
+ mo_dis = 0d0
+ dis_bak = dis_thres; dis_thres = 1d0
+ diis_bak = diis; diis = .false.
+
+ call system_clock(t0, rate)
+ if(para) then
+  np = (nmo+1)/2
+  nsweep = 4*np - 2
+  allocate(rrmap(2,np,nsweep))
+  call init_ring_jacobi_idx(nmo, np, rrmap)
+  call screen_jacobi_idx_by_dis(nmo, mo_dis)
+  call para22boys_kernel(nmo, nmo, coeff, mo_dip, change)
+  deallocate(rrmap, rot_idx)
+ else
+  call find_eff_ijmap(nmo, mo_dis)
+  call serial22boys_kernel(nmo, nmo, coeff, mo_dip, change)
+ end if
+ call system_clock(t1)
+ t = DBLE(t1-t0)/DBLE(rate)
+
+ dis_thres = dis_bak; diis = diis_bak
+ np = np_bak; npair = npair_bak; eff_npair = eff_npair_bak; nsweep = nsweep_bak
+ deallocate(coeff, mo_dip, mo_dis, ijmap)
+end subroutine time_jacobi_sweep
+
 ! perform serial 2-by-2 rotation on given MOs
 subroutine serial2by2_cmplx(nbf, nmo, coeff, mo_dipole)
  use lo_info, only: npair, ijmap, max_niter, QPI, HPI, upd_thres, conv_thres
+ use lo_info, only: loc_niter, loc_tot_change, loc_verbose, init_loc_hist, &
+  add_loc_hist
  implicit none
  integer :: i, j, k, m, niter
  integer, intent(in) :: nbf, nmo
@@ -931,9 +1625,10 @@ subroutine serial2by2_cmplx(nbf, nmo, coeff, mo_dipole)
  complex(kind=8), allocatable :: dipole(:,:,:)
  complex(kind=8), intent(inout) :: mo_dipole(3,nmo,nmo)
 
- write(6,'(/,A)') 'Perform serial 2*2 rotation...'
+ if(loc_verbose > 0) write(6,'(/,A)') 'Perform serial 2*2 rotation...'
  allocate(dipole(3,nmo,2))
  tot_change = 0d0; niter = 0
+ call init_loc_hist(.false.)
 
  do while(niter <= max_niter)
   sum_change = 0d0
@@ -990,18 +1685,23 @@ subroutine serial2by2_cmplx(nbf, nmo, coeff, mo_dipole)
 
   tot_change = tot_change + sum_change
   niter = niter + 1
-  write(6,'(A,I4,A,F16.8)') 'niter=', niter, ', sum_change=', sum_change
+  call add_loc_hist(niter, sum_change, npair)
   if(sum_change < conv_thres) exit
  end do ! for while
 
  deallocate(dipole)
- write(6,'(A,F20.8)') 'tot_change=', tot_change
- call prt_loc_conv_remark(niter, max_niter, 'serial2by2_cmplx')
+ if(loc_verbose > 0) write(6,'(A,F20.8)') 'tot_change=', tot_change
+ loc_niter = niter; loc_tot_change = tot_change
+ if(loc_verbose>0 .or. niter>max_niter) then
+  call prt_loc_conv_remark(niter, max_niter, 'serial2by2_cmplx')
+ end if
 end subroutine serial2by2_cmplx
 
 ! perform serial 2-by-2 rotation on given MOs
 subroutine serial2by2(nbf, nmo, ncomp, coeff, mo_dipole)
  use lo_info, only: npair, ijmap, max_niter, QPI, HPI, upd_thres, conv_thres
+ use lo_info, only: loc_niter, loc_tot_change, loc_verbose, init_loc_hist, &
+  add_loc_hist
  implicit none
  integer :: i, j, k, m, niter
  integer, intent(in) :: nbf, nmo, ncomp
@@ -1014,9 +1714,10 @@ subroutine serial2by2(nbf, nmo, ncomp, coeff, mo_dipole)
  ! dipole: for Boys, store updated dipole integrals matrix
  !         for PM,   store updated population matrix
 
- write(6,'(/,A)') 'Perform serial 2*2 rotation...'
+ if(loc_verbose > 0) write(6,'(/,A)') 'Perform serial 2*2 rotation...'
  allocate(dipole(ncomp,nmo,2), vtmp(ncomp,4), vdiff(ncomp))
  tot_change = 0d0; niter = 0
+ call init_loc_hist(.false.)
 
  do while(niter <= max_niter)
   sum_change = 0d0
@@ -1073,13 +1774,16 @@ subroutine serial2by2(nbf, nmo, ncomp, coeff, mo_dipole)
 
   tot_change = tot_change + sum_change
   niter = niter + 1
-  write(6,'(A,I4,A,F16.8)') 'niter=', niter, ', sum_change=', sum_change
+  call add_loc_hist(niter, sum_change, npair)
   if(sum_change < conv_thres) exit
  end do ! for while
 
  deallocate(vdiff, vtmp, dipole)
- write(6,'(A,F20.8)') 'tot_change=', tot_change
- call prt_loc_conv_remark(niter, max_niter, 'serial2by2')
+ if(loc_verbose > 0) write(6,'(A,F20.8)') 'tot_change=', tot_change
+ loc_niter = niter; loc_tot_change = tot_change
+ if(loc_verbose>0 .or. niter>max_niter) then
+  call prt_loc_conv_remark(niter, max_niter, 'serial2by2')
+ end if
 end subroutine serial2by2
 
 subroutine serial22berry_kernel(nbf, nmo, mo, mo_zdip, change)
@@ -1140,9 +1844,12 @@ end subroutine serial22berry_kernel
 ! perform serial Berry 2-by-2 Jacobi rotations on given MOs with distance considered
 subroutine serial22berry(natom, nbf, nmo, bfirst, dis, mo, mo_zdip)
  use lo_info, only: npair, max_niter, dis_thres, conv_thres, diis, ndiis, &
-  ijmap, u, k_old, cayley_k, k_diis, binfile, mo_cen, find_eff_ijmap
+  ijmap, u, k_old, cayley_k, k_diis, binfile, mo_cen, find_eff_ijmap, &
+  eff_npair
+ use lo_info, only: loc_niter, loc_tot_change, loc_verbose, init_loc_hist, &
+  add_loc_hist
  implicit none
- integer :: i
+ integer :: i, nact
  integer, intent(in) :: natom, nbf, nmo
  integer, intent(in) :: bfirst(natom+1)
  real(kind=8) :: fberry0, fberry, sum_change, tot_change
@@ -1152,14 +1859,17 @@ subroutine serial22berry(natom, nbf, nmo, bfirst, dis, mo, mo_zdip)
  complex(kind=8), intent(inout) :: mo_zdip(3,nmo,nmo)
  logical :: solve_new_mo
 
- write(6,'(/,A)') 'Perform serial Berry 2*2 rotation...'
- write(6,'(A,L1,A,F7.2,A,ES9.2,A,I0)') 'DIIS=',diis,', dis_thres=',dis_thres, &
-  ', conv_thres=', conv_thres, ', nmo=', nmo
+ if(loc_verbose > 0) then
+  write(6,'(/,A)') 'Perform serial Berry 2*2 rotation...'
+  write(6,'(A,L1,A,F7.2,A,ES9.2,A,I0)') 'DIIS=',diis,', dis_thres=',dis_thres, &
+   ', conv_thres=', conv_thres, ', nmo=', nmo
+ end if
  allocate(mo_cen(nmo), mo_dis(npair))
  tot_change = 0d0
+ call init_loc_hist(.false.)
 
  do i = 1, max_niter, 1
-  solve_new_mo = .true.
+  solve_new_mo = .true.; nact = 0
 
   if(diis) then
    if((i>1 .and. i<ndiis+3) .or. (i>ndiis+2 .and. MOD(i,2)==1)) then
@@ -1184,6 +1894,7 @@ subroutine serial22berry(natom, nbf, nmo, bfirst, dis, mo, mo_zdip)
    call get_mo_center_by_scpa(natom, nbf, nmo, bfirst, mo, mo_cen)
    call atm_dis2mo_dis(natom, nmo, npair, dis, mo_cen, mo_dis)
    call find_eff_ijmap(nmo, mo_dis)
+   nact = eff_npair
    call serial22berry_kernel(nbf, nmo, mo, mo_zdip, sum_change)
    if(diis) then
     call cayley_trans(nmo, u, cayley_k)
@@ -1191,7 +1902,7 @@ subroutine serial22berry(natom, nbf, nmo, bfirst, dis, mo, mo_zdip)
    end if
   end if
 
-  write(6,'(A,I4,A,F16.8)') 'niter=', i, ', sum_change=', sum_change
+  call add_loc_hist(i, sum_change, nact)
   tot_change = tot_change + sum_change
   if( (diis.and.solve_new_mo) .or. (.not.diis) ) then
    if(sum_change < conv_thres) exit
@@ -1199,16 +1910,21 @@ subroutine serial22berry(natom, nbf, nmo, bfirst, dis, mo, mo_zdip)
  end do ! for i
 
  deallocate(mo_cen, mo_dis)
- write(6,'(A,F20.8)') 'tot_change=', tot_change
- call prt_loc_conv_remark(i, max_niter, 'serial22berry')
+ if(loc_verbose > 0) write(6,'(A,F20.8)') 'tot_change=', tot_change
+ loc_niter = i; loc_tot_change = tot_change
+ if(loc_verbose>0 .or. i>max_niter) then
+  call prt_loc_conv_remark(i, max_niter, 'serial22berry')
+ end if
 end subroutine serial22berry
 
 subroutine para22berry(natom, nbf, nmo, bfirst, dis, mo, mo_zdip)
  use lo_info, only: np, npair, nsweep, max_niter, dis_thres, conv_thres, diis, &
   ndiis, u, k_old, cayley_k, k_diis, binfile, ijmap, rrmap, mo_cen, rot_idx, &
   screen_jacobi_idx_by_dis, para22berry_kernel
+ use lo_info, only: loc_niter, loc_tot_change, loc_verbose, init_loc_hist, &
+  add_loc_hist
  implicit none
- integer :: i
+ integer :: i, nact
  integer, intent(in) :: natom, nbf, nmo
  integer, intent(in) :: bfirst(natom+1)
  real(kind=8) :: fberry0, fberry, sum_change, tot_change
@@ -1226,9 +1942,11 @@ subroutine para22berry(natom, nbf, nmo, bfirst, dis, mo, mo_zdip)
   stop
  end if
 
- write(6,'(/,A)') 'Perform parallel Berry 2*2 rotation...'
- write(6,'(A,L1,A,F7.2,A,ES9.2,A,I0)') 'DIIS=',diis,', dis_thres=',dis_thres, &
-  ', conv_thres=', conv_thres, ', nmo=', nmo
+ if(loc_verbose > 0) then
+  write(6,'(/,A)') 'Perform parallel Berry 2*2 rotation...'
+  write(6,'(A,L1,A,F7.2,A,ES9.2,A,I0)') 'DIIS=',diis,', dis_thres=',dis_thres, &
+   ', conv_thres=', conv_thres, ', nmo=', nmo
+ end if
  np = (nmo+1)/2
  nsweep = 4*np - 2
  allocate(rrmap(2,np,nsweep))
@@ -1236,9 +1954,10 @@ subroutine para22berry(natom, nbf, nmo, bfirst, dis, mo, mo_zdip)
 
  allocate(mo_cen(nmo), mo_dis(npair))
  tot_change = 0d0
+ call init_loc_hist(.true.)
 
  do i = 1, max_niter, 1
-  solve_new_mo = .true.
+  solve_new_mo = .true.; nact = 0
 
   if(diis) then
    if((i>1 .and. i<ndiis+3) .or. (i>ndiis+2 .and. MOD(i,2)==1)) then
@@ -1263,6 +1982,7 @@ subroutine para22berry(natom, nbf, nmo, bfirst, dis, mo, mo_zdip)
    call get_mo_center_by_scpa(natom, nbf, nmo, bfirst, mo, mo_cen)
    call atm_dis2mo_dis(natom, nmo, npair, dis, mo_cen, mo_dis)
    call screen_jacobi_idx_by_dis(nmo, mo_dis)
+   nact = SUM(rot_idx(:)%npair)
    call para22berry_kernel(nbf, nmo, mo, mo_zdip, sum_change)
    if(diis) then
     call cayley_trans(nmo, u, cayley_k)
@@ -1270,7 +1990,7 @@ subroutine para22berry(natom, nbf, nmo, bfirst, dis, mo, mo_zdip)
    end if
   end if
 
-  write(6,'(A,I4,A,F16.8)') 'niter=', i, ', sum_change=', sum_change
+  call add_loc_hist(i, sum_change, nact)
   tot_change = tot_change + sum_change
   if( (diis.and.solve_new_mo) .or. (.not.diis) ) then
    if(sum_change < conv_thres) exit
@@ -1278,12 +1998,15 @@ subroutine para22berry(natom, nbf, nmo, bfirst, dis, mo, mo_zdip)
  end do ! for i
 
  deallocate(mo_cen, mo_dis, rrmap, rot_idx)
- write(6,'(A,F20.8)') 'tot_change=', tot_change
- call prt_loc_conv_remark(i, max_niter, 'para22berry')
+ if(loc_verbose > 0) write(6,'(A,F20.8)') 'tot_change=', tot_change
+ loc_niter = i; loc_tot_change = tot_change
+ if(loc_verbose>0 .or. i>max_niter) then
+  call prt_loc_conv_remark(i, max_niter, 'para22berry')
+ end if
 end subroutine para22berry
 
 subroutine serial22boys_kernel(nbf, nmo, coeff, mo_dip, change)
- use lo_info, only: QPI, HPI, upd_thres, eff_npair, eff_ijmap
+ use lo_info, only: QPI, HPI, upd_thres, diis, eff_npair, eff_ijmap, u
  implicit none
  integer :: i, j, m
  integer, intent(in) :: nbf, nmo
@@ -1318,6 +2041,7 @@ subroutine serial22boys_kernel(nbf, nmo, coeff, mo_dip, change)
   cos_a = DCOS(alpha); sin_a = DSIN(alpha)
 
   ! update two orbitals
+  if(diis) call rotate_mo_ij(cos_a, sin_a, nmo, u(:,i), u(:,j))
   call rotate_mo_ij(cos_a, sin_a, nbf, coeff(:,i), coeff(:,j))
 
   ! update corresponding dipole integrals
@@ -1335,50 +2059,77 @@ end subroutine serial22boys_kernel
 
 ! perform serial Boys 2-by-2 Jacobi rotations on given MOs with distance considered
 subroutine serial22boys(natom, nbf, nmo, bfirst, dis, mo, mo_dip)
- use lo_info, only: npair, max_niter, dis_thres, conv_thres, mo_cen, &
-  find_eff_ijmap
+ use lo_info, only: npair, max_niter, dis_thres, conv_thres, diis, ndiis, &
+  ijmap, u, k_old, cayley_k, k_diis, binfile, mo_cen, find_eff_ijmap, &
+  eff_npair
+ use lo_info, only: loc_niter, loc_tot_change, loc_verbose, init_loc_hist, &
+  add_loc_hist
  implicit none
- integer :: i
+ integer :: i, nact
  integer, intent(in) :: natom, nbf, nmo
  integer, intent(in) :: bfirst(natom+1)
  real(kind=8) :: sum_change, tot_change
  real(kind=8), intent(in) :: dis(natom,natom)
  real(kind=8), intent(inout) :: mo(nbf,nmo), mo_dip(3,nmo,nmo)
  real(kind=8), allocatable :: mo_dis(:)
+ logical :: solve_new_mo
 
- write(6,'(/,A)') 'Perform serial Boys 2*2 rotation...'
- write(6,'(A,F8.2,A,ES9.2,A,I0)') 'dis_thres=', dis_thres, ', conv_thres=', &
-                                   conv_thres, ', nmo=', nmo
+ if(loc_verbose > 0) then
+  write(6,'(/,A)') 'Perform serial Boys 2*2 rotation...'
+  write(6,'(A,L1,A,F7.2,A,ES9.2,A,I0)') 'DIIS=',diis,', dis_thres=',dis_thres, &
+   ', conv_thres=', conv_thres, ', nmo=', nmo
+ end if
  allocate(mo_cen(nmo), mo_dis(npair))
  tot_change = 0d0
+ call init_loc_hist(.false.)
 
  do i = 1, max_niter, 1
-  call get_mo_center_by_scpa(natom, nbf, nmo, bfirst, mo, mo_cen)
-  call atm_dis2mo_dis(natom, nmo, npair, dis, mo_cen, mo_dis)
-  call find_eff_ijmap(nmo, mo_dis)
-  call serial22boys_kernel(nbf, nmo, mo, mo_dip, sum_change)
+  solve_new_mo = .true.; nact = 0
+  if(diis) call boys_diis_step(i, nbf, nmo, mo, mo_dip, sum_change, &
+                               solve_new_mo)
+
+  if(solve_new_mo) then
+   if(diis) k_old = cayley_k
+   call get_mo_center_by_scpa(natom, nbf, nmo, bfirst, mo, mo_cen)
+   call atm_dis2mo_dis(natom, nmo, npair, dis, mo_cen, mo_dis)
+   call find_eff_ijmap(nmo, mo_dis)
+   nact = eff_npair
+   call serial22boys_kernel(nbf, nmo, mo, mo_dip, sum_change)
+   if(diis) then
+    call cayley_trans(nmo, u, cayley_k)
+    call save_cayley_k_diff(nmo, ndiis, ijmap, binfile, k_old, cayley_k, k_diis)
+   end if
+  end if
+
   tot_change = tot_change + sum_change
-  write(6,'(A,I4,A,F16.8)') 'niter=', i, ', sum_change=', sum_change
-  if(sum_change < conv_thres) exit
+  call add_loc_hist(i, sum_change, nact)
+  if(solve_new_mo .and. sum_change<conv_thres) exit
  end do ! for i
 
  deallocate(mo_cen, mo_dis)
- write(6,'(A,F20.8)') 'tot_change=', tot_change
- call prt_loc_conv_remark(i, max_niter, 'serial22boys')
+ if(loc_verbose > 0) write(6,'(A,F20.8)') 'tot_change=', tot_change
+ loc_niter = i; loc_tot_change = tot_change
+ if(loc_verbose>0 .or. i>max_niter) then
+  call prt_loc_conv_remark(i, max_niter, 'serial22boys')
+ end if
 end subroutine serial22boys
 
 ! perform parallel Foster-Boys 2-by-2 Jacobi rotation on given MOs
 subroutine para22boys(natom, nbf, nmo, bfirst, dis, coeff, mo_dip)
- use lo_info, only: np, npair, nsweep, max_niter, dis_thres, conv_thres, &
-  mo_cen, rrmap, rot_idx, screen_jacobi_idx_by_dis, para22boys_kernel
+ use lo_info, only: np, npair, nsweep, max_niter, dis_thres, conv_thres, diis, &
+  ndiis, u, k_old, cayley_k, k_diis, binfile, ijmap, mo_cen, rrmap, rot_idx, &
+  screen_jacobi_idx_by_dis, para22boys_kernel
+ use lo_info, only: loc_niter, loc_tot_change, loc_verbose, init_loc_hist, &
+  add_loc_hist
  implicit none
- integer :: i
+ integer :: i, nact
  integer, intent(in) :: natom, nbf, nmo
  integer, intent(in) :: bfirst(natom+1)
  real(kind=8) :: sum_change, tot_change
  real(kind=8), intent(in) :: dis(natom,natom)
  real(kind=8), intent(inout) :: coeff(nbf,nmo), mo_dip(3,nmo,nmo)
  real(kind=8), allocatable :: mo_dis(:)
+ logical :: solve_new_mo
 
  if(nmo < 4) then
   write(6,'(/,A)') 'ERROR in subroutine para22boys: nmo<4. Too few orbitals. Th&
@@ -1388,9 +2139,11 @@ subroutine para22boys(natom, nbf, nmo, bfirst, dis, coeff, mo_dip)
   stop
  end if
 
- write(6,'(/,A)') 'Perform parallel Boys 2*2 rotation...'
- write(6,'(A,F8.2,A,ES9.2,A,I0)') 'dis_thres=', dis_thres, ', conv_thres=', &
-                                   conv_thres, ', nmo=', nmo
+ if(loc_verbose > 0) then
+  write(6,'(/,A)') 'Perform parallel Boys 2*2 rotation...'
+  write(6,'(A,L1,A,F7.2,A,ES9.2,A,I0)') 'DIIS=',diis,', dis_thres=',dis_thres, &
+   ', conv_thres=', conv_thres, ', nmo=', nmo
+ end if
  np = (nmo+1)/2
  nsweep = 4*np - 2
  allocate(rrmap(2,np,nsweep))
@@ -1398,20 +2151,37 @@ subroutine para22boys(natom, nbf, nmo, bfirst, dis, coeff, mo_dip)
 
  allocate(mo_cen(nmo), mo_dis(npair))
  tot_change = 0d0
+ call init_loc_hist(.true.)
 
  do i = 1, max_niter, 1
-  call get_mo_center_by_scpa(natom, nbf, nmo, bfirst, coeff, mo_cen)
-  call atm_dis2mo_dis(natom, nmo, npair, dis, mo_cen, mo_dis)
-  call screen_jacobi_idx_by_dis(nmo, mo_dis)
-  call para22boys_kernel(nbf, nmo, coeff, mo_dip, sum_change)
+  solve_new_mo = .true.; nact = 0
+  if(diis) call boys_diis_step(i, nbf, nmo, coeff, mo_dip, sum_change, &
+                               solve_new_mo)
+
+  if(solve_new_mo) then
+   if(diis) k_old = cayley_k
+   call get_mo_center_by_scpa(natom, nbf, nmo, bfirst, coeff, mo_cen)
+   call atm_dis2mo_dis(natom, nmo, npair, dis, mo_cen, mo_dis)
+   call screen_jacobi_idx_by_dis(nmo, mo_dis)
+   nact = SUM(rot_idx(:)%npair)
+   call para22boys_kernel(nbf, nmo, coeff, mo_dip, sum_change)
+   if(diis) then
+    call cayley_trans(nmo, u, cayley_k)
+    call save_cayley_k_diff(nmo, ndiis, ijmap, binfile, k_old, cayley_k, k_diis)
+   end if
+  end if
+
   tot_change = tot_change + sum_change
-  write(6,'(A,I4,A,F16.8)') 'niter=', i, ', sum_change=', sum_change
-  if(sum_change < conv_thres) exit
+  call add_loc_hist(i, sum_change, nact)
+  if(solve_new_mo .and. sum_change<conv_thres) exit
  end do ! for i
 
  deallocate(mo_cen, mo_dis, rrmap, rot_idx)
- write(6,'(A,F20.8)') 'tot_change=', tot_change
- call prt_loc_conv_remark(i, max_niter, 'para22boys')
+ if(loc_verbose > 0) write(6,'(A,F20.8)') 'tot_change=', tot_change
+ loc_niter = i; loc_tot_change = tot_change
+ if(loc_verbose>0 .or. i>max_niter) then
+  call prt_loc_conv_remark(i, max_niter, 'para22boys')
+ end if
 end subroutine para22boys
 
 subroutine serial22pm_kernel(nbf, nmo, natom, coeff, gross, change)
@@ -1462,7 +2232,9 @@ end subroutine serial22pm_kernel
 ! perform serial Pipek-Mezey 2-by-2 Jacobi rotation on given MOs with distance considered
 subroutine serial22pm(natom, nbf, nmo, dis, coeff, gross)
  use lo_info, only: npair, max_niter, dis_thres, conv_thres, mo_cen, &
-  find_eff_ijmap
+  find_eff_ijmap, eff_npair
+ use lo_info, only: loc_niter, loc_tot_change, loc_verbose, init_loc_hist, &
+  add_loc_hist
  implicit none
  integer :: i
  integer, intent(in) :: natom, nbf, nmo
@@ -1471,11 +2243,14 @@ subroutine serial22pm(natom, nbf, nmo, dis, coeff, gross)
  real(kind=8), intent(inout) :: coeff(nbf,nmo), gross(natom,nmo,nmo)
  real(kind=8), allocatable :: mo_dis(:)
 
- write(6,'(/,A)') 'Perform serial PM 2*2 rotation...'
- write(6,'(A,F8.2,A,ES9.2,A,I0)') 'dis_thres=', dis_thres, ', conv_thres=', &
-                                   conv_thres, ', nmo=', nmo
+ if(loc_verbose > 0) then
+  write(6,'(/,A)') 'Perform serial PM 2*2 rotation...'
+  write(6,'(A,F8.2,A,ES9.2,A,I0)') 'dis_thres=', dis_thres, ', conv_thres=', &
+                                    conv_thres, ', nmo=', nmo
+ end if
  allocate(mo_cen(nmo), mo_dis(npair))
  tot_change = 0d0
+ call init_loc_hist(.false.)
 
  do i = 1, max_niter, 1
   call get_mo_center_from_gross(natom, nmo, gross, mo_cen)
@@ -1483,19 +2258,24 @@ subroutine serial22pm(natom, nbf, nmo, dis, coeff, gross)
   call find_eff_ijmap(nmo, mo_dis)
   call serial22pm_kernel(nbf, nmo, natom, coeff, gross, sum_change)
   tot_change = tot_change + sum_change
-  write(6,'(A,I4,A,F16.8)') 'niter=', i, ', sum_change=', sum_change
+  call add_loc_hist(i, sum_change, eff_npair)
   if(sum_change < conv_thres) exit
  end do ! for i
 
  deallocate(mo_cen, mo_dis)
- write(6,'(A,F20.8)') 'tot_change=', tot_change
- call prt_loc_conv_remark(i, max_niter, 'serial22pm')
+ if(loc_verbose > 0) write(6,'(A,F20.8)') 'tot_change=', tot_change
+ loc_niter = i; loc_tot_change = tot_change
+ if(loc_verbose>0 .or. i>max_niter) then
+  call prt_loc_conv_remark(i, max_niter, 'serial22pm')
+ end if
 end subroutine serial22pm
 
 ! perform parallel Pipek-Mezey 2-by-2 Jacobi rotation on given MOs
 subroutine para22pm(natom, nbf, nmo, dis, coeff, gross)
  use lo_info, only: np, npair, nsweep, max_niter, dis_thres, conv_thres, &
   mo_cen, rrmap, rot_idx, screen_jacobi_idx_by_dis, para22pm_kernel
+ use lo_info, only: loc_niter, loc_tot_change, loc_verbose, init_loc_hist, &
+  add_loc_hist
  implicit none
  integer :: i
  integer, intent(in) :: natom, nbf, nmo
@@ -1512,9 +2292,11 @@ subroutine para22pm(natom, nbf, nmo, dis, coeff, gross)
   stop
  end if
 
- write(6,'(/,A)') 'Perform parallel PM 2*2 rotation...'
- write(6,'(A,F8.2,A,ES9.2,A,I0)') 'dis_thres=', dis_thres, ', conv_thres=', &
-                                   conv_thres, ', nmo=', nmo
+ if(loc_verbose > 0) then
+  write(6,'(/,A)') 'Perform parallel PM 2*2 rotation...'
+  write(6,'(A,F8.2,A,ES9.2,A,I0)') 'dis_thres=', dis_thres, ', conv_thres=', &
+                                    conv_thres, ', nmo=', nmo
+ end if
  np = (nmo+1)/2
  nsweep = 4*np - 2
  allocate(rrmap(2,np,nsweep))
@@ -1522,6 +2304,7 @@ subroutine para22pm(natom, nbf, nmo, dis, coeff, gross)
 
  allocate(mo_cen(nmo), mo_dis(npair))
  tot_change = 0d0
+ call init_loc_hist(.true.)
 
  do i = 1, max_niter, 1
   call get_mo_center_from_gross(natom, nmo, gross, mo_cen)
@@ -1529,13 +2312,16 @@ subroutine para22pm(natom, nbf, nmo, dis, coeff, gross)
   call screen_jacobi_idx_by_dis(nmo, mo_dis)
   call para22pm_kernel(nbf, nmo, natom, coeff, gross, sum_change)
   tot_change = tot_change + sum_change
-  write(6,'(A,I4,A,F16.8)') 'niter=', i, ', sum_change=', sum_change
+  call add_loc_hist(i, sum_change, SUM(rot_idx(:)%npair))
   if(sum_change < conv_thres) exit
  end do ! for i
 
  deallocate(mo_cen, mo_dis, rrmap, rot_idx)
- write(6,'(A,F20.8)') 'tot_change=', tot_change
- call prt_loc_conv_remark(i, max_niter, 'para22pm')
+ if(loc_verbose > 0) write(6,'(A,F20.8)') 'tot_change=', tot_change
+ loc_niter = i; loc_tot_change = tot_change
+ if(loc_verbose>0 .or. i>max_niter) then
+  call prt_loc_conv_remark(i, max_niter, 'para22pm')
+ end if
 end subroutine para22pm
 
 !subroutine boys_polar(nmo, mo_dip, u)
@@ -1194,6 +1194,20 @@ subroutine symmetrize_mo_zdip(nmo, mo_zdip)
  call symmetrize_zmat(nmo, mo_zdip(3,:,:))
 end subroutine symmetrize_mo_zdip
 
+! symmetrize the double precision matrices mo_dip(i,:,:)
+subroutine symmetrize_mo_dip(nmo, mo_dip)
+ implicit none
+ integer, intent(in) :: nmo
+!f2py intent(in) :: nmo
+ real(kind=8), intent(inout) :: mo_dip(3,nmo,nmo)
+!f2py intent(in,out) :: mo_dip
+!f2py depend(nmo) :: mo_dip
+
+ call symmetrize_dmat(nmo, mo_dip(1,:,:))
+ call symmetrize_dmat(nmo, mo_dip(2,:,:))
+ call symmetrize_dmat(nmo, mo_dip(3,:,:))
+end subroutine symmetrize_mo_dip
+
 ! calculate C(C^T)
 subroutine calc_cct(nbf, nif, occ_mo, cct)
  implicit none
@@ -1578,6 +1592,29 @@ subroutine update_mo_zdip_by_u(nmo, u, mo_zdip)
  deallocate(r)
 end subroutine update_mo_zdip_by_u
 
+! Note: mo_dip(i,:,:) must be symmetric
+subroutine update_mo_dip_by_u(nmo, u, mo_dip)
+ implicit none
+ integer, intent(in) :: nmo
+!f2py intent(in) :: nmo
+ real(kind=8), intent(in) :: u(nmo,nmo)
+!f2py intent(in) :: u
+!f2py depend(nmo) :: u
+ real(kind=8), intent(inout) :: mo_dip(3,nmo,nmo)
+!f2py intent(in,out) :: mo_dip
+!f2py depend(nmo) :: mo_dip
+ real(kind=8), allocatable :: r(:,:)
+
+ allocate(r(nmo,nmo))
+ call calc_CTSC(nmo, nmo, u, mo_dip(1,:,:), r)
+ mo_dip(1,:,:) = r
+ call calc_CTSC(nmo, nmo, u, mo_dip(2,:,:), r)
+ mo_dip(2,:,:) = r
+ call calc_CTSC(nmo, nmo, u, mo_dip(3,:,:), r)
+ mo_dip(3,:,:) = r
+ deallocate(r)
+end subroutine update_mo_dip_by_u
+
 ! get the value of the Boys function sum_i <phi_i|r|phi_i>^2
 subroutine get_fboys(nmo, mo_dip, fboys)
  implicit none
@@ -1,5 +1,7 @@
 ! written by jxzou at 20230516: generate the wave function of the mirror of a
 ! molecule
+! updated at 20261017: split Grassmann interpolation into log-map/exp-map steps,
+!  such that log-maps of known geometries can be reused for many new geometries
 
 module bas_rot
  implicit none
@@ -1569,9 +1571,11 @@ end subroutine calc_1d_lagrange_w
 !    S(:,:,nfile) is the overlap matrix of the the new geometry
 ! mo: occupied MOs of each known geometry
 ! new_mo: occupied MOs of the new geometry
+! For many new geometries, call grassmann_ref_mo and grassmann_log_map once for
+!  known geometries, and then grassmann_exp_map for each new geometry.
 subroutine mo_grassmann_intrplt(nbf, nmo, nfile, x, S, mo, new_mo)
  implicit none
- integer :: i, k, itmp(1)
+ integer :: i, k
  integer, intent(in) :: nbf, nmo, nfile
 !f2py intent(in) :: nbf, nmo, nfile
  real(kind=8), intent(in) :: x(nfile), S(nbf,nbf,nfile), mo(nbf,nmo,nfile-1)
@@ -1583,9 +1587,7 @@ subroutine mo_grassmann_intrplt(nbf, nmo, nfile, x, S, mo, new_mo)
 !f2py intent(out) :: new_mo
 !f2py depend(nbf,nmo) :: new_mo
  real(kind=8), parameter :: diff = 1d-7
- real(kind=8), allocatable :: sqrt_S(:,:), n_sqrt_S(:,:), mo_ref(:,:), mo_k(:,:),&
-  u(:,:), vt(:,:), sv(:), sin_s(:,:), cos_s(:,:), u_sin_s(:,:), mo_ref_v(:,:), &
-  weight(:)
+ real(kind=8), allocatable :: mo_ref(:,:), mo_k(:,:), gamma(:,:), weight(:)
 
 ! allocate(weight(nfile-1))
 ! call calc_1d_lagrange_w(nfile, x, weight)
@@ -1607,33 +1609,96 @@ subroutine mo_grassmann_intrplt(nbf, nmo, nfile, x, S, mo, new_mo)
  ! even if the maximum weight is 1.0 and other weights are 0, the following step
  ! is needed
 
- ! Calculate S^1/2, S^(-1/2) of the 1st geometry
- allocate(sqrt_S(nbf,nbf), n_sqrt_S(nbf,nbf))
- call mat_dsqrt(nbf, S(:,:,k), .false., sqrt_S, n_sqrt_S)
-
  ! C_ref' = (S^1/2)C_ref. MOs at orthogonal basis of the reference geometry
  allocate(mo_ref(nbf,nmo))
- call dsymm('L', 'L', nbf, nmo, 1d0, sqrt_S,nbf, mo(:,:,k),nbf, 0d0, mo_ref,nbf)
- allocate(mo_k(nbf,nmo), source=mo_ref)
- call grassmann_C2GAMMA(nbf, nmo, mo_ref, mo_k) ! GAMMA_1 stored in mo_k
- !new_mo = weight(k)*mo_k
- new_mo = 0d0
+ call grassmann_ref_mo(nbf, nmo, S(:,:,k), mo(:,:,k), mo_ref)
 
- ! GAMMA matrix of the new geometry would be stored in the array mo_k temporarily
+ ! GAMMA matrix of each geometry would be stored in the array mo_k temporarily,
+ ! and the interpolated GAMMA matrix of the new geometry in gamma
+ allocate(mo_k(nbf,nmo))
+ allocate(gamma(nbf,nmo), source=0d0)
  do i = 2, nfile-1, 1
   !if(i == k) cycle
   if(DABS(weight(i)) < diff) cycle
-
-  call mat_dsqrt(nbf, S(:,:,i), .false., sqrt_S, n_sqrt_S)
-  call dsymm('L', 'L', nbf, nmo, 1d0, sqrt_S, nbf, mo(:,:,i),nbf, 0d0, mo_k,nbf)
-  call grassmann_C2GAMMA(nbf, nmo, mo_ref, mo_k) ! GAMMA_i stored in mo_k
-  new_mo = new_mo + weight(i)*mo_k               ! linear combination of GAMMA_i
+  call grassmann_log_map(nbf, nmo, mo_ref, S(:,:,i), mo(:,:,i), mo_k)
+  gamma = gamma + weight(i)*mo_k                 ! linear combination of GAMMA_i
  end do ! for i
- deallocate(sqrt_S, n_sqrt_S, mo_k, weight)
+ deallocate(mo_k, weight)
+
+ ! gamma and new_mo must not be the same array, since intent(in) and
+ ! intent(out) arguments cannot be aliased
+ call grassmann_exp_map(nbf, nmo, mo_ref, gamma, S(:,:,nfile), new_mo)
+ deallocate(mo_ref, gamma)
+end subroutine mo_grassmann_intrplt
+
+! Calculate occupied MOs of the reference geometry at the orthogonal basis, i.e.
+!  C_ref' = (S^1/2)C_ref, which is the base point of Grassmann interpolation
+subroutine grassmann_ref_mo(nbf, nmo, S, mo, mo_ref)
+ implicit none
+ integer, intent(in) :: nbf, nmo
+!f2py intent(in) :: nbf, nmo
+ real(kind=8), intent(in) :: S(nbf,nbf), mo(nbf,nmo)
+!f2py intent(in) :: S, mo
+!f2py depend(nbf) :: S
+!f2py depend(nbf,nmo) :: mo
+ real(kind=8), intent(out) :: mo_ref(nbf,nmo)
+!f2py intent(out) :: mo_ref
+!f2py depend(nbf,nmo) :: mo_ref
+ real(kind=8), allocatable :: sqrt_S(:,:), n_sqrt_S(:,:)
+
+ allocate(sqrt_S(nbf,nbf), n_sqrt_S(nbf,nbf))
+ call mat_dsqrt(nbf, S, .false., sqrt_S, n_sqrt_S)
+ deallocate(n_sqrt_S)
+ call dsymm('L', 'L', nbf, nmo, 1d0, sqrt_S, nbf, mo, nbf, 0d0, mo_ref, nbf)
+ deallocate(sqrt_S)
+end subroutine grassmann_ref_mo
+
+! Calculate the GAMMA matrix (log-map of occupied MOs onto the tangent space at
+!  mo_ref) of a known geometry. S and mo are the AO overlap and occupied MOs of
+!  this geometry, and mo_ref is obtained from subroutine grassmann_ref_mo.
+subroutine grassmann_log_map(nbf, nmo, mo_ref, S, mo, gamma)
+ implicit none
+ integer, intent(in) :: nbf, nmo
+!f2py intent(in) :: nbf, nmo
+ real(kind=8), intent(in) :: mo_ref(nbf,nmo), S(nbf,nbf), mo(nbf,nmo)
+!f2py intent(in) :: mo_ref, S, mo
+!f2py depend(nbf,nmo) :: mo_ref, mo
+!f2py depend(nbf) :: S
+ real(kind=8), intent(out) :: gamma(nbf,nmo)
+!f2py intent(out) :: gamma
+!f2py depend(nbf,nmo) :: gamma
+ real(kind=8), allocatable :: sqrt_S(:,:), n_sqrt_S(:,:)
+
+ allocate(sqrt_S(nbf,nbf), n_sqrt_S(nbf,nbf))
+ call mat_dsqrt(nbf, S, .false., sqrt_S, n_sqrt_S)
+ deallocate(n_sqrt_S)
+ call dsymm('L', 'L', nbf, nmo, 1d0, sqrt_S, nbf, mo, nbf, 0d0, gamma, nbf)
+ deallocate(sqrt_S)
+ call grassmann_C2GAMMA(nbf, nmo, mo_ref, gamma) ! GAMMA stored in gamma
+end subroutine grassmann_log_map
+
+! Generate occupied MOs of a new geometry from the interpolated GAMMA matrix
+!  (exp-map), i.e. sum_i w_i*GAMMA_i. S is the AO overlap of the new geometry.
+subroutine grassmann_exp_map(nbf, nmo, mo_ref, gamma, S, new_mo)
+ implicit none
+ integer :: i
+ integer, intent(in) :: nbf, nmo
+!f2py intent(in) :: nbf, nmo
+ real(kind=8), intent(in) :: mo_ref(nbf,nmo), gamma(nbf,nmo), S(nbf,nbf)
+!f2py intent(in) :: mo_ref, gamma, S
+!f2py depend(nbf,nmo) :: mo_ref, gamma
+!f2py depend(nbf) :: S
+ real(kind=8), intent(out) :: new_mo(nbf,nmo)
+!f2py intent(out) :: new_mo
+!f2py depend(nbf,nmo) :: new_mo
+ real(kind=8), allocatable :: sqrt_S(:,:), n_sqrt_S(:,:), u(:,:), vt(:,:), &
+  sv(:), sin_s(:,:), cos_s(:,:), u_sin_s(:,:), mo_ref_v(:,:), g(:,:)
 
  ! GAMMA = U(SIGMA)V^T
  allocate(u(nbf,nbf), vt(nmo,nmo), sv(nbf))
- call do_svd(nbf, nmo, new_mo, u, vt, sv)
+ allocate(g(nbf,nmo), source=gamma)
+ call do_svd(nbf, nmo, g, u, vt, sv)
+ deallocate(g)
 
  ! U*sin(SIGMA)
  allocate(sin_s(nbf,nmo), source=0d0)
@@ -1645,30 +1710,25 @@ subroutine mo_grassmann_intrplt(nbf, nmo, nfile, x, S, mo, new_mo)
  ! (C_ref')V
  allocate(mo_ref_v(nbf,nmo))
  call dgemm('N', 'T', nbf, nmo, nmo, 1d0, mo_ref,nbf, vt,nmo, 0d0,mo_ref_v,nbf)
- deallocate(mo_ref)
 
  ! (C_ref')V*cos(SIGMA) + U*sin(SIGMA)
  allocate(cos_s(nmo,nmo), source=0d0)
  forall(i = 1:nmo) cos_s(i,i) = DCOS(sv(i))
  deallocate(sv)
  call dgemm('N','N', nbf,nmo,nmo, 1d0,mo_ref_v,nbf, cos_s,nmo, 1d0,u_sin_s,nbf)
- deallocate(mo_ref_v, cos_s)
+ deallocate(cos_s)
 
  ! C_unk' = ((C_ref')V*cos(SIGMA) + U*sin(SIGMA))(V^T), unk: unknown
- call dgemm('N','N', nbf,nmo,nmo, 1d0, u_sin_s, nbf, vt, nmo, 0d0, new_mo, nbf)
+ call dgemm('N','N', nbf,nmo,nmo, 1d0, u_sin_s, nbf, vt, nmo, 0d0, mo_ref_v,nbf)
  deallocate(u_sin_s, vt)
 
  ! C_unk = (S^(-1/2))(C_unk')
  allocate(sqrt_S(nbf,nbf), n_sqrt_S(nbf,nbf))
- call mat_dsqrt(nbf, S(:,:,nfile), .true., sqrt_S, n_sqrt_S)
+ call mat_dsqrt(nbf, S, .true., sqrt_S, n_sqrt_S)
  deallocate(sqrt_S)
- allocate(mo_ref(nbf,nmo))
- call dsymm('L', 'L', nbf, nmo, 1d0,n_sqrt_S,nbf, new_mo, nbf, 0d0, mo_ref,nbf)
- deallocate(n_sqrt_S)
-
- new_mo = mo_ref
- deallocate(mo_ref)
-end subroutine mo_grassmann_intrplt
+ call dsymm('L', 'L', nbf, nmo, 1d0,n_sqrt_S,nbf, mo_ref_v, nbf, 0d0, new_mo,nbf)
+ deallocate(n_sqrt_S, mo_ref_v)
+end subroutine grassmann_exp_map
 
 ! generate geometries using linear interpolation of Cartesian coordinates
 ! fname1: .gjf file which includes the initial geometry
@@ -14,6 +14,9 @@
 ! updated by jxzou at 20210601: add subroutine get_permute_idx_from_shell
 ! updated by wsr   at 20220726: add subroutines molinfo2fch and molecp2fch
 ! updated by jxzou at 20220815: support PySCF->Gaussian complex GHF
+! updated at 20261016: overwrite MOs/energies in place when section sizes are
+!  unchanged
+! updated at 20261017: invalidate the binary companion (.fch.bin/meta.json)
 
 subroutine molecp2fch(fchname, uhf, nbf_in, nif_in, na_in, nb_in, ncontr_in, &
  nprim_in, charge_in, mult_in, natom_in, LenNCZ_in, ielem_in, ghost, &
@@ -90,6 +93,7 @@ subroutine molecp2fch(fchname, uhf, nbf_in, nif_in, na_in, nb_in, ncontr_in, &
   deallocate(KFirst, KLast, Lmax, LPSkip, NLP, RNFroz, CLP, ZLP)
   if(allocated(CLP2)) deallocate(CLP2)
  end if
+ call free_mo_in_fch_content()
 end subroutine molecp2fch
 
 subroutine molinfo2fch(fchname, uhf, irel_in, nbf_in, nif_in, na_in, nb_in, &
@@ -146,8 +150,82 @@ subroutine molinfo2fch(fchname, uhf, irel_in, nbf_in, nif_in, na_in, nb_in, &
  call write_fch(fchname)
  deallocate(iatom_type, shell_type, prim_per_shell, shell2atom_map, coor, &
             prim_exp, contr_coeff)
+ call free_mo_in_fch_content()
 end subroutine molinfo2fch
 
+! Store MOs and orbital energies (or occupation numbers) into the module
+!  fch_content, so that they are written by the next call of molinfo2fch or
+!  molecp2fch, along with the basis set data, in one sequential write. The MOs
+!  must be already in Gaussian basis function order.
+subroutine set_mo_into_fch_content(ab, nbf, nif, coeff, ev)
+ use fch_content, only: eigen_e_a, eigen_e_b, alpha_coeff, beta_coeff
+ implicit none
+ integer, intent(in) :: nbf, nif
+!f2py intent(in) :: nbf, nif
+ real(kind=8), intent(in) :: coeff(nbf,nif), ev(nif)
+!f2py depend(nbf,nif) :: coeff
+!f2py depend(nif) :: ev
+ character(len=1), intent(in) :: ab
+!f2py intent(in) :: ab
+
+ select case(ab)
+ case('a')
+  if(allocated(alpha_coeff)) deallocate(alpha_coeff, eigen_e_a)
+  allocate(alpha_coeff(nbf,nif), source=coeff)
+  allocate(eigen_e_a(nif), source=ev)
+ case('b')
+  if(allocated(beta_coeff)) deallocate(beta_coeff, eigen_e_b)
+  allocate(beta_coeff(nbf,nif), source=coeff)
+  allocate(eigen_e_b(nif), source=ev)
+ case default
+  write(6,'(/,A)') 'ERROR in subroutine set_mo_into_fch_content: wrong data typ&
+                   &e of ab!'
+  write(6,'(A)') "This argument can only be 'a'/'b'. But your input is"
+  write(6,*) 'ab=', ab
+  stop
+ end select
+end subroutine set_mo_into_fch_content
+
+! Store the Total (itype=1) or Spin (itype=2) SCF Density into the module
+!  fch_content, see set_mo_into_fch_content. The density matrix must be already
+!  in Gaussian basis function order.
+subroutine set_dm_into_fch_content(itype, nbf, dm)
+ use fch_content, only: tot_dm, spin_dm
+ implicit none
+ integer, intent(in) :: itype, nbf
+!f2py intent(in) :: itype, nbf
+ real(kind=8), intent(in) :: dm(nbf,nbf)
+!f2py depend(nbf) :: dm
+
+ select case(itype)
+ case(1)
+  if(allocated(tot_dm)) deallocate(tot_dm)
+  allocate(tot_dm(nbf,nbf), source=dm)
+ case(2)
+  if(allocated(spin_dm)) deallocate(spin_dm)
+  allocate(spin_dm(nbf,nbf), source=dm)
+ case default
+  write(6,'(/,A,I0)') 'ERROR in subroutine set_dm_into_fch_content: invalid ity&
+                      &pe=', itype
+  write(6,'(A)') 'Allowed values are 1/2 for Total/Spin SCF Density.'
+  stop
+ end select
+end subroutine set_dm_into_fch_content
+
+! deallocate arrays stored by set_mo_into_fch_content/set_dm_into_fch_content
+subroutine free_mo_in_fch_content()
+ use fch_content, only: eigen_e_a, eigen_e_b, alpha_coeff, beta_coeff, tot_dm,&
+  spin_dm
+ implicit none
+
+ if(allocated(alpha_coeff)) deallocate(alpha_coeff)
+ if(allocated(beta_coeff)) deallocate(beta_coeff)
+ if(allocated(eigen_e_a)) deallocate(eigen_e_a)
+ if(allocated(eigen_e_b)) deallocate(eigen_e_b)
+ if(allocated(tot_dm)) deallocate(tot_dm)
+ if(allocated(spin_dm)) deallocate(spin_dm)
+end subroutine free_mo_in_fch_content
+
 subroutine rest2fch(fchname_c, fchname_len, nbf, nif, coeff2, ab, ev, natorb, gen_density)
 ! use, intrinsic :: iso_c_binding
  implicit none
@@ -244,6 +322,30 @@ subroutine py2fch(fchname, nbf, nif, coeff, ab, ev, natorb, gen_density)
  allocate(idx(nbf), norm(nbf))
  call get_permute_idx_from_fch(fchname, nbf, idx, norm)
 
+ allocate(new_coeff(nbf,nif))
+!$omp parallel do schedule(dynamic) default(shared) private(i,j)
+ do i = 1, nif, 1
+  do j = 1, nbf, 1
+   new_coeff(j,i) = coeff(idx(j),i)*norm(j)
+  end do ! for j
+ end do ! for i
+!$omp end parallel do
+ !forall(i=1:nbf, j=1:nif) coeff3(i,j) = den(idx(i),j)*norm(i)
+ deallocate(norm, idx)
+
+ ! The binary companion (if any, see mokit/lib/fchfile.py) is out of date once
+ ! the .fch file is modified
+ call delete_file(TRIM(fchname)//'.bin/meta.json')
+
+ ! If the sizes of all sections to be updated are unchanged, overwrite them in
+ ! place. Otherwise copy the whole file below.
+ call py2fch_inplace(fchname, nbf, nif, new_coeff, ab, ev, natorb, gen_density,&
+                     alive)
+ if(alive) then
+  deallocate(new_coeff)
+  return
+ end if
+
  ! write the MOs into the .fchk file
  open(newunit=fid,file=TRIM(fchname),status='old',position='rewind')
  open(newunit=fid1,file=TRIM(fchname1),status='replace')
@@ -301,17 +403,6 @@ subroutine py2fch(fchname, nbf, nif, coeff, ab, ev, natorb, gen_density)
   stop
  end if
 
- allocate(new_coeff(nbf,nif))
-!$omp parallel do schedule(dynamic) default(shared) private(i,j)
- do i = 1, nif, 1
-  do j = 1, nbf, 1
-   new_coeff(j,i) = coeff(idx(j),i)*norm(j)
-  end do ! for j
- end do ! for i
-!$omp end parallel do
- !forall(i=1:nbf, j=1:nif) coeff3(i,j) = den(idx(i),j)*norm(i)
-
- deallocate(norm, idx)
  ! use the array `norm` to store reshaped MO coefficients temporarily
  allocate(norm(ncoeff), source=RESHAPE(new_coeff,(/ncoeff/)))
  write(fid1,'(5(1X,ES15.8))') norm
@@ -352,20 +443,8 @@ subroutine py2fch(fchname, nbf, nif, coeff, ab, ev, natorb, gen_density)
   end if
 
   ! use the array `norm` to store occupation numbers temporarily
-  if(natorb) then ! some kind of natural orbitals
-   allocate(norm(nif), source=ev)
-  else            ! not natural orbitals
-   allocate(norm(nif), source=0d0)
-   norm(1:nb) = 2d0
-   if(na > nb) norm(nb+1:na) = 1d0
-   write(6,'(A)') REPEAT('-',79)
-   write(6,'(A)') 'Remark from subroutine py2fch: natorb=.False. and gen_densit&
-                  &y=.True. found. The'
-   write(6,'(A)') 'Total SCF Density will be calculated based on the occupation&
-                  & numbers according'
-   write(6,'(A)') 'to the aufbau principle.'
-   write(6,'(A)') REPEAT('-',79)
-  end if
+  allocate(norm(nif))
+  call gen_occ_for_py2fch(nif, ev, na, nb, natorb, norm)
 
   ! There is no need to initialize den currently, since each element of den will
   ! be assigned a value in subroutine calc_dm_using_mo_and_on().
@@ -396,6 +475,152 @@ subroutine py2fch(fchname, nbf, nif, coeff, ab, ev, natorb, gen_density)
  i = RENAME(TRIM(fchname1),TRIM(fchname))
 end subroutine py2fch
 
+! generate occupation numbers used to calculate the Total SCF Density in py2fch
+subroutine gen_occ_for_py2fch(nif, ev, na, nb, natorb, occ)
+ implicit none
+ integer, intent(in) :: nif, na, nb
+ real(kind=8), intent(in) :: ev(nif)
+ real(kind=8), intent(out) :: occ(nif)
+ logical, intent(in) :: natorb
+
+ if(natorb) then ! some kind of natural orbitals
+  occ = ev
+ else            ! not natural orbitals
+  occ = 0d0
+  occ(1:nb) = 2d0
+  if(na > nb) occ(nb+1:na) = 1d0
+  write(6,'(A)') REPEAT('-',79)
+  write(6,'(A)') 'Remark from subroutine py2fch: natorb=.False. and gen_density&
+                 &=.True. found. The'
+  write(6,'(A)') 'Total SCF Density will be calculated based on the occupation &
+                 &numbers according'
+  write(6,'(A)') 'to the aufbau principle.'
+  write(6,'(A)') REPEAT('-',79)
+ end if
+end subroutine gen_occ_for_py2fch
+
+! Overwrite the Alpha/Beta Orbital Energies, Alpha/Beta MO coefficients (and
+!  Total SCF Density if gen_density=.True.) sections of a .fch(k) file in place,
+!  i.e. without copying the whole file. This is possible only when each section
+!  has the same size (in bytes) as before, which is true when nbf and nif are
+!  unchanged and the file is written in the standard (5(1X,ES15.8)) format.
+! If any section is missing or its size differs, nothing is written and
+!  done=.False. is returned.
+! coeff are MOs in Gaussian basis function order.
+subroutine py2fch_inplace(fchname, nbf, nif, coeff, ab, ev, natorb, gen_density,&
+                          done)
+ implicit none
+ integer :: i, j, k, m, n(3), na, nb, fid
+ integer, intent(in) :: nbf, nif
+ integer(kind=8) :: p, pos(2,3), nchar(3)
+ real(kind=8), intent(in) :: coeff(nbf,nif), ev(nif)
+ real(kind=8), allocatable :: occ(:), dm(:,:), dm1(:)
+ character(len=1), intent(in) :: ab
+ character(len=8) :: key0, key
+ character(len=240) :: buf
+ character(len=240), intent(in) :: fchname
+ logical, intent(in) :: natorb, gen_density
+ logical, intent(out) :: done
+
+ done = .false.
+ if(ab == 'a') then
+  key0 = 'Alpha Or'; key = 'Alpha MO'
+ else
+  key0 = 'Beta Orb'; key = 'Beta MO '
+ end if
+ na = -1; nb = -1; n = -1; pos = 0_8; m = 0
+
+ ! record the beginning/end positions of 3 sections:
+ ! 1/2/3 for Orbital Energies/MO coefficients/Total SCF Density
+ open(newunit=fid,file=TRIM(fchname),status='old',access='stream',&
+      form='formatted',action='read')
+ do while(.true.)
+  inquire(unit=fid,pos=p)
+  read(fid,'(A)',iostat=i) buf
+  if(i /= 0) exit
+  if(buf(1:1) == ' ') cycle
+  if(m > 0) then ! the end of the last section
+   pos(2,m) = p; m = 0
+  end if
+  if(buf(1:15) == 'Number of alpha') then
+   read(buf(52:),*) na
+  else if(buf(1:15) == 'Number of beta ') then
+   read(buf(52:),*) nb
+  else if(buf(1:8) == key0) then
+   m = 1
+  else if(buf(1:8) == key) then
+   m = 2
+  else if(gen_density .and. buf(1:11)=='Total SCF D') then
+   m = 3
+  end if
+  if(m > 0) then
+   read(buf(50:),*,iostat=i) n(m)
+   if(i /= 0) n(m) = -1
+   inquire(unit=fid,pos=pos(1,m))
+  end if
+ end do ! for while
+ if(m > 0) then ! the last section ends at EOF
+  inquire(unit=fid,pos=pos(2,m))
+ end if
+ close(fid)
+
+ if(na<0 .or. nb<0 .or. n(1)/=nif .or. n(2)/=nbf*nif) return
+ if(gen_density .and. n(3)/=(nbf*(nbf+1))/2) return
+ ! each real number takes 16 bytes, plus one newline character per 5 numbers
+ nchar = 16_8*INT(n,kind=8) + INT((n+4)/5,kind=8)
+ k = 2
+ if(gen_density) k = 3
+ do i = 1, k, 1
+  if(pos(2,i)-pos(1,i) /= nchar(i)) return
+ end do ! for i
+
+ open(newunit=fid,file=TRIM(fchname),status='old',access='stream',&
+      form='unformatted',action='readwrite')
+ call write_real_block_at_pos(fid, pos(1,1), nif, ev)
+ call write_real_block_at_pos(fid, pos(1,2), nbf*nif, coeff)
+
+ if(gen_density) then
+  allocate(occ(nif), dm(nbf,nbf))
+  call gen_occ_for_py2fch(nif, ev, na, nb, natorb, occ)
+  call calc_dm_using_mo_and_on(nbf, nif, coeff, occ, dm)
+  deallocate(occ)
+  allocate(dm1(n(3)))
+  k = 0
+  do i = 1, nbf, 1
+   do j = 1, i, 1
+    k = k + 1
+    dm1(k) = dm(j,i)
+   end do ! for j
+  end do ! for i
+  deallocate(dm)
+  call write_real_block_at_pos(fid, pos(1,3), n(3), dm1)
+  deallocate(dm1)
+ end if
+
+ close(fid)
+ done = .true.
+end subroutine py2fch_inplace
+
+! write n real numbers in the .fch(k) format (5(1X,ES15.8)) into a file
+!  (connected for unformatted stream access), starting from position p
+subroutine write_real_block_at_pos(fid, p, n, a)
+ implicit none
+ integer :: i, j, k
+ integer, intent(in) :: fid, n
+ integer(kind=8), intent(in) :: p
+ real(kind=8), intent(in) :: a(n)
+ character(len=81) :: line
+
+ write(fid,pos=p)
+ do i = 1, n, 5
+  j = MIN(i+4, n)
+  k = 16*(j-i+1)
+  write(line,'(5(1X,ES15.8))') a(i:j)
+  line(k+1:k+1) = ACHAR(10)
+  write(fid) line(1:k+1)
+ end do ! for i
+end subroutine write_real_block_at_pos
+
 ! get permutation index list from a given .fch(k) file
 subroutine get_permute_idx_from_fch(fchname, nbf, idx, norm)
  implicit none
@@ -1049,7 +1274,9 @@ subroutine write_pyscf_dm_into_fch(fchname, itype, nbf, dm, force)
   write(fid1,'(A)') TRIM(buf)
  end do ! for while
 
- if(i /= 0) then
+ ! when force = .True., key0 can be appended at the end of file
+ if(i/=0 .and. force) key1 = ' '
+ if(i/=0 .and. (.not.force)) then
   write(6,'(/,A)') 'ERROR in subroutine write_pyscf_dm_into_fch: all required s&
                    &trings are not found.'
   write(6,'(A)') 'File '//TRIM(fchname)//' may be incomplete.'
@@ -1080,6 +1307,7 @@ subroutine write_pyscf_dm_into_fch(fchname, itype, nbf, dm, force)
   end do ! for i
  end if
 
+ if(key1/=key0 .and. key1/=' ') write(fid1,'(A)') TRIM(buf)
  do while(.true.)
   read(fid,'(A)',iostat=i) buf
   if(i /= 0) exit
@@ -8,6 +8,9 @@
 ! updated by jxzou at 20200426: add NOON output
 ! updated by jxzou at 20210518: add an intent(in) parameter ON_thres
 ! updated by jxzou at 20220711: change ON_thres to uno_thres
+! updated at 20261017: no output file (and no orthonormality check) if outname
+!  is blank, such that UNOs can be generated in memory (see uno_arrays in
+!  gaussian.py)
 
 ! This subroutine is designed to be imported as a module in Python.
 subroutine uno(outname, nbf, nif, na, nb, mo_a, mo_b, ao_ovlp, uno_thres, idx, noon, &
@@ -47,6 +50,8 @@ subroutine uno(outname, nbf, nif, na, nb, mo_a, mo_b, ao_ovlp, uno_thres, idx, n
  real(kind=8), allocatable :: mo_ovlp(:,:), occ_a(:,:), occ_b(:,:), sv_occ0(:),&
   sv_occ(:)
  character(len=*), intent(in) :: outname
+ ! outname: the file to record the orthonormality and indices, skipped if blank
+ logical :: prt
  character(len=63), parameter :: on_warn1 = 'Warning in subroutine uno: uno_th&
                                             &res deviates from ON_criteria.'
  character(len=35), parameter :: on_warn2 = 'You better know what you are doing.'
@@ -59,43 +64,50 @@ subroutine uno(outname, nbf, nif, na, nb, mo_a, mo_b, ao_ovlp, uno_thres, idx, n
   stop
  end if
 
- open(newunit=fid,file=TRIM(outname),status='replace')
- write(fid,'(A4,I5)') 'nbf=', nbf
- write(fid,'(A4,I5)') 'nif=', nif
- write(fid,'(A,F11.7)') 'ON_criteria=', ON_criteria
- write(fid,'(A,F11.7)') 'uno_thres=', uno_thres
+ prt = (LEN_TRIM(outname) > 0)
+ if(prt) then
+  open(newunit=fid,file=TRIM(outname),status='replace')
+  write(fid,'(A4,I5)') 'nbf=', nbf
+  write(fid,'(A4,I5)') 'nif=', nif
+  write(fid,'(A,F11.7)') 'ON_criteria=', ON_criteria
+  write(fid,'(A,F11.7)') 'uno_thres=', uno_thres
+ end if
  if(DABS(uno_thres - ON_criteria) > 1d-5) then
-  write(fid,'(/,A)') on_warn1
-  write(fid,'(A)') on_warn2
+  if(prt) write(fid,'(/,A)') on_warn1
+  if(prt) write(fid,'(A)') on_warn2
   write(6,'(/,A)') on_warn1
   write(6,'(A)') on_warn2
  end if
 
  ! check the orthonormality of initial Alpha and Beta MO, respectively
- allocate(mo_ovlp(nif,nif))
- call calc_CTSC(nbf, nif, mo_a, ao_ovlp, mo_ovlp)
- call check_unity(nif, mo_ovlp, maxv, abs_mean)
- write(fid,'(/,A)') 'The orthonormality of initial Alpha MO:'
- write(fid,'(A,F16.10)') 'maxv=', maxv
- write(fid,'(A,F16.10)') 'abs_mean=', abs_mean
-
- call calc_CTSC(nbf, nif, mo_b, ao_ovlp, mo_ovlp)
- call check_unity(nif, mo_ovlp, maxv, abs_mean)
- deallocate(mo_ovlp)
- write(fid,'(/,A)') 'The orthonormality of initial Beta MO:'
- write(fid,'(A,F16.10)') 'maxv=', maxv
- write(fid,'(A,F16.10)') 'abs_mean=', abs_mean
+ if(prt) then
+  allocate(mo_ovlp(nif,nif))
+  call calc_CTSC(nbf, nif, mo_a, ao_ovlp, mo_ovlp)
+  call check_unity(nif, mo_ovlp, maxv, abs_mean)
+  write(fid,'(/,A)') 'The orthonormality of initial Alpha MO:'
+  write(fid,'(A,F16.10)') 'maxv=', maxv
+  write(fid,'(A,F16.10)') 'abs_mean=', abs_mean
+
+  call calc_CTSC(nbf, nif, mo_b, ao_ovlp, mo_ovlp)
+  call check_unity(nif, mo_ovlp, maxv, abs_mean)
+  deallocate(mo_ovlp)
+  write(fid,'(/,A)') 'The orthonormality of initial Beta MO:'
+  write(fid,'(A,F16.10)') 'maxv=', maxv
+  write(fid,'(A,F16.10)') 'abs_mean=', abs_mean
+ end if
  ! check orthonormality done
 
  uno_coeff = mo_a
  if(nb == 0) then ! no beta electrons, return
   forall(i = 1:nopen) noon(i) = 1d0
   idx = [1, nopen+1, nopen]
-  write(fid,'(/,A6,I5)') 'ndb  =', 0
-  write(fid,'(A6,I5)')   'nact =', na
-  write(fid,'(A6,I5)')   'nact0=', 0
-  write(fid,'(A6,3I5)')  'idx  =', idx
-  close(fid)
+  if(prt) then
+   write(fid,'(/,A6,I5)') 'ndb  =', 0
+   write(fid,'(A6,I5)')   'nact =', na
+   write(fid,'(A6,I5)')   'nact0=', 0
+   write(fid,'(A6,3I5)')  'idx  =', idx
+   close(fid)
+  end if
   return
  end if
 
@@ -121,10 +133,12 @@ subroutine uno(outname, nbf, nif, na, nb, mo_a, mo_b, ao_ovlp, uno_thres, idx, n
  nact0 = nact - nopen
  nocc = na + nact0
  idx = [ndb+1, nocc+1, nopen]
- write(fid,'(/,A6,I5)') 'ndb  =', ndb
- write(fid,'(A6,I5)')   'nact =', nact
- write(fid,'(A6,I5)')   'nact0=', nact0
- write(fid,'(A6,3I5)')  'idx  =', idx
+ if(prt) then
+  write(fid,'(/,A6,I5)') 'ndb  =', ndb
+  write(fid,'(A6,I5)')   'nact =', nact
+  write(fid,'(A6,I5)')   'nact0=', nact0
+  write(fid,'(A6,3I5)')  'idx  =', idx
+ end if
 
  ! generate NOON (Natural Orbital Occupation Number)
  forall(i = 1:na) noon(i) = 1d0 + sv_occ(i)
@@ -155,13 +169,15 @@ subroutine uno(outname, nbf, nif, na, nb, mo_a, mo_b, ao_ovlp, uno_thres, idx, n
  if(nocc < nif) uno_coeff(:,nocc+1:nif) = 0d0
 
  ! check the orthonormality of final Alpha MO
- allocate(mo_ovlp(nocc,nocc))
- call calc_CTSC(nbf, nocc, uno_coeff(:,1:nocc), ao_ovlp, mo_ovlp)
- call check_unity(nocc, mo_ovlp, maxv, abs_mean)
- deallocate(mo_ovlp)
- write(fid,'(/,A)') 'The orthonormality of final Alpha MO:'
- write(fid,'(A,F16.10)') 'maxv=', maxv
- write(fid,'(A,F16.10)') 'abs_mean=', abs_mean
+ if(prt) then
+  allocate(mo_ovlp(nocc,nocc))
+  call calc_CTSC(nbf, nocc, uno_coeff(:,1:nocc), ao_ovlp, mo_ovlp)
+  call check_unity(nocc, mo_ovlp, maxv, abs_mean)
+  deallocate(mo_ovlp)
+  write(fid,'(/,A)') 'The orthonormality of final Alpha MO:'
+  write(fid,'(A,F16.10)') 'maxv=', maxv
+  write(fid,'(A,F16.10)') 'abs_mean=', abs_mean
+ end if
 
  ! now let's update ndb, nact, nact0, idx according to input uno_thres
  if(DABS(uno_thres - ON_criteria) > 1d-5) then
@@ -172,11 +188,13 @@ subroutine uno(outname, nbf, nif, na, nb, mo_a, mo_b, ao_ovlp, uno_thres, idx, n
   idx = [ndb+1, nocc+1, nopen]
  end if
 
- write(fid,'(/,A6,I5)') 'ndb  =', ndb
- write(fid,'(A6,I5)')   'nact =', nact
- write(fid,'(A6,I5)')   'nact0=', nact0
- write(fid,'(A6,3I5)')  'idx  =', idx
- close(fid)
+ if(prt) then
+  write(fid,'(/,A6,I5)') 'ndb  =', ndb
+  write(fid,'(A6,I5)')   'nact =', nact
+  write(fid,'(A6,I5)')   'nact0=', nact0
+  write(fid,'(A6,3I5)')  'idx  =', idx
+  close(fid)
+ end if
  deallocate(sv_occ0)
 end subroutine uno
 
@@ -47,6 +47,9 @@ module lo_info
  implicit none
  integer :: np, npair, eff_npair, nsweep
  integer :: max_niter = 1999
+ integer :: para_nmo = 500
+ ! Boys/PM Jacobi 2*2 rotations are performed in parallel (ring ordering) if
+ ! nmo>=para_nmo, see subroutine set_loc_para in lo.f90
  integer :: ndiis = 7
  ! TODO: invoke DIIS after a specified cycle where the function value change is
  ! small.
@@ -67,6 +70,22 @@ module lo_info
  ! Values of these two variables will be copied from loc()/pbc_loc() in
  !  $MOKIT_ROOT/mokit/lib/gaussian.py
 
+ real(kind=8) :: loc_tot_change = 0d0
+ integer :: loc_niter = 0
+ ! the number of iterations and total change of the target function in the
+ ! last orbital localization, see subroutine get_loc_conv_info in lo.f90
+
+ integer :: loc_verbose = 1
+ ! 0/1: turn off/on the printing of orbital localization routines (errors and
+ ! warnings are always printed), see subroutine set_loc_verbose in lo.f90
+ integer :: loc_nthreads = 1
+ integer(kind=8) :: loc_clock = 0
+ real(kind=8), allocatable :: loc_hist(:,:) ! size (4,max_niter+1)
+ ! per-iteration records of the last orbital localization: change of the target
+ ! function, the number of 2*2 rotations tried (0 for a DIIS extrapolation
+ ! step), wall time (s) and the number of OpenMP threads, see
+ ! subroutine get_loc_hist in lo.f90
+
  real(kind=8), allocatable :: u(:,:), cayley_k(:,:), k_old(:,:), k_diis(:,:)
 
  character(len=240), allocatable :: binfile(:) ! size nfile
@@ -83,10 +102,50 @@ module lo_info
  end type mo_centers
  type(mo_centers), allocatable :: mo_cen(:) ! size nmo
 
+ ! In the sparse PM localization (used when the dense gross(natom,nmo,nmo) does
+ ! not fit into the memory budget), mo_atm(i)%idx stores atoms (in ascending
+ ! order) with non-negligible population of MO i. Atoms with gross(A,i,i) <
+ ! sparse_pop_thres are neglected.
+ type(mo_centers), allocatable :: mo_atm(:) ! size nmo
+ real(kind=8), parameter :: sparse_pop_thres = 1d-8
+
  logical :: diis = .true. ! .true./.false. for turning on/off DIIS
 
 contains
 
+! Start recording iterations of an orbital localization. para: whether 2*2
+! rotations are performed in parallel
+subroutine init_loc_hist(para)
+!$ use omp_lib, only: omp_get_max_threads
+ implicit none
+ logical, intent(in) :: para
+
+ if(allocated(loc_hist)) then
+  if(SIZE(loc_hist,2) /= max_niter+1) deallocate(loc_hist)
+ end if
+ if(.not. allocated(loc_hist)) allocate(loc_hist(4,max_niter+1))
+ loc_hist = 0d0
+ loc_nthreads = 1
+!$ if(para) loc_nthreads = omp_get_max_threads()
+ call system_clock(loc_clock)
+end subroutine init_loc_hist
+
+! Record (and print) the i-th iteration of an orbital localization. nact is the
+! number of 2*2 rotations tried in this iteration.
+subroutine add_loc_hist(i, sum_change, nact)
+ implicit none
+ integer, intent(in) :: i, nact
+ integer(kind=8) :: t, rate
+ real(kind=8), intent(in) :: sum_change
+
+ call system_clock(t, rate)
+ loc_hist(:,i) = [sum_change, DBLE(nact), DBLE(t-loc_clock)/DBLE(rate), &
+                  DBLE(loc_nthreads)]
+ loc_clock = t
+ if(loc_verbose > 0) write(6,'(A,I4,A,F16.8)') 'niter=', i, ', sum_change=', &
+                                               sum_change
+end subroutine add_loc_hist
+
 ! Find effective i-j map using the distance matrix of MOs, i.e. create/update
 ! the eff_ijmap array.
 subroutine find_eff_ijmap(nmo, mo_dis)
@@ -308,6 +367,8 @@ subroutine para22boys_kernel(nbf, nmo, coeff, mo_dip, change)
   ! update remaining off-diagonal elements of mo_dip(:,x,y)
   do n = 1, npair0, 1
    if(skip(n)) cycle
+   if(diis) call rotate_mo_ij(cos_a(n), sin_a(n), nmo, u(:,idx(1,n)), &
+                              u(:,idx(2,n)))
    call update_up_tri_ij_dip(nmo, idx(1,n), idx(2,n), cos_a(n), sin_a(n), &
                              mo_dip)
   end do ! for n
@@ -500,6 +561,72 @@ subroutine get_mo_center_by_scpa(natom, nbf, nmo, bfirst, mo, mo_cen)
  deallocate(pop, gross)
 end subroutine get_mo_center_by_scpa
 
+! Find the center(s) of each MO from the diagonal gross populations, i.e. pop(:,i)
+!  is gross(:,i,i).
+subroutine get_mo_center_from_diag_gross(natom, nmo, gross, mo_cen)
+ use lo_info, only: pop_thres, mo_centers
+ implicit none
+ integer :: i, j, k, m, ak(1)
+ integer, intent(in) :: natom, nmo
+ real(kind=8) :: r, min_v, sum_r
+ real(kind=8), intent(in) :: gross(natom,nmo)
+ real(kind=8), allocatable :: pop(:)
+ type(mo_centers), intent(out) :: mo_cen(nmo)
+
+ allocate(pop(natom))
+
+!$omp parallel do schedule(dynamic) default(private) &
+!$omp shared(natom,nmo,gross,mo_cen)
+ do i = 1, nmo, 1
+  ! find the largest component on an atom of an MO
+  pop = gross(:,i)
+  mo_cen(i)%nc = 1; m = 1
+  ak = MAXLOC(pop); k = ak(1); r = pop(k)
+
+  ! check the 2nd largest component
+  if(r < pop_thres) then
+   ak = MINLOC(pop); m = ak(1); min_v = pop(m)
+   pop(k) = min_v-0.5d0; m = 1; sum_r = r
+   do j = 1, natom-1, 1
+    m = m + 1; ak = MAXLOC(pop); k = ak(1)
+    r = pop(k); sum_r = sum_r + r
+    if(sum_r > pop_thres) exit
+    pop(k) = min_v - 0.5d0
+   end do ! for j
+  end if
+
+  mo_cen(i)%nc = m
+  if(allocated(mo_cen(i)%idx)) deallocate(mo_cen(i)%idx)
+  allocate(mo_cen(i)%idx(m))
+ end do ! for i
+!$omp end parallel do
+
+!$omp parallel do schedule(dynamic) default(private) &
+!$omp shared(natom,nmo,gross,mo_cen)
+ do i = 1, nmo, 1
+  ! find the largest component on an atom of an MO
+  pop = gross(:,i)
+  ak = MAXLOC(pop); k = ak(1)
+  r = pop(k); mo_cen(i)%idx(1) = k
+
+  ! check the 2nd largest component
+  if(r < pop_thres) then
+   ak = MINLOC(pop); m = ak(1); min_v = pop(m)
+   pop(k) = min_v-0.5d0; m = 1; sum_r = r
+   do j = 1, natom-1, 1
+    ak = MAXLOC(pop); k = ak(1); r = pop(k)
+    m = m + 1; mo_cen(i)%idx(m) = k
+    sum_r = sum_r + r
+    if(sum_r > pop_thres) exit
+    pop(k) = min_v - 0.5d0
+   end do ! for j
+  end if
+ end do ! for i
+!$omp end parallel do
+
+ deallocate(pop)
+end subroutine get_mo_center_from_diag_gross
+
 ! This subroutine is the same as subroutine get_mo_center_from_diag_gross above,
 !  except that here gross is a 3D array, and only gross(:,i,i) will be used.
 subroutine get_mo_center_from_gross(natom, nmo, gross, mo_cen)
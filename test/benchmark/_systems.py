@@ -0,0 +1,13 @@
+# Model systems shared by benchmark scripts in this directory
+import numpy as np
+
+def water_cluster(n):
+    # n waters on a cubic grid with 2.9 A spacing
+    m = int(np.ceil(n**(1.0/3.0)))
+    atom = []
+    for k in range(n):
+        x, y, z = 2.9*np.array([k %m, (k//m) %m, k//(m*m)])
+        atom.append(['O', (x, y, z)])
+        atom.append(['H', (x+0.757, y+0.587, z)])
+        atom.append(['H', (x-0.757, y+0.587, z)])
+    return atom
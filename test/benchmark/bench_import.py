@@ -0,0 +1,30 @@
+# Startup time of mokit.lib. Each statement is run in a fresh interpreter
+# (like the helper scripts generated by automr), repeated nrep times.
+# Usage: python bench_import.py [nrep]
+import sys, subprocess, time
+
+nrep = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+stmts = [
+    'pass',
+    'import mokit.lib',
+    'from mokit.lib.fch2py import fch2py',
+    'from mokit.lib import fchk',   # loads py2fch_direct, still without PySCF
+    'import pyscf.scf, pyscf.mcscf',
+    'from mokit.lib import py2orca, fch2xyz; from pyscf import scf, mcscf' # old eager import
+]
+
+print('%-72s %10s %10s' % ('statement', 'min/s', 'median/s'))
+for stmt in stmts:
+    t = []
+    for i in range(nrep):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, '-c', stmt], check=True)
+        t.append(time.perf_counter() - t0)
+    t.sort()
+    print('%-72s %10.3f %10.3f' % (stmt, t[0], t[nrep//2]))
+
+# the lazy import must not load PySCF
+p = subprocess.run([sys.executable, '-c', "import sys, mokit.lib; mokit.lib.fchk; "
+                    "print('pyscf' in sys.modules)"], check=True, capture_output=True, text=True)
+print('PySCF imported by mokit.lib/fchk:', p.stdout.strip())
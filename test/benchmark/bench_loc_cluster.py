@@ -0,0 +1,41 @@
+# Wall time and target function of Boys/PM localization of valence occupied
+# orbitals of a water cluster (STO-3G): all orbitals at once, versus
+# divide-and-conquer localization (spatial clusters of about cluster_nmo
+# orbitals localized independently in nproc processes, then global sweeps).
+# Occupied orbitals of the core Hamiltonian are used to skip the SCF, since
+# any orthonormal orbitals will do for timing.
+# Usage: python bench_loc_cluster.py [nwater] [cluster_nmo] [nproc]
+import sys, time
+import numpy as np
+from scipy.linalg import eigh
+from pyscf import gto
+from mokit.lib.gaussian import localize
+from _systems import water_cluster
+
+nwater = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+cluster_nmo = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+nproc = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+
+def target(mol, lmo, method):
+    # Boys: sum_i |<i|r|i>|^2; PM: sum_i sum_A (Mulliken population of i on A)^2
+    if method == 'boys':
+        r = np.einsum('ui,xuv,vi->xi', lmo, mol.intor('int1e_r'), lmo, optimize=True)
+        return np.sum(r*r)
+    pop = lmo*np.dot(mol.intor('int1e_ovlp'), lmo)
+    q = np.array([pop[p0:p1].sum(axis=0) for p0, p1 in mol.aoslice_by_atom()[:,2:]])
+    return np.sum(q*q)
+
+mol = gto.M(atom=water_cluster(nwater), basis='sto-3g', verbose=0).build()
+e, mo = eigh(mol.intor('int1e_kin')+mol.intor('int1e_nuc'), mol.intor('int1e_ovlp'))
+idx = range(nwater, 5*nwater) # valence occupied orbitals
+
+print('\n%6s %12s %10s %6s %8s %14s' % ('method', 'cluster_nmo', 'nclusters',
+      'niter', 'time/s', 'target'))
+for method in ('pm', 'boys'):
+    for cnmo in (None, cluster_nmo):
+        t0 = time.perf_counter()
+        lmo, info = localize(mol, mo, idx, method, return_info=True,
+                             cluster_nmo=cnmo, nproc=nproc)
+        t1 = time.perf_counter()
+        print('%6s %12s %10s %6d %8.2f %14.6f' % (method, cnmo, info.get('nclusters', 1),
+              info['niter'], t1-t0, target(mol, lmo[:,idx], method)), flush=True)
@@ -0,0 +1,23 @@
+# Serial vs OpenMP parallel (ring ordered) Jacobi 2*2 rotations: wall time of
+# one Boys sweep on random integrals, and the serial/parallel cutoff chosen by
+# get_para_nmo() for each number of threads.
+# Usage: python bench_loc_para.py [nthreads ...]
+import os, sys
+from mokit.lib.lo import time_jacobi_sweep, set_loc_para, get_loc_para
+from mokit.lib.gaussian import get_para_nmo
+
+nthreads = [int(i) for i in sys.argv[1:]] or sorted({1, 2, os.cpu_count()})
+nmo_list = (50, 100, 200, 300, 400, 500, 800)
+para_nmo0, nthreads0 = get_loc_para()
+
+print('%8s' % 'nthreads' + ''.join('%9d' % n for n in nmo_list) + '%10s' % 'para_nmo')
+for nt in nthreads:
+    set_loc_para(para_nmo0, nt)
+    ratio = []
+    for nmo in nmo_list:
+        t_serial = min(time_jacobi_sweep(nmo, False) for i in range(3))
+        t_para = min(time_jacobi_sweep(nmo, True) for i in range(3))
+        ratio.append(t_serial/t_para)
+    print('%8d' % nt + ''.join('%9.2f' % r for r in ratio) + '%10d' % get_para_nmo(nt))
+print('(numbers are t_serial/t_parallel)')
+set_loc_para(para_nmo0, nthreads0)
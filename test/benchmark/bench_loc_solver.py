@@ -0,0 +1,56 @@
+# Wall time and number of iterations of localization solvers: Jacobi (lo.f90),
+# Jacobi with DIIS (Boys only), and quasi-Newton (lo_qn.py), for occupied
+# orbitals of water clusters (6-31G*) and valence orbitals of linear acenes
+# (STO-3G). Acenes have a slow tail of convergence, where DIIS helps.
+# Usage: python bench_loc_solver.py [nwater ...]
+import sys, time
+import numpy as np
+from pyscf import gto
+from mokit.lib.gaussian import localize, AOIntegrals
+from _systems import water_cluster
+
+def acene(n):
+    # n linearly fused benzene rings in the xy plane, C-C 1.40 A, C-H 1.08 A
+    a = 1.40
+    h = 1.08
+    s3 = np.sqrt(3.0)
+    atom = []
+    for k in range(n+1):
+        x = k*a*s3
+        atom.append(['C', (x, a/2, 0)])
+        atom.append(['C', (x, -a/2, 0)])
+        if k < n:
+            for sgn in (1, -1):
+                atom.append(['C', (x+a*s3/2, sgn*a, 0)])
+                atom.append(['H', (x+a*s3/2, sgn*(a+h), 0)])
+    for x0, dx in ((0.0, -1.0), (n*a*s3, 1.0)):
+        for sgn in (1, -1):
+            atom.append(['H', (x0+dx*h*s3/2, sgn*(a/2+h/2), 0)])
+    return atom
+
+nwater = [int(i) for i in sys.argv[1:]] or [8, 16]
+systems = [('water%d' % n, water_cluster(n), '6-31g*') for n in nwater]
+systems += [('acene%d' % n, acene(n), 'sto-3g') for n in (5, 10)]
+solvers = [('jacobi', {}), ('jacobi+DIIS', {'DIIS': True}), ('qn', {'solver': 'qn'})]
+
+res = []
+for name, atom, basis in systems:
+    mol = gto.M(atom=atom, basis=basis, verbose=0).build()
+    mf = mol.RHF().run(conv_tol=1e-8)
+    nocc = mol.nelectron//2
+    ncore = sum(1 for i in range(mol.natm) if mol.atom_symbol(i) != 'H')
+    ints = AOIntegrals(mol)
+    for method in ('boys', 'pm'):
+        for solver, kwargs in solvers:
+            if method == 'pm' and 'DIIS' in kwargs:
+                continue
+            t0 = time.perf_counter()
+            lmo, info = localize(mol, mf.mo_coeff, range(ncore,nocc), method, ints=ints,
+                                 conv_tol=1e-6, return_info=True, **kwargs)
+            res.append((name, nocc-ncore, method, solver, time.perf_counter()-t0, info))
+
+print('\n%-8s %4s %6s %12s %8s %6s %10s %16s' % ('system', 'nmo', 'method', 'solver',
+      'time/s', 'niter', 'converged', 'tot_change'))
+for name, nmo, method, solver, t, info in res:
+    print('%-8s %4d %6s %12s %8.2f %6d %10s %16.6f' % (name, nmo, method, solver, t,
+          info['niter'], info['converged'], info['tot_change']))
@@ -0,0 +1,57 @@
+# Number of iterations and wall time of Boys/PM localization along a pseudo
+# trajectory of a water cluster (6-31G*): each frame moves all atoms randomly by
+# about amp Bohr. Cold start: AO-like LMOs as the initial guess (default).
+# Warm start: MOs rotated to resemble LMOs of the previous frame (lmo_ref).
+# Usage: python bench_loc_warm.py [nwater] [nframe] [amp]
+import sys, time
+import numpy as np
+from pyscf import gto
+from mokit.lib.gaussian import localize, AOIntegrals
+from _systems import water_cluster
+
+nwater = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+nframe = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+amp = float(sys.argv[3]) if len(sys.argv) > 3 else 0.02
+
+rng = np.random.default_rng(7)
+mol = gto.M(atom=water_cluster(nwater), basis='6-31g*', verbose=0).build()
+coords = mol.atom_coords()
+idx = range(nwater, 5*nwater) # valence occupied orbitals
+dm = None
+frames = []
+for i in range(nframe):
+    if i > 0:
+        coords = coords + amp*rng.standard_normal(coords.shape)
+        mol = mol.set_geom_(coords, unit='Bohr', inplace=False)
+    mf = mol.RHF().run(dm, conv_tol=1e-8)
+    dm = mf.make_rdm1()
+    frames.append((mol, mf.mo_coeff))
+
+print('\n%6s %6s %6s %8s %6s %8s %8s' % ('frame', 'method', 'cold', 'time/s',
+      'warm', 'time/s', 'dcen/A'))
+tot = np.zeros(4)
+for method in ('boys', 'pm'):
+    lmo_ref = mol_ref = None
+    for i, (mol, mo) in enumerate(frames):
+        ints = AOIntegrals(mol)
+        t0 = time.perf_counter()
+        lmo1, info1 = localize(mol, mo, idx, method, ints=ints, conv_tol=1e-6,
+                               return_info=True)
+        t1 = time.perf_counter()
+        if lmo_ref is None:
+            lmo2, info2 = lmo1, info1
+        else:
+            lmo2, info2 = localize(mol, mo, idx, method, ints=ints, conv_tol=1e-6,
+                                   return_info=True, lmo_ref=lmo_ref, mol_ref=mol_ref)
+        t2 = time.perf_counter()
+        # difference of LMO centers (Angstrom) between cold and warm starts
+        c1 = np.einsum('ui,xuv,vi->xi', lmo1[:,idx], ints.dip()[1], lmo1[:,idx])
+        c2 = np.einsum('ui,xuv,vi->xi', lmo2[:,idx], ints.dip()[1], lmo2[:,idx])
+        dc = np.linalg.norm(c2[:,:,None]-c1[:,None,:], axis=0).min(axis=1).max()*0.529177
+        print('%6d %6s %6d %8.3f %6d %8.3f %8.0e' % (i, method, info1['niter'],
+              t1-t0, info2['niter'], t2-t1, dc))
+        if i > 0:
+            tot += [info1['niter'], t1-t0, info2['niter'], t2-t1]
+        lmo_ref, mol_ref = lmo2[:,idx], mol
+print('frames 1~%d: cold %d iterations %.3f s, warm %d iterations %.3f s' %
+      (nframe-1, tot[0], tot[1], tot[2], tot[3]))
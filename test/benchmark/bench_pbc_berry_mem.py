@@ -0,0 +1,78 @@
+# Peak memory and wall time of Berry localization for a water box (GTH-DZVP):
+# AO-basis Berry phase integrals (3,nbf,nbf) passed to berry() (the previous
+# pbc_loc), versus MO-basis integrals built block by block of shells under
+# max_memory (AOIntegrals.ft_aopair_mo) and passed to berry_mo(). Each case runs
+# in a new process, and its maximum resident set size is reported.
+# Usage: python bench_pbc_berry_mem.py [nwater] [max_memory(MB) ...]
+import sys, time, resource, subprocess
+import numpy as np
+
+nwater = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+maxcyc = 5 # the number of Berry sweeps does not change the peak memory
+
+def run(case):
+    from pyscf.pbc import gto
+    from mokit.lib.gaussian import AOIntegrals
+    from mokit.lib.rwwfn import calc_dis_mat_from_coor_pbc
+    from mokit.lib.lo import berry, berry_mo
+
+    # n waters on a cubic grid with 3.1 A spacing, about 1 g/cm^3
+    m = int(np.ceil(nwater**(1.0/3.0)))
+    atom = []
+    for k in range(nwater):
+        x, y, z = 3.1*np.array([k %m, (k//m) %m, k//(m*m)]) + 0.5
+        atom.append(['O', (x, y, z)])
+        atom.append(['H', (x+0.757, y+0.587, z)])
+        atom.append(['H', (x-0.757, y+0.587, z)])
+    cell = gto.M(atom=atom, a=np.eye(3)*3.1*m, basis='gth-dzvp',
+                 pseudo='gth-pbe', verbose=0)
+    ints = AOIntegrals(cell)
+    w, v = np.linalg.eigh(ints.ovlp())
+    mo = ((v/np.sqrt(w)) @ v.T)[:,:4*nwater] # any orthonormal orbitals will do
+    w = v = None
+    nbf, nmo = mo.shape
+    natom = cell.natm
+    coor = cell.atom_coords().T*0.529177249
+    dis = calc_dis_mat_from_coor_pbc(natom, cell.a, coor)
+    bfirst = np.ones(natom+1, dtype=np.int32)
+    bfirst[1:] = cell.aoslice_by_atom()[:,3] + 1
+    a = cell.a.diagonal()[:,None,None]
+    rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1e3
+
+    t0 = time.perf_counter()
+    if case == 'AO':
+        max_memory = None
+        ao_zdip = ints.ft_aopair()
+        ao_zdip *= a
+        lmo = berry(natom, nbf, nmo, maxcyc, False, bfirst, dis, mo, ao_zdip,
+                    27.0, 1e-5)
+        ao_zdip /= a
+    else:
+        max_memory = float(case)
+        mo_zdip = ints.ft_aopair_mo(mo, max_memory)
+        mo_zdip *= a
+        lmo = berry_mo(natom, nbf, nmo, maxcyc, False, bfirst, dis, mo, mo_zdip,
+                       27.0, 1e-5)
+    t1 = time.perf_counter()
+    rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1e3
+    z = ints.ft_aopair_mo(lmo, max_memory, diag=True)
+    print('RESULT %d %d %.1f %.1f %.2f %.8f' % (nbf, nmo, rss0, rss1, t1-t0,
+          np.sum(np.abs(z)**2)), flush=True)
+
+if len(sys.argv) > 3 and sys.argv[2] == '--case':
+    run(sys.argv[3])
+    sys.exit()
+
+cases = ['AO'] + (sys.argv[2:] or ['100', '20'])
+print('%10s %6s %6s %10s %10s %8s %14s' % ('integrals', 'nbf', 'nmo', 'RSS0/MB',
+      'RSS/MB', 'time/s', 'sum|z_ii|^2'))
+for case in cases:
+    p = subprocess.run([sys.executable, __file__, str(nwater), '--case', case],
+                       stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    res = [line for line in p.stdout.splitlines() if line.startswith('RESULT')]
+    if len(res) == 0:
+        print('%10s failed\n%s' % (case, p.stderr[-2000:]))
+        continue
+    nbf, nmo, rss0, rss1, t, f = res[0].split()[1:]
+    label = 'AO' if case == 'AO' else 'MO,%sMB' % case
+    print('%10s %6s %6s %10s %10s %8s %14s' % (label, nbf, nmo, rss0, rss1, t, f))
@@ -0,0 +1,30 @@
+from pyscf import gto
+import numpy as np
+from mokit.lib.py2fch_direct import fchk
+from mokit.lib.gaussian import mo_fch2py
+from mokit.lib.fchfile import load_fch_arrays
+
+mol = gto.M(atom='O 0.0 0.0 0.1; H 0.0 0.0 1.0',
+        basis='cc-pvtz',
+        spin=1,
+        ).build()
+mf = mol.UHF().run()
+
+# besides test_uhf.fch, the binary companion test_uhf.fch.bin/ is generated
+fchk(mf, 'test_uhf.fch', density=True, binary=True)
+
+# MOs are memory-mapped from test_uhf.fch.bin/, no text parsing
+mo_a, mo_b = mo_fch2py('test_uhf.fch')
+print(type(mo_a), np.allclose(mo_a, mf.mo_coeff[0]), np.allclose(mo_b, mf.mo_coeff[1]))
+print(np.allclose(load_fch_arrays('test_uhf.fch')['dm'], mf.make_rdm1().sum(axis=0)))
+
+# once MOs in test_uhf.fch are overwritten (the file size unchanged, and the
+#  mtime restored to mimic a coarse timestamp granularity), the writer has
+#  invalidated the companion and MOs are read from the text again
+import os
+from mokit.lib.fchfile import FchFile, write_fch_sections
+st = os.stat('test_uhf.fch')
+write_fch_sections('test_uhf.fch', {'Alpha MO coefficients': FchFile('test_uhf.fch').raw_mo('b').T})
+os.utime('test_uhf.fch', ns=(st.st_atime_ns, st.st_mtime_ns))
+print(load_fch_arrays('test_uhf.fch') is None,
+      np.allclose(FchFile('test_uhf.fch').mo('a'), mf.mo_coeff[1], atol=1e-6))
@@ -0,0 +1,57 @@
+from pyscf import gto
+import numpy as np
+from mokit.lib.py2fch_direct import fchk
+from mokit.lib.fchfile import FchFile
+from mokit.lib.fch2py import fch2py
+from mokit.lib.rwwfn import read_dm_from_fch
+
+mol = gto.M(atom='O 0.0 0.0 0.1; H 0.0 0.0 1.0',
+        basis='cc-pvtz',
+        spin=1,
+        ).build()
+mf = mol.UHF().run()
+fchk(mf, 'test_uhf.fch', density=True)
+
+# the file is read only once, all arrays below come from memory
+fch = FchFile('test_uhf.fch')
+print(fch.nbf, fch.nif, fch.na, fch.nb, fch.hf_type)
+for ab in ['a', 'b']:
+    mo = fch2py('test_uhf.fch', fch.nbf, fch.nif, ab)
+    print(np.allclose(fch.mo(ab), mo))
+print(np.allclose(fch.dm(1), read_dm_from_fch('test_uhf.fch', 1, fch.nbf)))
+
+# FchFile objects can be passed into functions in gaussian.py
+from mokit.lib.gaussian import mo_fch2py, uno
+mo_a, mo_b = mo_fch2py(fch)
+uno(fch)
+
+# each section can also be read directly by seeking to its byte offset, which
+# is recorded in the index file test_uhf.fch.idx
+from mokit.lib.fchfile import read_fch_section
+mo_b = read_fch_section('test_uhf.fch', 'Beta MO coefficients')
+print(np.allclose(mo_b, fch.raw_mo('b').T.ravel()))
+
+# UNOs in memory are the same as those in test_uhf_UNO.fch generated by uno()
+# above, and the restricted copy of the file is made in process
+from mokit.lib.gaussian import uno_arrays
+from mokit.lib.fchfile import fch_u2r
+no, noon, idx = uno_arrays(mol, fch.mo('a'), fch.mo('b'), fch.na, fch.nb)
+no1 = FchFile('test_uhf_UNO.fch').mo('a')
+print(idx, np.allclose(noon, FchFile('test_uhf_UNO.fch').eigenvalues('a')),
+      np.allclose(np.abs(no[:,:idx[1]-1]), np.abs(no1[:,:idx[1]-1]), atol=1e-6))
+fch_u2r('test_uhf.fch')
+print(FchFile('test_uhf_r.fch').hf_type, FchFile('test_uhf_r.fch').job_info[10:14])
+
+# a .fchk file from Gaussian: the Route line starts with '#' and is data of the
+# 'Route' section, not a section header
+import os, shutil
+example_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'examples', 'automr')
+shutil.copy(os.path.join(example_dir, 'B3_cc-pVDZ_5D7F_uhf.fchk'), '.')
+fch = FchFile('B3_cc-pVDZ_5D7F_uhf.fchk')
+print(fch['Route'][:14], fch['Charge'], fch.mult, fch.nbf, fch.nif)
+
+# UHF -> ROHF on the Gaussian file, the same as the executable fch_u2r
+fch_u2r('B3_cc-pVDZ_5D7F_uhf.fchk')
+fch1 = FchFile('B3_cc-pVDZ_5D7F_uhf_r.fch')
+print(fch1['Route'][:15], fch1.hf_type, 'Beta MO coefficients' in fch1,
+      np.allclose(fch1.mo('a'), fch.mo('a')))
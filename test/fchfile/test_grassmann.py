@@ -0,0 +1,44 @@
+import numpy as np
+from pyscf import gto
+from mokit.lib.py2fch_direct import fchk
+from mokit.lib.fchfile import FchFile
+from mokit.lib.gaussian import mo_g_int, mo_g_int_batch
+
+# triplet water UHF/cc-pVDZ at four known H-O-H angles, and .gjf files of three
+# new angles
+def geom(theta):
+    t = np.radians(theta)/2
+    return 'O 0 0 0; H 0 %.8f %.8f; H 0 %.8f %.8f' % (0.96*np.sin(t), 0.96*np.cos(t),
+                                                        -0.96*np.sin(t), 0.96*np.cos(t))
+x = [100.0, 105.0, 110.0, 115.0]
+fchs = []
+for theta in x:
+    mol = gto.M(atom=geom(theta), basis='cc-pvdz', spin=2, verbose=0)
+    fchk(mol.UHF().run(), 'h2o_%d.fch' % theta)
+    fchs.append('h2o_%d.fch' % theta)
+x_new = [107.0, 108.0, 112.0]
+for theta in x_new:
+    for name in ('h2o_%d.gjf', 'h2o_%d_1.gjf'):
+        with open(name % theta, 'w') as f:
+            f.write('#p UHF/cc-pVDZ\n\ntitle\n\n0 3\n%s\n\n' % geom(theta).replace('; ','\n'))
+
+# one new geometry per call, or all new geometries in one call (2 processes):
+# identical files
+for theta in x_new:
+    mo_g_int(fchs+['h2o_%d.gjf' % theta], x+[theta])
+new_fchs = mo_g_int_batch(fchs, x, ['h2o_%d_1.gjf' % t for t in x_new], x_new,
+                          nproc=2)
+same = True
+for theta, new_fch in zip(x_new, new_fchs):
+    with open('h2o_%d.fch' % theta, 'rb') as f1, open(new_fch, 'rb') as f2:
+        same = same and f1.read()==f2.read()
+print(new_fchs, same)
+
+# the interpolated UHF wave function is close to the converged one
+mol = gto.M(atom=geom(108.0), basis='cc-pvdz', spin=2, verbose=0)
+mf = mol.UHF()
+fch = FchFile(new_fchs[1])
+occ = np.zeros((2,fch.nif))
+occ[0,:fch.na] = occ[1,:fch.nb] = 1.0
+e0 = mf.energy_tot(mf.make_rdm1((fch.mo('a'), fch.mo('b')), occ))
+print(e0 - mf.run().e_tot < 1e-4)
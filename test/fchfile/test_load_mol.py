@@ -0,0 +1,24 @@
+from pyscf import gto
+import numpy as np
+from mokit.lib.py2fch_direct import fchk
+from mokit.lib.gaussian import load_mol_from_fch
+
+mol = gto.M(atom='Cu 0.0 0.0 0.1; H 0.0 0.0 1.6; X-H 0.0 1.0 0.0',
+        basis='lanl2dz', ecp='lanl2dz',
+        spin=0,
+        ).build()
+mf = mol.RHF().run()
+fchk(mf, 'cuh.fch')
+
+# basis set and ECP data are parsed in process, no bas_fch2py is called
+mol2 = load_mol_from_fch('cuh.fch')
+mf2 = mol2.RHF()
+mf2.max_cycle = 1
+mf2.kernel(dm0=mf.make_rdm1())
+print(mol2.atom_symbol(2), np.allclose(mf.e_tot, mf2.e_tot))
+
+# the second call returns a copy of the cached mol object
+from mokit.lib.gaussian import clear_mol_cache
+mol3 = load_mol_from_fch('cuh.fch')
+print(mol3 is not mol2, mol3.nao==mol2.nao, np.allclose(mol3.energy_nuc(), mol2.energy_nuc()))
+clear_mol_cache()
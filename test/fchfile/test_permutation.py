@@ -0,0 +1,28 @@
+from pyscf import gto
+import numpy as np
+from mokit.lib.py2fch_direct import fchk, get_mol_permutation
+from mokit.lib.fchfile import FchFile
+
+for cart in (False, True):
+    mol = gto.M(atom='O 0.0 0.0 0.1; H 0.0 0.0 1.0',
+            basis='cc-pvqz', spin=1, cart=cart).build()
+    mf = mol.UHF().run()
+    fchk(mf, 'test_perm.fch', density=True, overwrite_mol=True)
+
+    fch = FchFile('test_perm.fch')
+    perm = fch.permutation()
+    # the same basis set -> the same cached object
+    print(perm is get_mol_permutation(mol), perm is FchFile('test_perm.fch').permutation())
+
+    # alpha and beta MOs converted in one call
+    mo = perm.mo2py(np.array([fch.raw_mo('a'), fch.raw_mo('b')]))
+    print(np.allclose(mo, mf.mo_coeff), np.allclose(perm.mo2gau(mo)[1], fch.raw_mo('b')))
+
+    # AO matrices: density (contravariant) and overlap/dipole (covariant)
+    dm = mf.make_rdm1().sum(axis=0)
+    S = mol.intor_symmetric('int1e_ovlp')
+    r = mol.intor_symmetric('int1e_r')
+    print(np.allclose(perm.dm2gau(dm), fch.dm(1)), np.allclose(perm.dm2py(fch.dm(1)), dm))
+    print(np.isclose(np.sum(perm.dm2gau(dm)*perm.int2gau(S)), mol.nelectron))
+    print(np.allclose(np.einsum('ij,xji->x', perm.dm2gau(dm), perm.int2gau(r)),
+                      np.einsum('ij,xji->x', dm, r)), np.allclose(perm.int2py(perm.int2gau(r)), r))
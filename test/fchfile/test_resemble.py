@@ -0,0 +1,55 @@
+import shutil
+import numpy as np
+from pyscf import gto
+from mokit.lib.py2fch_direct import fchk
+from mokit.lib.fchfile import FchFile
+from mokit.lib.gaussian import make_orb_resemble, make_orb_resemble_batch
+
+# reference: triplet water UHF/cc-pVDZ. Targets: distorted geometries at
+# cc-pVTZ, one UHF iteration only
+geom = 'O 0.0 0.0 0.0; H 0.0 0.757 0.587; H 0.0 -0.757 0.587'
+mol = gto.M(atom=geom, basis='cc-pvdz', spin=2, verbose=0)
+mf = mol.UHF().run()
+fchk(mf, 'ref.fch')
+rng = np.random.default_rng(0)
+for i in range(3):
+    mol1 = gto.M(atom=geom, basis='cc-pvtz', spin=2, verbose=0)
+    mol1.set_geom_(mol1.atom_coords()+0.02*rng.standard_normal((3,3)), unit='Bohr')
+    mf1 = mol1.UHF().run(max_cycle=1)
+    fchk(mf1, 'target%d.fch' % i)
+    shutil.copyfile('target%d.fch' % i, 'batch%d.fch' % i)
+
+# one by one, or all targets in a batch (2 processes): identical files
+for i in range(3):
+    make_orb_resemble('target%d.fch' % i, 'ref.fch')
+make_orb_resemble_batch(['batch%d.fch' % i for i in range(3)], 'ref.fch', nproc=2)
+same = True
+for i in range(3):
+    with open('target%d.fch' % i, 'rb') as f1, open('batch%d.fch' % i, 'rb') as f2:
+        same = same and f1.read()==f2.read()
+print(same)
+
+# occupied alpha/beta MOs span nearly the same space as reference ones
+fch = FchFile('batch0.fch')
+mol1 = gto.M(atom=[(s, c) for s, c in zip(['O','H','H'], fch.coor.T)],
+             unit='Bohr', basis='cc-pvtz', spin=2, verbose=0)
+S12 = gto.intor_cross('int1e_ovlp', mol1, mol)
+for k, n in ((0, 5), (1, 3)):
+    sv = np.linalg.svd(fch.mo('ab'[k])[:,:n].T @ S12 @ mf.mo_coeff[k][:,:n],
+                       compute_uv=False)
+    print('ab'[k], sv.min() > 0.99)
+
+# basis set ladder cc-pVDZ -> cc-pVTZ -> cc-pVQZ in memory, versus calling
+# proj2target_basis twice: the same occupied space at cc-pVQZ
+from mokit.lib.gaussian import proj2target_basis, project_basis_ladder
+fchs = project_basis_ladder('ref.fch', ['cc-pVTZ','cc-pVQZ'], write_all=True)
+with open('ref_proj2.fch', 'rb') as f1, open('ref_proj.fch', 'rb') as f2:
+    print(fchs, f1.read()==f2.read())
+proj2target_basis('ref.fch', 'cc-pVTZ')
+proj2target_basis('ref_proj.fch', 'cc-pVQZ')
+fch1, fch2 = FchFile('ref_proj2.fch'), FchFile('ref_proj_proj.fch')
+S = gto.M(atom=geom, basis='cc-pvqz', verbose=0).intor_symmetric('int1e_ovlp')
+for ab, n in (('a', 5), ('b', 3)):
+    c1, c2 = fch1.mo(ab)[:,:n], fch2.mo(ab)[:,:n]
+    print(ab, fch1.nbf, np.allclose(c1 @ c1.T, c2 @ c2.T, atol=1e-6),
+          np.allclose(c1.T @ S @ c1, np.eye(n)))
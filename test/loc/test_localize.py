@@ -0,0 +1,126 @@
+from pyscf import gto
+import numpy as np
+from mokit.lib.py2fch_direct import fchk
+from mokit.lib.gaussian import localize, loc, load_mol_from_fch, mo_fch2py
+
+mol = gto.M(atom='''C 0 0 0; C 0 0 1.53; H 0 1.02 -0.39; H 0.88 -0.51 -0.39
+H -0.88 -0.51 -0.39; H 0 -1.02 1.92; H 0.88 0.51 1.92; H -0.88 0.51 1.92''',
+        basis='cc-pvdz').build()
+mf = mol.RHF().run()
+
+# in memory: LMOs, their centers (Angstrom) and convergence information
+for method in ('pm', 'boys'):
+    lmo, center, info = localize(mol, mf.mo_coeff, range(2,9), method,
+                                 return_centers=True, return_info=True)
+    print(method, info)
+    print(np.round(center.T, 3))
+    print(np.allclose(lmo[:,9:], mf.mo_coeff[:,9:]))
+
+# the file wrapper gives the same LMOs
+fchk(mf, 'c2h6.fch')
+loc('c2h6.fch', range(2,9), method='boys')
+mol = load_mol_from_fch('c2h6.fch')
+lmo = localize(mol, mo_fch2py('c2h6.fch'), range(2,9), 'boys')
+print(np.allclose(np.abs(mo_fch2py('c2h6_LMO.fch')), np.abs(lmo), atol=1e-6))
+
+# max_memory=0 forces the sparse PM algorithm (no gross(natom,nmo,nmo) stored),
+#  which gives the same LMOs as the dense one
+lmo1, info1 = localize(mol, mf.mo_coeff, range(2,9), 'pm', return_info=True)
+lmo2, info2 = localize(mol, mf.mo_coeff, range(2,9), 'pm', return_info=True,
+                       max_memory=0)
+print(np.allclose(lmo1, lmo2), np.isclose(info1['tot_change'], info2['tot_change']))
+
+# the quasi-Newton solver reaches the same maximum of the target function
+for method in ('pm', 'boys'):
+    lmo1, info1 = localize(mol, mf.mo_coeff, range(2,9), method, return_info=True)
+    lmo2, info2 = localize(mol, mf.mo_coeff, range(2,9), method, return_info=True,
+                           solver='qn')
+    print(method, info1['niter'], info2['niter'], info2['converged'],
+          abs(info1['tot_change'] - info2['tot_change']) < 1e-4)
+
+# DIIS acceleration of Boys Jacobi rotations (for >=10 orbitals) reaches the
+#  same maximum in no more cycles, e.g. for valence orbitals of naphthalene
+mol = gto.M(atom='''C 0 0.71 -1.24; C 0 -0.71 -1.24; C 0 1.40 0; C 0 -1.40 0
+C 0 0.71 1.24; C 0 -0.71 1.24; C 0 2.80 0; C 0 -2.80 0; C 0 0.71 2.48
+C 0 -0.71 2.48; C 0 0.71 -2.48; C 0 -0.71 -2.48; H 0 3.88 0; H 0 -3.88 0
+H 0 1.25 3.42; H 0 -1.25 3.42; H 0 1.25 -3.42; H 0 -1.25 -3.42''',
+            basis='sto-3g').build()
+mf = mol.RHF().run()
+lmo1, info1 = localize(mol, mf.mo_coeff, range(10,34), 'boys', return_info=True,
+                       conv_tol=1e-7)
+lmo2, info2 = localize(mol, mf.mo_coeff, range(10,34), 'boys', return_info=True,
+                       conv_tol=1e-7, DIIS=True)
+print('boys', info1['niter'], info2['niter'], info2['converged'],
+      abs(info1['tot_change'] - info2['tot_change']) < 1e-4)
+
+# parallel (ring ordered) Jacobi rotations, forced by para_nmo, reach the same
+#  maximum as serial ones
+for method in ('pm', 'boys'):
+    lmo1, info1 = localize(mol, mf.mo_coeff, range(10,34), method, return_info=True,
+                           conv_tol=1e-7, para_nmo=500, nthreads=1)
+    lmo2, info2 = localize(mol, mf.mo_coeff, range(10,34), method, return_info=True,
+                           conv_tol=1e-7, para_nmo=10, nthreads=2)
+    print(method, abs(info1['tot_change'] - info2['tot_change']) < 1e-4)
+
+# para_nmo='auto' times Jacobi sweeps of 50~400 orbitals only when the number
+#  of orbitals is in this range, otherwise the default cutoff 500 is used
+import time
+from mokit.lib.gaussian import get_para_nmo
+t0 = time.time()
+print(get_para_nmo(2, nmo=24), get_para_nmo(2, nmo=1000), time.time()-t0 < 0.1)
+
+# warm start from LMOs of the same (or the previous) geometry, e.g. along a
+#  trajectory or a scan, needs only a few sweeps
+for method in ('pm', 'boys'):
+    lmo1, info1 = localize(mol, mf.mo_coeff, range(10,34), method, return_info=True)
+    lmo2, info2 = localize(mol, mf.mo_coeff, range(10,34), method, return_info=True,
+                           lmo_ref=lmo1[:,10:34])
+    print(method, info1['niter'], info2['niter'], abs(info2['tot_change']) < 1e-4)
+
+lmo0 = mo_fch2py('c2h6_LMO.fch')
+loc('c2h6.fch', range(2,9), method='boys', ref_fch='c2h6_LMO.fch')
+print(np.allclose(np.abs(mo_fch2py('c2h6_LMO.fch')), np.abs(lmo0), atol=1e-4))
+
+# divide-and-conquer localization of a water chain: spatial clusters of about
+#  12 orbitals are localized independently (in 1 or 2 processes), followed by
+#  global sweeps. LMO centers are the same as those of plain localization
+atom = []
+for k in range(8):
+    atom += [['O', (3.0*k, 0, 0)], ['H', (3.0*k+0.757, 0.587, 0)],
+             ['H', (3.0*k-0.757, 0.587, 0)]]
+mol = gto.M(atom=atom, basis='sto-3g', verbose=0).build()
+mf = mol.RHF().run()
+for method in ('pm', 'boys'):
+    lmo0, c0 = localize(mol, mf.mo_coeff, range(8,40), method, conv_tol=1e-7,
+                        return_centers=True)
+    diff = 0.0
+    for nproc in (1, 2):
+        lmo, c, info = localize(mol, mf.mo_coeff, range(8,40), method, conv_tol=1e-7,
+                                return_centers=True, return_info=True,
+                                cluster_nmo=12, nproc=nproc)
+        d = np.linalg.norm(c[:,:,None]-c0[:,None,:], axis=0)
+        diff = max(diff, d.min(axis=1).max())
+    print(method, info['nclusters'], info['converged'], diff < 1e-3)
+
+# per-iteration records (change, active pairs, time, threads) of the Jacobi and
+#  quasi-Newton solvers, and no printing from Fortran/Python with verbose=False
+import os, sys, tempfile
+for solver in ('jacobi', 'qn'):
+    with tempfile.TemporaryFile() as f:
+        sys.stdout.flush()
+        fd = os.dup(1)
+        os.dup2(f.fileno(), 1)
+        try:
+            lmo, info = localize(mol, mf.mo_coeff, range(8,40), 'boys', solver=solver,
+                                 return_info=True, verbose=False)
+        finally:
+            sys.stdout.flush()
+            os.dup2(fd, 1)
+            os.close(fd)
+        f.seek(0)
+        quiet = len(f.read()) == 0
+    h = info['history']
+    print(solver, quiet, len(h) == info['niter'], h.dtype.names,
+          np.isclose(h['change'].sum(), info['tot_change']), h['npair'].max() <= 496)
+info = loc('c2h6.fch', range(2,9), method='boys', verbose=False, return_info=True)
+print(info['converged'], len(info['history']) == info['niter'], info['time'] > 0)
@@ -0,0 +1,102 @@
+import numpy as np
+from pyscf.pbc import gto
+from mokit.lib.gaussian import AOIntegrals, clear_ao_int_cache
+from mokit.lib.rwwfn import calc_dis_mat_from_coor_pbc
+from mokit.lib.lo import berry, berry_mo
+
+# two water molecules in a cubic box
+cell = gto.M(atom='''O 1.0 1.0 1.0; H 1.757 1.587 1.0; H 0.243 1.587 1.0
+O 4.0 4.0 4.0; H 4.757 4.587 4.0; H 3.243 4.587 4.0''',
+             a=np.eye(3)*7.0, basis='gth-dzvp', pseudo='gth-pbe', verbose=0)
+# any orthonormal orbitals will do, e.g. Lowdin orthonormalized AOs
+ints = AOIntegrals(cell)
+w, v = np.linalg.eigh(ints.ovlp())
+mo = ((v/np.sqrt(w)) @ v.T)[:,:12]
+nbf, nmo = mo.shape
+natom = cell.natm
+
+# Berry phase integrals in MO basis, computed from the full AO tensor and block
+#  by block (max_memory=0.01 MB, i.e. about 1 shell per block)
+z1 = np.einsum('ui,xuv,vj->xij', mo, ints.ft_aopair(), mo)
+clear_ao_int_cache()
+z2 = ints.ft_aopair_mo(mo, max_memory=0.01)
+z3 = ints.ft_aopair_mo(mo, max_memory=0.01, diag=True)
+print(np.allclose(z1, z2), np.allclose(np.einsum('xii->xi', z1), z3))
+
+# Berry localization with AO or MO integrals gives the same LMOs
+coor = cell.atom_coords().T*0.529177249
+dis = calc_dis_mat_from_coor_pbc(natom, cell.a, coor)
+bfirst = np.ones(natom+1, dtype=np.int32)
+bfirst[1:] = cell.aoslice_by_atom()[:,3] + 1
+a = cell.a.diagonal()[:,None,None]
+lmo1 = berry(natom, nbf, nmo, 1499, False, bfirst, dis, mo, a*ints.ft_aopair(),
+             27.0, 1e-6)
+lmo2 = berry_mo(natom, nbf, nmo, 1499, False, bfirst, dis, mo, a*z2, 27.0, 1e-6)
+print(np.allclose(np.abs(lmo1), np.abs(lmo2), atol=1e-6))
+
+# quasi-Newton Berry localization scales MO-basis matrices by lattice lengths,
+#  and leaves the cached AO integrals untouched
+from mokit.lib.lo_qn import boys_qn
+z0 = ints.ft_aopair().copy()
+lmo3, info = boys_qn(mo, ints.ft_aopair(), 1e-6, verbose=False,
+                     scale=cell.a.diagonal())
+def berry_f(c):
+    return np.sum(np.abs(np.einsum('ui,xuv,vi->xi', c, a*z0, c))**2)
+print(np.array_equal(ints.ft_aopair(), z0), info['converged'],
+      np.isclose(berry_f(lmo3), berry_f(lmo1), rtol=1e-6))
+
+# a pseudo MD trajectory of 4 frames in .molden format (Lowdin orthonormalized
+#  AOs as MOs), localized frame by frame, in one process or two
+from pyscf.tools import molden
+from mokit.lib.gaussian import pbc_loc, pbc_loc_trajectory
+rng = np.random.default_rng(1)
+moldens = []
+for i in range(4):
+    cell1 = cell.set_geom_(cell.atom_coords()+0.02*rng.standard_normal((natom,3)),
+                           unit='Bohr', inplace=False)
+    cell1.basis = 'gth-szv'
+    cell1.build()
+    w, v = np.linalg.eigh(cell1.pbc_intor('int1e_ovlp', hermi=1))
+    occ = np.zeros(w.size)
+    occ[:8] = 2.0
+    moldens.append('water2_%d.molden' % i)
+    molden.from_mo(cell1, moldens[-1], (v/np.sqrt(w)) @ v.T, occ=occ)
+
+c1 = pbc_loc_trajectory(moldens, np.eye(3)*7.0, conv_tol=1e-8,
+                        npz='water2_wannier.npz')
+c2 = pbc_loc_trajectory(moldens, np.eye(3)*7.0, conv_tol=1e-8, nproc=2,
+                        warm_start=False)
+diff = 0.0
+for i, molden_file in enumerate(moldens):
+    pbc_loc(molden_file, np.eye(3)*7.0, conv_tol=1e-8)
+    with open(molden_file[:-7]+'_wannier.xyz') as f:
+        c0 = np.array([line.split()[1:] for line in f.readlines()[2:]], dtype=float).T
+    for c in (c1[i], c2[i]):
+        d = np.linalg.norm(c[:,:,None]-c0[:,None,:], axis=0)
+        diff = max(diff, d.min(axis=1).max())
+print(diff < 1e-3, np.load('water2_wannier.npz')['centers'].shape)
+with open('wannier_traj.xyz') as f:
+    print(sum(1 for line in f if line.startswith('Lattice')))
+
+# divide-and-conquer Berry localization (one cluster per water molecule, PBC
+#  distances) gives the same LMO centers
+pbc_loc(moldens[0], np.eye(3)*7.0, conv_tol=1e-8, wannier_xyz='dc.xyz',
+        cluster_nmo=4, nproc=2)
+with open('dc.xyz') as f:
+    c = np.array([line.split()[1:] for line in f.readlines()[2:]], dtype=float).T
+d = np.linalg.norm(c[:,:,None]-c1[0][:,None,:], axis=0)
+print(d.min(axis=1).max() < 1e-3)
+
+# convergence information and per-iteration records, without printing
+info = pbc_loc(moldens[0], np.eye(3)*7.0, verbose=False, return_info=True)
+print(info['converged'], len(info['history']) == info['niter'],
+      np.load('water2_wannier.npz')['niter'].shape)
+
+# LMOs saved into a .fch file written from the in-process molden data (no
+#  molden2fch), spanning the same occupied space
+from mokit.lib.fchfile import FchFile
+from mokit.lib.moldenfile import MoldenFile
+pbc_loc(moldens[0], np.eye(3)*7.0, conv_tol=1e-8, save_lmo=True, verbose=False)
+lmo = FchFile('water2_0_LMO.fch').mo('a')[:,:8]
+mo = MoldenFile(moldens[0], 'cp2k').mo('a')[:,:8]
+print(np.allclose(lmo @ lmo.T, mo @ mo.T, atol=1e-6))
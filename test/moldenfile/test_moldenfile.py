@@ -0,0 +1,66 @@
+import numpy as np
+from pyscf import gto
+from pyscf.tools import molden
+from mokit.lib.moldenfile import MoldenFile
+from mokit.lib.gaussian import load_mol_from_molden
+
+mol = gto.M(atom='O 0.0 0.0 0.0; H 0.0 0.757 0.587; H 0.0 -0.757 0.587',
+            basis='cc-pvtz', verbose=0).build()
+mf = mol.RHF().run()
+molden.from_mo(mol, 'h2o.molden', mf.mo_coeff, occ=mf.mo_occ, ene=mf.mo_energy)
+
+# parsed in process, no molden2fch and no .fch file
+mol2 = load_mol_from_molden('h2o.molden', 'cp2k')
+mf2 = mol2.RHF()
+mf2.max_cycle = 1
+mf2.kernel(dm0=mf.make_rdm1())
+mo = MoldenFile('h2o.molden', 'cp2k')
+print(np.allclose(mf.e_tot, mf2.e_tot), mo.na, mo.nb, mo.charge, mo.mult)
+print(np.allclose(mo.mo('a'), mf.mo_coeff, atol=1e-6))
+
+# ORCA: F+3/F-3 functions are multiplied by -1, i.e. the 6th/7th functions of
+#  each F shell in Gaussian order
+mo_orca = MoldenFile('h2o.molden', 'orca')
+diff = np.abs(mo_orca.raw_mo('a') - mo.raw_mo('a')).max(axis=1) > 1e-8
+print(np.flatnonzero(diff))
+
+# Molpro: spherical harmonic functions written as Cartesian ones, compared with
+#  the .fch file generated by `molden2fch h2o_molpro.molden -molpro`
+import subprocess
+from mokit.lib.fchfile import FchFile
+molcart = mol.copy()
+molcart.cart = True
+with open('h2o_molpro.molden', 'w') as f:
+    molden.header(molcart, f)
+    molden.orbital_coeff(molcart, f, mol.cart2sph_coeff() @ mf.mo_coeff,
+                         ene=mf.mo_energy, occ=mf.mo_occ)
+subprocess.run(['molden2fch', 'h2o_molpro.molden', '-molpro'], stdout=subprocess.DEVNULL)
+mo_molpro = MoldenFile('h2o_molpro.molden', 'molpro')
+fch = FchFile('h2o_molpro.fch')
+print(mo_molpro.nbf==fch.nbf, np.array_equal(mo_molpro.shell_type, fch.shell_type),
+      np.allclose(mo_molpro.raw_mo('a'), fch.raw_mo('a'), atol=1e-8))
+
+# [5D10F]: spherical harmonic d and Cartesian f functions in one file
+mo_cart = MoldenFile('h2o_molpro.molden', 'cp2k')
+rows, k, k1 = [], 0, 0
+for itype in mo.shell_type:
+    ang = abs(itype)
+    n, n1 = 2*ang+1, (ang+1)*(ang+2)//2
+    rows.append(mo_cart.raw_mo('a')[k1:k1+n1] if ang==3 else mo.raw_mo('a')[k:k+n])
+    k += n
+    k1 += n1
+mixed = np.vstack(rows)
+with open('h2o.molden') as f:
+    lines = f.read().split('[MO]')[0].splitlines()
+with open('h2o_5d10f.molden', 'w') as f:
+    for line in lines:
+        if not line.upper().startswith(('[5D', '[7F', '[9G')):
+            f.write(line+'\n')
+    f.write('[5D10F]\n[MO]\n')
+    for i in range(mixed.shape[1]):
+        f.write(' Sym= A\n Ene= %.8f\n Spin= Alpha\n Occup= %.6f\n' %
+                (mf.mo_energy[i], mf.mo_occ[i]))
+        for j, c in enumerate(mixed[:,i]):
+            f.write('%5d %20.14f\n' % (j+1, c))
+mo_mixed = MoldenFile('h2o_5d10f.molden', 'cp2k')
+print(sorted(set(mo_mixed.shell_type)), np.allclose(mo_mixed.raw_mo('a'), mixed))